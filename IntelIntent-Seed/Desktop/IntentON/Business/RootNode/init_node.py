@@ -4,58 +4,465 @@ Business Domain Implementation
 """
 
 import os
+import sys
+import atexit
+import io
 import json
-import yaml
 import asyncio
+import importlib.util
 import logging
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass, field, replace
 from datetime import datetime
 from pathlib import Path
+from types import MappingProxyType
 
-# Azure and Microsoft Identity imports
-try:
-    from azure.identity import DefaultAzureCredential, InteractiveBrowserCredential
-    from msal import PublicClientApplication, ConfidentialClientApplication
-    import jwt
-except ImportError:
-    print("Warning: Azure identity packages not found. Installing required packages...")
-    import subprocess
-    subprocess.check_call(["pip", "install", "azure-identity", "msal", "PyJWT", 
-                         "pyyaml", "cryptography"])
-    from azure.identity import DefaultAzureCredential, InteractiveBrowserCredential
-    from msal import PublicClientApplication, ConfidentialClientApplication
-    import jwt
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# Permission checks log here, so grants can be sampled apart from the rest
+access_logger = logging.getLogger(__name__ + '.access')
 
+# Shared IntentON_zippit components, loaded on first use so importing this
+# module stays cheap. Each is imported if importable (installed, on
+# PYTHONPATH or served by an archive finder), else loaded by location from
+# COMPONENT_ROOT; a missing component degrades to the fallbacks below
+def _component_root() -> Optional[Path]:
+    """INTENTON_COMPONENT_ROOT, or IntentON_zippit next to the Desktop tree"""
+    override = os.environ.get('INTENTON_COMPONENT_ROOT')
+    if override:
+        return Path(override)
+    parents = Path(__file__).resolve().parents
+    if len(parents) < 5:
+        return None
+    root = parents[4] / 'IntentON_zippit'
+    return root if root.is_dir() else None
+
+
+COMPONENT_ROOT = _component_root()
+
+# Component module -> its directory under COMPONENT_ROOT
+COMPONENTS = {
+    'log_node_activity': 'TelemetryAndObservability/Logging',
+    'metrics': 'TelemetryAndObservability/Metrics',
+    'node_snapshot': 'IntentONRuntimeOrchestration/LifecycleManagement',
+    'intent_resolution': 'IntentONRuntimeOrchestration/ResolutionEngine',
+    # Imports intent_resolution's coercers
+    'validate_manifest': 'TestingAndValidation/SchemaValidation',
+    # Needs numpy
+    'intent_engine': 'SemanticKernelAgentIntegration/IntentResolution',
+    'context_handler': 'SemanticKernelAgentIntegration/MemoryContext',
+}
+_components: Dict[str, Any] = {}
+
+
+def _load_component(name: str, directory: str):
+    """Import a shared component without touching sys.path, or return None
+
+    A component whose own dependencies (such as numpy) are not installed
+    counts as unavailable.
+    """
+    try:
+        return importlib.import_module(name)
+    except ModuleNotFoundError as e:
+        if e.name != name:
+            logger.debug("Component %s is unavailable: %s", name, e)
+            return None
+    if COMPONENT_ROOT is None:
+        return None
+    path = COMPONENT_ROOT / directory / f"{name}.py"
+    if not path.is_file():
+        return None
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    # Registered under its own name so every domain's node shares it
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except ModuleNotFoundError as e:
+        sys.modules.pop(name, None)
+        logger.debug("Component %s is unavailable: %s", name, e)
+        return None
+    except BaseException:
+        sys.modules.pop(name, None)
+        raise
+    return module
+
+
+def _component(name: str):
+    """Return a shared component, loading it on first use; None if it is
+    unavailable"""
+    try:
+        return _components[name]
+    except KeyError:
+        module = _components[name] = _load_component(name, COMPONENTS[name])
+        return module
+
+
+def configure_logging(level: int = logging.INFO, **options):
+    """Route logging through log_node_activity's queued pipeline, or plain
+    stderr logging without it"""
+    node_logging = _component('log_node_activity')
+    if node_logging is None:
+        logging.basicConfig(level=level)
+        return None
+    return node_logging.configure_logging(level=level, **options)
+
+
+def node_logger(logger: logging.Logger, node):
+    """A node-scoped adapter for logger, or logger itself without
+    log_node_activity"""
+    node_logging = _component('log_node_activity')
+    if node_logging is None:
+        return logger
+    return node_logging.node_logger(logger, node)
+
+
+class _TimedMethod:
+    """Method recorded by metrics.timed once it is first looked up
+
+    Loads the metrics component then instead of at import, and replaces
+    itself on the class with the instrumented function (or the plain one
+    without metrics), so later calls pay nothing extra.
+    """
+
+    def __init__(self, name: str, func: Callable):
+        self.name = name
+        self.func = func
+
+    def __set_name__(self, owner: type, attribute: str):
+        self.owner = owner
+        self.attribute = attribute
+
+    def __get__(self, instance, owner: type = None):
+        func = self.func
+        metrics = _component('metrics')
+        if metrics is not None:
+            if isinstance(func, classmethod):
+                func = classmethod(metrics.timed(self.name)(func.__func__))
+            else:
+                func = metrics.timed(self.name)(func)
+        setattr(self.owner, self.attribute, func)
+        return func.__get__(instance, owner)
+
+
+def timed(name: str) -> Callable:
+    """Decorator recording a method's latency under name (see _TimedMethod)
+    """
+    return lambda func: _TimedMethod(name, func)
+
+
+class SnapshotError(ValueError):
+    """Raised for snapshots that are corrupt, truncated or incompatible, or
+    when node_snapshot is unavailable"""
 
-@dataclass
+
+def _snapshots():
+    module = _component('node_snapshot')
+    if module is None:
+        raise SnapshotError("The node_snapshot component is not available")
+    return module
+
+
+def encode_snapshot(payload: Dict[str, Any]) -> bytes:
+    module = _snapshots()
+    try:
+        return module.encode_snapshot(payload)
+    except module.SnapshotError as e:
+        raise SnapshotError(str(e)) from e
+
+
+def decode_snapshot(data: bytes) -> Dict[str, Any]:
+    module = _snapshots()
+    try:
+        return module.decode_snapshot(data)
+    except module.SnapshotError as e:
+        raise SnapshotError(str(e)) from e
+
+
+def read_snapshot(path: Union[str, Path]) -> bytes:
+    return _snapshots().read_snapshot(path)
+
+
+def write_snapshot(path: Union[str, Path], data: bytes):
+    _snapshots().write_snapshot(path, data)
+
+
+METRICS_CONFIG = (
+    COMPONENT_ROOT / 'TelemetryAndObservability/Metrics/metrics_config.yaml'
+    if COMPONENT_ROOT is not None else None
+)
+
+# Upper bound on concurrent child initializations when the manifest selects
+# recursive.spawn_mode "concurrent"
+DEFAULT_SPAWN_CONCURRENCY = 8
+
+# Lowest n-gram similarity at which intent_engine may name the intent of
+# free text the compiled resolver could not place
+SEMANTIC_MIN_SCORE = 0.25
+
+# memory_context settings for the context store; INTENTON_AGENT_CONFIG
+# points at another agent_config.yaml
+AGENT_CONFIG = (
+    COMPONENT_ROOT / 'SemanticKernelAgentIntegration/Agents'
+    / 'agent_config.yaml' if COMPONENT_ROOT is not None else None
+)
+
+# Per-PA-ID context shared by every node once one is read or updated
+_context_store = None
+
+
+def _get_context_store():
+    """Return the process-wide context store, or None if context_handler
+    is unavailable"""
+    global _context_store
+    context_handler = _component('context_handler')
+    if _context_store is None and context_handler is not None:
+        path = os.environ.get('INTENTON_AGENT_CONFIG') or AGENT_CONFIG
+        config = {}
+        if path is not None and os.path.exists(path):
+            try:
+                import yaml
+                config = DOCUMENT_CACHE.load(path, yaml.safe_load) or {}
+            except Exception as e:
+                logger.warning("Could not load agent config from %s: %s",
+                               path, e)
+        _context_store = context_handler.ContextStore.from_config(config)
+        atexit.register(_context_store.close)
+    return _context_store
+
+# Authentication defaults when config.yaml omits parameters.timeout,
+# parameters.retry_interval or node_behavior.max_retries (or
+# node_behavior.error_handling.retry_attempts)
+DEFAULT_AUTH_TIMEOUT = 30
+DEFAULT_RETRY_INTERVAL = 5
+DEFAULT_MAX_RETRIES = 3
+
+# OAuth error responses worth another attempt; any other error is final
+TRANSIENT_TOKEN_ERRORS = frozenset({'server_error', 'temporarily_unavailable'})
+
+# A failed token acquisition is replayed to later callers for this long
+# instead of every node repeating it
+DEFAULT_FAILURE_TTL = 30
+
+# Blocking MSAL calls run on this many worker threads, off the event loop
+AUTH_EXECUTOR_WORKERS = 4
+_auth_executor = None
+
+
+def _get_auth_executor() -> ThreadPoolExecutor:
+    """Return the shared, bounded executor for blocking identity calls"""
+    global _auth_executor
+    if _auth_executor is None:
+        _auth_executor = ThreadPoolExecutor(
+            max_workers=AUTH_EXECUTOR_WORKERS,
+            thread_name_prefix="entra-auth"
+        )
+    return _auth_executor
+
+
+def _is_transient(error: BaseException) -> bool:
+    """Whether a failed token request is worth repeating
+
+    Only timeouts are; DNS, connection and configuration errors fail the
+    same way again and would just delay the fallback.
+    """
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    # MSAL's HTTP session raises requests.Timeout, not a TimeoutError
+    requests = sys.modules.get('requests')
+    return requests is not None and isinstance(error, requests.Timeout)
+
+
+def _identity_provider(name: str):
+    """Import an identity package (msal, jwt) the first time it is needed
+    
+    Keeps importing this module fast and free of side effects; a missing
+    package surfaces as an ImportError from the call that needed it.
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError as e:
+        raise ImportError(
+            f"{name} is required for Entra ID authentication; "
+            "install azure-identity, msal and PyJWT"
+        ) from e
+
+
+def _freeze(value: Any) -> Any:
+    """Return a read-only view of a parsed JSON/YAML document"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class DocumentCache:
+    """Process-wide cache of parsed manifest and config documents
+    
+    Documents are keyed by resolved path and parsed once per process; a
+    changed mtime or size on disk invalidates the entry. Callers receive
+    immutable views, so one parsed document can back every node.
+    """
+    
+    def __init__(self):
+        self._documents = {}
+    
+    def load(self, path: Union[str, Path], parser: Callable) -> Any:
+        """Return the parsed document at path, parsing it only if changed"""
+        resolved = Path(path).resolve()
+        stat = resolved.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._documents.get(resolved)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        
+        with open(resolved, 'r') as f:
+            document = _freeze(parser(f))
+        self._documents[resolved] = (signature, document)
+        return document
+    
+    def load_data(self, path: Union[str, Path], signature: Any,
+                  read: Callable[[], bytes], parser: Callable) -> Any:
+        """Return a document that is not a plain file, such as an archive
+        member, parsing it again only when its signature changes"""
+        key = Path(path)
+        cached = self._documents.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        
+        document = _freeze(parser(io.StringIO(read().decode('utf-8'))))
+        self._documents[key] = (signature, document)
+        return document
+    
+    def invalidate(self, path: Union[str, Path] = None):
+        """Forget one document, or every document when no path is given"""
+        if path is None:
+            self._documents.clear()
+        else:
+            self._documents.pop(Path(path).resolve(), None)
+
+
+DOCUMENT_CACHE = DocumentCache()
+
+
+def _load_packaged(name: str, parser: Callable) -> Any:
+    """Parse a document shipped next to this module in a zippit archive
+    
+    Returns None unless this module was imported from an archive (see
+    ModularComponentRegistry/Packaging/zippit_archive.py) that holds it.
+    """
+    archive = getattr(__loader__, 'archive', None)
+    if archive is None:
+        return None
+    path = f"{os.path.dirname(__file__)}/{name}"
+    member = archive.member_for(path)
+    if member is None:
+        return None
+    return DOCUMENT_CACHE.load_data(
+        path, archive.signature, lambda: archive.read(member), parser
+    )
+
+
+def _parse_manifest(f) -> Dict:
+    """Parse an intent manifest, raising ManifestValidationError if it is
+    malformed; the document cache runs this once per version of the file"""
+    manifest = json.load(f)
+    # validate_manifest needs intent_resolution; without either, manifests
+    # are loaded unchecked
+    if _component('intent_resolution') is not None:
+        schema = _component('validate_manifest')
+        if schema is not None:
+            schema.validate_manifest(manifest)
+    return manifest
+
+
+# Identities with the same roles share one tuple, whatever list they were
+# assigned from
+_ROLE_TUPLES: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def intern_roles(roles) -> Tuple[str, ...]:
+    """Return the shared tuple holding these roles"""
+    key = tuple(map(sys.intern, roles))
+    return _ROLE_TUPLES.setdefault(key, key)
+
+
+@dataclass(slots=True)
 class PAIdentity:
-    """Personalized Agent Identifier with multi-identity binding"""
+    """Personalized Agent Identifier with multi-identity binding
+    
+    Trees hold one identity per node, so the layout is kept small: no
+    instance ``__dict__``, shared role tuples, epoch-second timestamps and
+    a ``permissions`` dict that stays None until something is granted.
+    """
     pa_id: str
     github_identity: Optional[str] = None
     microsoft_365_identity: Optional[str] = None
     entra_object_id: Optional[str] = None
-    roles: List[str] = None
-    permissions: Dict[str, Any] = None
-    created_at: datetime = None
-    last_verified: datetime = None
-    
-    def __post_init__(self):
-        if self.roles is None:
-            self.roles = []
+    roles: Tuple[str, ...] = ()
+    permissions: Optional[Dict[str, Any]] = None
+    created_at: float = field(default_factory=time.time)
+    last_verified: Optional[float] = None
+    # Bumped whenever roles or permissions change
+    revision: int = field(default=0, repr=False, compare=False)
+    
+    def __setattr__(self, name: str, value: Any):
+        if name == 'roles':
+            value = intern_roles(value)
+        object.__setattr__(self, name, value)
+        if name in ('roles', 'permissions'):
+            object.__setattr__(self, 'revision', getattr(self, 'revision', 0) + 1)
+    
+    def grant(self, permission: str, value: Any = True):
+        """Record a delegated permission"""
         if self.permissions is None:
-            self.permissions = {}
-        if self.created_at is None:
-            self.created_at = datetime.utcnow()
+            object.__setattr__(self, 'permissions', {})
+        self.permissions[permission] = value
+        self.revision += 1
+    
+    def grant_many(self, permissions: Dict[str, Any]):
+        """Record several inherited or delegated permissions at once"""
+        if not permissions:
+            return
+        if self.permissions is None:
+            object.__setattr__(self, 'permissions', {})
+        self.permissions.update(permissions)
+        self.revision += 1
+
+
+def _compile_role_closure(hierarchy: Dict[str, List[str]]) -> Dict[str, frozenset]:
+    """Compute every role reachable below each role, rejecting cycles"""
+    closure = {}
+    visiting = []
+    
+    def visit(role: str) -> frozenset:
+        if role in closure:
+            return closure[role]
+        if role in visiting:
+            cycle = visiting[visiting.index(role):] + [role]
+            raise ValueError(f"Role hierarchy cycle: {' -> '.join(cycle)}")
+        visiting.append(role)
+        reachable = set()
+        for child in hierarchy.get(role, []):
+            reachable.add(child)
+            reachable |= visit(child)
+        visiting.pop()
+        closure[role] = frozenset(reachable)
+        return closure[role]
+    
+    for role in hierarchy:
+        visit(role)
+    return closure
 
 
 class AccessControlManager:
     """Manages role-based access control with recursive delegation"""
     
+    # Replaced by the owning node with an adapter carrying its fields
+    log = access_logger
+    
     ROLE_HIERARCHY = {
         'owner': ['admin', 'contributor', 'reader'],
         'admin': ['contributor', 'reader'],
@@ -82,31 +489,105 @@ class AccessControlManager:
         }
     }
     
+    # Compiled by configure_roles() and shared by every manager
+    ACTION_BITS: Dict[str, int] = {}
+    ROLE_MASKS: Dict[str, int] = {}
+    ROLE_CLOSURE: Dict[str, frozenset] = {}
+    _REACH_CACHE: Dict[tuple, frozenset] = {}
+    
     def __init__(self, pa_identity: PAIdentity):
         self.identity = pa_identity
         self.delegation_chain = []
+        self._mask = 0
+        self._extra_grants = frozenset()
+        self._reachable_roles = frozenset()
+        self._mask_revision = None
         
+    @timed('access.validate_permission')
     def validate_permission(self, action: str, resource: str = None) -> bool:
         """Validate if the current identity has permission for an action"""
-        for role in self.identity.roles:
-            if role in self.PERMISSION_MATRIX:
-                if self.PERMISSION_MATRIX[role].get(action, False):
-                    logger.info(f"Permission granted: {action} for role {role}")
-                    return True
+        if self._mask_revision != self.identity.revision:
+            self._compile_identity_mask()
+        
+        action_bit = self.ACTION_BITS.get(action, 0)
+        if self._mask & action_bit or action in self._extra_grants:
+            self.log.info("Permission granted: %s for %s", action, self.identity.pa_id)
+            return True
         
-        logger.warning(f"Permission denied: {action} for identity {self.identity.pa_id}")
+        self.log.warning("Permission denied: %s for identity %s", action, self.identity.pa_id)
         return False
     
+    def _compile_identity_mask(self):
+        """Fold the identity's roles and delegated permissions into a mask"""
+        mask = 0
+        for role in self.identity.roles:
+            mask |= self.ROLE_MASKS.get(role, 0)
+        
+        # Delegated permissions are stored as {action: True}; inherited role
+        # tables are keyed by role name and already covered by the roles
+        extra = set()
+        for name, value in (self.identity.permissions or {}).items():
+            if value is True:
+                if name in self.ACTION_BITS:
+                    mask |= self.ACTION_BITS[name]
+                else:
+                    extra.add(name)
+        
+        self._mask = mask
+        self._extra_grants = frozenset(extra)
+        self._reachable_roles = self.reachable_roles(self.identity.roles)
+        self._mask_revision = self.identity.revision
+    
+    @classmethod
+    def configure_roles(cls, role_hierarchy: Dict[str, List[str]] = None,
+                        permission_matrix: Dict[str, Dict] = None):
+        """Compile the role hierarchy and permission matrix for all nodes"""
+        if role_hierarchy is None:
+            role_hierarchy = cls.ROLE_HIERARCHY
+        # Compile before assigning so a cyclic hierarchy leaves no trace
+        closure = _compile_role_closure(role_hierarchy)
+        cls.ROLE_HIERARCHY = role_hierarchy
+        cls.ROLE_CLOSURE = closure
+        cls._REACH_CACHE = {}
+        if permission_matrix is not None:
+            cls.PERMISSION_MATRIX = permission_matrix
+        cls.compile_permissions()
+    
+    @classmethod
+    def reachable_roles(cls, roles: List[str]) -> frozenset:
+        """Return every role below any of the given roles"""
+        key = tuple(roles)
+        reach = cls._REACH_CACHE.get(key)
+        if reach is None:
+            reach = frozenset().union(
+                *(cls.ROLE_CLOSURE.get(role, ()) for role in key)
+            )
+            cls._REACH_CACHE[key] = reach
+        return reach
+    
+    @classmethod
+    def compile_permissions(cls):
+        """Compile PERMISSION_MATRIX into per-role integer bitmasks"""
+        actions = sorted({
+            action for grants in cls.PERMISSION_MATRIX.values()
+            for action in grants
+        })
+        cls.ACTION_BITS = {action: 1 << i for i, action in enumerate(actions)}
+        cls.ROLE_MASKS = {
+            role: sum(
+                cls.ACTION_BITS[action]
+                for action, allowed in grants.items() if allowed
+            )
+            for role, grants in cls.PERMISSION_MATRIX.items()
+        }
+    
     def can_delegate_to(self, target_role: str) -> bool:
         """Check if current identity can delegate to target role"""
         if not self.validate_permission('delegate'):
             return False
             
-        for role in self.identity.roles:
-            if role in self.ROLE_HIERARCHY:
-                if target_role in self.ROLE_HIERARCHY[role]:
-                    return True
-        return False
+        # validate_permission refreshed the reachable roles for this identity
+        return target_role in self._reachable_roles
     
     def inherit_permissions(self, parent_identity: PAIdentity) -> Dict[str, Any]:
         """Inherit permissions from parent with scope reduction"""
@@ -116,20 +597,125 @@ class AccessControlManager:
             return inherited
             
         # Apply scope reduction - child cannot have more permissions than parent
-        for parent_role in parent_identity.roles:
-            if parent_role in self.ROLE_HIERARCHY:
-                for child_role in self.identity.roles:
-                    if child_role in self.ROLE_HIERARCHY[parent_role]:
-                        inherited[child_role] = self.PERMISSION_MATRIX[child_role]
+        parent_reach = self.reachable_roles(parent_identity.roles)
+        for child_role in self.identity.roles:
+            if child_role in parent_reach:
+                inherited[child_role] = self.PERMISSION_MATRIX[child_role]
         
         return inherited
 
 
+AccessControlManager.configure_roles()
+
+
+class TokenCache:
+    """Process-wide token cache with single-flight acquisition
+    
+    Entries are keyed by (tenant_id, client_id, scopes) and honour the
+    ``expires_in`` of the token response. Tokens inside the refresh margin
+    are still served while one background acquisition renews them, and
+    concurrent callers for the same key share a single in-flight request.
+    A failed acquisition (an exception or an error response) is replayed to
+    callers for ``failure_ttl`` seconds instead of being attempted again.
+    """
+    
+    def __init__(self, refresh_margin: float = 300,
+                 failure_ttl: float = DEFAULT_FAILURE_TTL):
+        self.refresh_margin = refresh_margin
+        self.failure_ttl = failure_ttl
+        self.clients = {}
+        self._entries = {}
+        self._failures = {}
+        self._inflight = {}
+    
+    async def get_token(
+        self, key: Tuple, acquire: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """Return the cached token for key or acquire it exactly once"""
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry:
+            result, expires_at = entry
+            if now < expires_at - self.refresh_margin:
+                return result
+            if now < expires_at:
+                # Refresh ahead of expiry without making callers wait
+                if self._recent_failure(key, now) is None:
+                    self._start_acquire(key, acquire)
+                return result
+        failure = self._recent_failure(key, now)
+        if failure is not None:
+            if isinstance(failure, BaseException):
+                raise failure
+            return failure
+        return await asyncio.shield(self._start_acquire(key, acquire))
+    
+    def invalidate(self, key: Tuple = None):
+        """Drop one cached token or failure, or all of them when no key is
+        given"""
+        if key is None:
+            self._entries.clear()
+            self._failures.clear()
+        else:
+            self._entries.pop(key, None)
+            self._failures.pop(key, None)
+    
+    def _recent_failure(self, key: Tuple, now: float):
+        failure = self._failures.get(key)
+        if failure is None:
+            return None
+        outcome, retry_at = failure
+        if now < retry_at:
+            return outcome
+        del self._failures[key]
+        return None
+    
+    def _start_acquire(self, key: Tuple, acquire) -> asyncio.Future:
+        task = self._inflight.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(self._acquire(key, acquire))
+            task.add_done_callback(self._consume_error)
+            self._inflight[key] = task
+        return task
+    
+    async def _acquire(self, key: Tuple, acquire) -> Dict[str, Any]:
+        try:
+            try:
+                result = await acquire()
+            except Exception as e:
+                self._failures[key] = (e, time.monotonic() + self.failure_ttl)
+                raise
+            if result and 'access_token' in result:
+                expires_in = float(result.get('expires_in', 3600))
+                self._entries[key] = (result, time.monotonic() + expires_in)
+                self._failures.pop(key, None)
+            else:
+                self._failures[key] = (result or {},
+                                       time.monotonic() + self.failure_ttl)
+            return result
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+    
+    @staticmethod
+    def _consume_error(task: asyncio.Future):
+        # Background refreshes may fail with nobody awaiting them
+        if not task.cancelled() and task.exception():
+            logger.debug("Token acquisition failed: %s", task.exception())
+
+
+# Shared by every authenticator in the process
+TOKEN_CACHE = TokenCache()
+
+
 class EntraIDAuthenticator:
     """Handles Microsoft Entra ID authentication and identity binding"""
     
-    def __init__(self, config_path: str = "config.yaml"):
-        self.config = self._load_config(config_path)
+    def __init__(self, config_path: str = "config.yaml", app_factory: Callable = None,
+                 token_cache: TokenCache = None, config: Dict = None):
+        if config is None:
+            config = self._load_config(config_path)
+        self.config = config
         self.tenant_id = self.config.get('azure', {}).get('tenant_id', 
                                        os.environ.get('AZURE_TENANT_ID'))
         self.client_id = self.config.get('azure', {}).get('client_id', 
@@ -137,51 +723,128 @@ class EntraIDAuthenticator:
         self.client_secret = os.environ.get('AZURE_CLIENT_SECRET')
         self.graph_client = None
         self.msal_app = None
+        # Builds the MSAL client; tests can substitute a local fake app
+        self.app_factory = app_factory or self._default_app_factory
+        self.token_cache = token_cache or TOKEN_CACHE
+        
+        parameters = self.config.get('parameters') or {}
+        node_behavior = self.config.get('node_behavior') or {}
+        self.timeout = parameters.get('timeout', DEFAULT_AUTH_TIMEOUT)
+        self.retry_interval = parameters.get('retry_interval', DEFAULT_RETRY_INTERVAL)
+        # config.yaml nests the count under node_behavior.error_handling
+        error_handling = node_behavior.get('error_handling')
+        if not isinstance(error_handling, dict):
+            error_handling = {}
+        self.max_retries = node_behavior.get(
+            'max_retries', error_handling.get('retry_attempts', DEFAULT_MAX_RETRIES)
+        )
         
     def _load_config(self, config_path: str) -> Dict:
         """Load configuration from YAML file"""
         try:
-            with open(config_path, 'r') as f:
-                return yaml.safe_load(f)
+            import yaml
+            if not os.path.exists(config_path):
+                packaged = _load_packaged(
+                    os.path.basename(config_path), yaml.safe_load
+                )
+                if packaged is not None:
+                    return packaged
+            return DOCUMENT_CACHE.load(config_path, yaml.safe_load)
         except Exception as e:
-            logger.warning(f"Could not load config from {config_path}: {str(e)}")
+            logger.warning("Could not load config from %s: %s", config_path, e)
             return {}
     
+    @timed('auth.authenticate')
     async def authenticate(self) -> Dict[str, Any]:
         """Authenticate using Microsoft Entra ID"""
         try:
             if self.client_secret:
-                # Confidential client for service principals
-                self.msal_app = ConfidentialClientApplication(
-                    self.client_id,
-                    authority=f"https://login.microsoftonline.com/{self.tenant_id}",
-                    client_credential=self.client_secret
-                )
-                result = self.msal_app.acquire_token_for_client(
-                    scopes=["https://graph.microsoft.com/.default"]
-                )
+                scopes = ["https://graph.microsoft.com/.default"]
             else:
-                # Public client for interactive authentication
-                self.msal_app = PublicClientApplication(
-                    self.client_id,
-                    authority=f"https://login.microsoftonline.com/{self.tenant_id}"
-                )
-                result = self.msal_app.acquire_token_interactive(
-                    scopes=["User.Read", "Directory.Read.All"]
-                )
+                scopes = ["User.Read", "Directory.Read.All"]
+            
+            # Nodes sharing a tenant, client and scopes share one token
+            key = (self.tenant_id, self.client_id, tuple(scopes))
+            result = await self.token_cache.get_token(key, lambda: self._acquire_token(scopes))
             
             if "access_token" in result:
                 logger.info("Successfully authenticated with Entra ID")
                 return result
             else:
-                logger.warning(f"Authentication failed: {result.get('error_description')}")
+                logger.warning("Authentication failed: %s", result.get('error_description'))
                 return {}
                 
         except Exception as e:
-            logger.error(f"Authentication error: {str(e)}")
+            logger.error("Authentication error: %s", e)
             # Fall back to simulated authentication for development
             return self._simulated_auth()
             
+    async def _acquire_token(self, scopes: List[str]) -> Dict[str, Any]:
+        """Acquire a token off the event loop with a timeout
+        
+        Timeouts and transient error responses are retried for confidential
+        clients. The interactive flow is attempted once, since repeating it
+        would prompt the user again.
+        """
+        if not self.tenant_id or not self.client_id:
+            raise ValueError("Entra ID tenant_id and client_id are not set")
+        loop = asyncio.get_running_loop()
+        attempts = self.max_retries + 1 if self.client_secret else 1
+        for attempt in range(1, attempts + 1):
+            try:
+                result = await asyncio.wait_for(
+                    loop.run_in_executor(
+                        _get_auth_executor(), self._acquire_token_blocking,
+                        scopes
+                    ),
+                    timeout=self.timeout
+                )
+            except Exception as e:
+                if attempt == attempts or not _is_transient(e):
+                    raise
+                reason = str(e) or type(e).__name__
+            else:
+                if (attempt == attempts or not result
+                        or result.get('error') not in TRANSIENT_TOKEN_ERRORS):
+                    return result
+                reason = result['error']
+            logger.warning(
+                "Token acquisition attempt %d/%d failed (%s), "
+                "retrying in %ss", attempt, attempts, reason,
+                self.retry_interval
+            )
+            await asyncio.sleep(self.retry_interval)
+    
+    def _acquire_token_blocking(self, scopes: List[str]) -> Dict[str, Any]:
+        """Acquire a token from MSAL, reusing the client for this tenant"""
+        client_key = (self.tenant_id, self.client_id, bool(self.client_secret))
+        self.msal_app = self.token_cache.clients.get(client_key)
+        if self.msal_app is None:
+            self.msal_app = self.app_factory(
+                self.client_id,
+                authority=f"https://login.microsoftonline.com/{self.tenant_id}",
+                client_credential=self.client_secret
+            )
+            self.token_cache.clients[client_key] = self.msal_app
+        
+        if self.client_secret:
+            # Confidential client for service principals
+            return self.msal_app.acquire_token_for_client(scopes=scopes)
+        # Public client for interactive authentication
+        return self.msal_app.acquire_token_interactive(scopes=scopes)
+    
+    @staticmethod
+    def _default_app_factory(client_id: str, authority: str, client_credential: str = None):
+        """Create the MSAL application matching the available credentials"""
+        msal = _identity_provider('msal')
+        if client_credential:
+            return msal.ConfidentialClientApplication(
+                client_id,
+                authority=authority,
+                client_credential=client_credential
+            )
+        return msal.PublicClientApplication(client_id, authority=authority)
+    
     def _simulated_auth(self) -> Dict[str, Any]:
         """Provide simulated auth for development without Azure credentials"""
         logger.warning("Using simulated authentication for development")
@@ -204,12 +867,13 @@ class EntraIDAuthenticator:
                 pa_identity.github_identity = os.environ.get('GITHUB_ACTOR', 
                                                            'simulated_github_user')
             
-            logger.info(f"Bound GitHub identity: {pa_identity.github_identity}")
+            logger.info("Bound GitHub identity: %s", pa_identity.github_identity)
             return True
         except Exception as e:
-            logger.error(f"Failed to bind GitHub identity: {str(e)}")
+            logger.error("Failed to bind GitHub identity: %s", e)
             return False
     
+    @timed('auth.bind_microsoft_identity')
     async def bind_microsoft_identity(self, pa_identity: PAIdentity, 
                                     access_token: str) -> bool:
         """Bind Microsoft 365 identity to PA ID"""
@@ -219,14 +883,15 @@ class EntraIDAuthenticator:
                 pa_identity.entra_object_id = "simulated-object-id"
             else:
                 # Decode JWT token to get user information
+                jwt = _identity_provider('jwt')
                 decoded = jwt.decode(access_token, options={"verify_signature": False})
                 pa_identity.microsoft_365_identity = decoded.get('upn') or decoded.get('email')
                 pa_identity.entra_object_id = decoded.get('oid')
                 
-            logger.info(f"Bound Microsoft 365 identity: {pa_identity.microsoft_365_identity}")
+            logger.info("Bound Microsoft 365 identity: %s", pa_identity.microsoft_365_identity)
             return True
         except Exception as e:
-            logger.error(f"Failed to bind Microsoft identity: {str(e)}")
+            logger.error("Failed to bind Microsoft identity: %s", e)
             return False
     
     async def _verify_github_token(self, token: str) -> Dict:
@@ -236,18 +901,83 @@ class EntraIDAuthenticator:
         return {"login": os.environ.get('GITHUB_ACTOR', 'github_user')}
 
 
+@dataclass(slots=True, eq=False)
+class NodePlaceholder:
+    """Registry entry for a lazily spawned child that is not built yet
+    
+    Holds only what building it takes: the pa_id, the index of its entry
+    in the parent manifest's ``children`` and, for a demoted subtree, the
+    snapshot it was folded into. The pa_ids inside that subtree are kept
+    in ``members`` and resolve to this placeholder until it is built;
+    permissions delegated to any of them meanwhile wait in ``grants``.
+    """
+    pa_id: str
+    parent: 'IntentONRootNode'
+    index: int = -1
+    snapshot: Optional[bytes] = None
+    members: Tuple[str, ...] = ()
+    # pa_id -> {permission: value}
+    grants: Optional[Dict[str, Dict[str, Any]]] = None
+    # In-flight materialization shared by concurrent accesses
+    task: Optional[asyncio.Future] = None
+    
+    @property
+    def depth(self) -> int:
+        return self.parent.depth + 1
+    
+    @property
+    def config(self) -> Dict[str, Any]:
+        """The manifest entry this child is spawned from"""
+        children = self.parent.manifest.get('children', [])
+        if 0 <= self.index < len(children):
+            return children[self.index]
+        return {}
+    
+    def pa_ids(self) -> Tuple[str, ...]:
+        """Every pa_id that resolves to this placeholder"""
+        return (self.pa_id,) + self.members
+    
+    def defer_grant(self, pa_id: str, permission: str, value: Any = True):
+        """Hold a permission delegated to pa_id until it is materialized"""
+        if self.grants is None:
+            self.grants = {}
+        self.grants.setdefault(pa_id, {})[permission] = value
+
+
 class IntentONRootNode:
     """Main root node class with recursive orchestration"""
     
-    def __init__(self, domain: str, pa_id: str = None):
+    # Identity fields persisted by snapshot(); tokens never live on the
+    # identity, and nothing outside this list is written
+    SNAPSHOT_FIELDS = ('github_identity', 'microsoft_365_identity', 'entra_object_id',
+                       'roles', 'permissions', 'created_at', 'last_verified')
+    
+    def __init__(self, domain: str, pa_id: str = None, manifest: Dict = None,
+                 authenticator: EntraIDAuthenticator = None):
         self.domain = domain
         self.pa_id = pa_id or self._generate_pa_id()
         self.identity = PAIdentity(pa_id=self.pa_id)
-        self.authenticator = EntraIDAuthenticator()
+        # Children share their parent's authenticator and parsed documents,
+        # so only the root touches the filesystem
+        self.authenticator = authenticator or EntraIDAuthenticator()
         self.access_manager = AccessControlManager(self.identity)
+        # Node-scoped loggers attach pa_id, domain and depth to each record
+        self.log = node_logger(logger, self)
+        self.access_manager.log = node_logger(access_logger, self)
         self.children = []
         self.parent = None
-        self.manifest = self._load_manifest()
+        self.depth = 0
+        # pa_id -> node for the whole tree, shared with every descendant
+        self.registry = {self.pa_id: self}
+        self.manifest = manifest if manifest is not None else self._load_manifest()
+        self.initialized = False
+        self.spawn_errors = []
+        # Lazily spawned children that are not built yet, by pa_id
+        self.placeholders = {}
+        # Monotonic time of the last lookup or delegation reaching this node
+        self.last_access = time.monotonic()
+        # (intent, missing) last recorded in the context store
+        self._recorded_intent = None
         
     def _generate_pa_id(self) -> str:
         """Generate a unique PA ID"""
@@ -259,14 +989,14 @@ class IntentONRootNode:
         """Load intent manifest"""
         manifest_path = Path("intent_manifest.json")
         if manifest_path.exists():
-            with open(manifest_path, 'r') as f:
-                return json.load(f)
-        return {}
+            return DOCUMENT_CACHE.load(manifest_path, _parse_manifest)
+        packaged = _load_packaged(manifest_path.name, _parse_manifest)
+        return packaged if packaged is not None else {}
     
-    async def initialize(self) -> bool:
+    async def initialize(self, recursive: bool = True) -> bool:
         """Initialize the root node with authentication and access control"""
         try:
-            logger.info(f"Initializing {self.domain} root node with PA ID: {self.pa_id}")
+            self.log.info("Initializing %s root node with PA ID: %s", self.domain, self.pa_id)
             
             # Authenticate with Entra ID
             auth_result = await self.authenticator.authenticate()
@@ -290,14 +1020,16 @@ class IntentONRootNode:
             self._assign_default_roles()
             
             # Initialize recursive structure if needed
-            if self.manifest.get('recursive', {}).get('enabled', False):
+            if recursive and self._recursion_enabled():
                 await self._initialize_recursive_structure()
             
-            logger.info(f"Root node {self.pa_id} initialized successfully")
+            self.initialized = True
+            
+            self.log.info("Root node %s initialized successfully", self.pa_id)
             return True
             
         except Exception as e:
-            logger.error(f"Failed to initialize root node: {str(e)}")
+            self.log.error("Failed to initialize root node: %s", e)
             return False
     
     def _assign_default_roles(self):
@@ -309,11 +1041,25 @@ class IntentONRootNode:
             'Enterprise': ['admin']
         }
         self.identity.roles = role_mapping.get(self.domain, ['reader'])
-        logger.info(f"Assigned roles: {self.identity.roles}")
+        self.log.info("Assigned roles: %s", self.identity.roles)
+    
+    def _recursion_enabled(self) -> bool:
+        """Check whether the manifest enables recursive child nodes"""
+        return self.manifest.get('recursive', {}).get('enabled', False)
     
     async def _initialize_recursive_structure(self):
         """Initialize recursive child nodes"""
-        max_depth = self.manifest.get('recursive', {}).get('max_depth', 5)
+        recursive = self.manifest.get('recursive', {})
+        if recursive.get('spawn_mode') == 'lazy':
+            self._register_lazy_children(recursive.get('max_depth', 5))
+            return
+        if recursive.get('spawn_mode') == 'concurrent':
+            await self._initialize_levels_concurrently(
+                recursive.get('max_concurrency', DEFAULT_SPAWN_CONCURRENCY)
+            )
+            return
+        
+        max_depth = recursive.get('max_depth', 5)
         
         if self.get_depth() < max_depth:
             for child_config in self.manifest.get('children', []):
@@ -321,39 +1067,206 @@ class IntentONRootNode:
                 if child_node:
                     self.children.append(child_node)
     
+    async def _initialize_levels_concurrently(self, max_concurrency: int):
+        """Spawn the subtree one level at a time with bounded concurrency
+        
+        Children keep manifest order in ``children``. Failed children are
+        left out of the tree and recorded in ``spawn_errors`` on this node
+        without aborting sibling subtrees.
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        level = [self]
+        while level:
+            pending = []
+            for node in level:
+                max_depth = node.manifest.get('recursive', {}).get('max_depth', 5)
+                if node is not self and not node._recursion_enabled():
+                    continue
+                if node.get_depth() >= max_depth:
+                    continue
+                for index, config in enumerate(node.manifest.get('children', [])):
+                    pending.append((node, index, config))
+            
+            results = await asyncio.gather(
+                *(node._spawn_bounded(semaphore, config) for node, _, config in pending),
+                return_exceptions=True
+            )
+            
+            level = []
+            for (node, index, _), result in zip(pending, results):
+                if isinstance(result, BaseException):
+                    self._record_spawn_error(node, index, result)
+                    continue
+                node.children.append(result)
+                level.append(result)
+    
+    def _record_spawn_error(self, parent: 'IntentONRootNode', index: int, error: BaseException):
+        """Record a failed child subtree for concurrent spawning"""
+        parent.log.error("Failed to spawn child %d of %s: %s", index, parent.pa_id, error)
+        self.spawn_errors.append({
+            "parent_pa_id": parent.pa_id,
+            "child_index": index,
+            "error": str(error)
+        })
+    
+    async def _spawn_bounded(self, semaphore: asyncio.Semaphore, config: Dict) -> 'IntentONRootNode':
+        """Spawn one child without recursion while holding a semaphore slot"""
+        if not self.access_manager.validate_permission('create'):
+            raise PermissionError("Insufficient permissions to spawn child node")
+        async with semaphore:
+            return await self._build_child(config, recursive=False)
+    
     async def spawn_child(self, config: Dict) -> Optional['IntentONRootNode']:
         """Spawn a child node with inherited permissions"""
         if not self.access_manager.validate_permission('create'):
-            logger.warning("Insufficient permissions to spawn child node")
+            self.log.warning("Insufficient permissions to spawn child node")
             return None
             
         try:
-            child_node = IntentONRootNode(
-                domain=config.get('domain', self.domain),
-                pa_id=self._generate_pa_id()
-            )
-            child_node.parent = self
+            return await self._build_child(config)
             
+        except Exception as e:
+            self.log.error("Failed to spawn child node: %s", e)
+            return None
+    
+    # Every path that creates a node comes through here, so spawns are
+    # timed whether they run sequentially, concurrently or on first lookup
+    @timed('node.spawn_child')
+    async def _build_child(self, config: Dict, recursive: bool = True,
+                           pa_id: str = None) -> 'IntentONRootNode':
+        """Create a child node, scope its permissions and initialize it
+        
+        A child that fails to initialize is detached again and the error
+        raised, so no spawn path keeps a failed node in the tree.
+        """
+        child_node = IntentONRootNode(
+            domain=config.get('domain', self.domain),
+            pa_id=pa_id or self._generate_pa_id(),
+            manifest=self.manifest,
+            authenticator=self.authenticator
+        )
+        self._attach(child_node)
+        try:
             # Inherit permissions with scope reduction
             inherited_perms = child_node.access_manager.inherit_permissions(self.identity)
-            child_node.identity.permissions.update(inherited_perms)
-            
-            await child_node.initialize()
-            logger.info(f"Spawned child node: {child_node.pa_id}")
-            return child_node
+            child_node.identity.grant_many(inherited_perms)
             
-        except Exception as e:
-            logger.error(f"Failed to spawn child node: {str(e)}")
-            return None
+            if not await child_node.initialize(recursive=recursive):
+                raise RuntimeError("initialization failed")
+        except Exception:
+            self.detach_child(child_node)
+            raise
+        child_node.log.info("Spawned child node: %s", child_node.pa_id)
+        return child_node
+    
+    def _attach(self, child: 'IntentONRootNode'):
+        """Link a detached subtree under this node and into the registry"""
+        offset = self.depth + 1 - child.depth
+        for node in child._iter_subtree():
+            node.depth += offset
+            node.registry = self.registry
+            self.registry[node.pa_id] = node
+            for placeholder in node.placeholders.values():
+                for key in placeholder.pa_ids():
+                    self.registry[key] = placeholder
+        child.parent = self
+    
+    def detach_child(self, child: 'IntentONRootNode'):
+        """Detach a child subtree, which becomes a tree of its own"""
+        if child in self.children:
+            self.children.remove(child)
+        offset = child.depth
+        registry = {}
+        for node in child._iter_subtree():
+            self.registry.pop(node.pa_id, None)
+            registry[node.pa_id] = node
+            for placeholder in node.placeholders.values():
+                for key in placeholder.pa_ids():
+                    self.registry.pop(key, None)
+                    registry[key] = placeholder
+            node.registry = registry
+            node.depth -= offset
+        child.parent = None
+    
+    def _iter_subtree(self):
+        """Yield this node and its descendants without recursion"""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(node.children)
     
     def get_depth(self) -> int:
         """Get the depth of this node in the hierarchy"""
-        depth = 0
-        current = self.parent
-        while current:
-            depth += 1
-            current = current.parent
-        return depth
+        return self.depth
+    
+    def get_context(self) -> Dict[str, Any]:
+        """Return the context stored for this node's PA-ID
+        
+        Empty when nothing is stored or context_handler is unavailable.
+        """
+        store = _get_context_store()
+        return {} if store is None else store.get(self.pa_id, {})
+    
+    def update_context(self, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge JSON-serializable changes into this node's context and
+        return the result"""
+        store = _get_context_store()
+        if store is None:
+            return dict(changes)
+        return store.update(self.pa_id, changes)
+    
+    def resolve_intent(self, request: Any):
+        """Resolve a request to an intent of this node's manifest
+        
+        Returns an IntentMatch (see ResolutionEngine/intent_resolution.py),
+        or None when nothing matches or that component is unavailable.
+        """
+        return self.resolve_intents([request])[0]
+    
+    @timed('node.resolve_intents')
+    def resolve_intents(self, requests: List[Any]) -> List:
+        """Resolve a batch of requests, scoring repeated texts once
+        
+        Free text the compiled resolver cannot place is matched by the
+        n-gram intent engine in one batched call, when numpy is available.
+        """
+        intent_resolution = _component('intent_resolution')
+        if intent_resolution is None:
+            return [None] * len(requests)
+        # Compiled once per manifest version and shared by the whole tree
+        resolver = intent_resolution.get_resolver(self.manifest)
+        matches = resolver.resolve_many(requests)
+        unmatched = [
+            position for position, match in enumerate(matches)
+            if match is None and isinstance(requests[position], str)
+        ]
+        # Loaded only now: intent_engine imports numpy
+        intent_engine = (_component('intent_engine')
+                         if unmatched and resolver.intents else None)
+        if intent_engine is not None:
+            engine = intent_engine.get_engine(self.manifest)
+            texts = [requests[position] for position in unmatched]
+            best = engine.match_many(texts, 1, SEMANTIC_MIN_SCORE)
+            for position, text, found in zip(unmatched, texts, best):
+                if found:
+                    intent, score = found[0]
+                    match = resolver.resolve({'intent': intent, 'text': text})
+                    matches[position] = replace(match, score=score)
+        last = next((match for match in reversed(matches) if match), None)
+        # Recorded only when the resolved intent changes, so repeated
+        # requests do not rewrite the store on every call
+        if (last is not None
+                and (last.intent, last.missing) != self._recorded_intent
+                and _component('context_handler')):
+            self._recorded_intent = (last.intent, last.missing)
+            # Parameters may hold coerced dates, so only names are kept
+            self.update_context({
+                'last_intent': last.intent,
+                'missing': list(last.missing),
+                'resolved_at': time.time(),
+            })
+        return matches
     
     def delegate_permission(self, target_pa_id: str, permission: str) -> bool:
         """Delegate specific permission to another PA ID"""
@@ -361,22 +1274,295 @@ class IntentONRootNode:
             return False
             
         # Find target node and delegate
-        target_node = self._find_node_by_pa_id(target_pa_id)
-        if target_node:
-            target_node.identity.permissions[permission] = True
-            logger.info(f"Delegated {permission} to {target_pa_id}")
-            return True
-        return False
+        target = self._find_entry(target_pa_id)
+        if target is None:
+            return False
+        if isinstance(target, NodePlaceholder):
+            # Granted once the target is built, which starts right away
+            # when an event loop is running
+            target.defer_grant(target_pa_id, permission)
+            self._materialize_soon(target)
+        else:
+            target.identity.grant(permission)
+            target.last_access = time.monotonic()
+        self.log.info("Delegated %s to %s", permission, target_pa_id)
+        return True
     
     def _find_node_by_pa_id(self, pa_id: str) -> Optional['IntentONRootNode']:
-        """Recursively find a node by PA ID"""
-        if self.pa_id == pa_id:
-            return self
-        for child in self.children:
-            found = child._find_node_by_pa_id(pa_id)
-            if found:
-                return found
+        """Find a built node in this subtree by PA ID via the tree registry"""
+        entry = self._find_entry(pa_id)
+        return None if isinstance(entry, NodePlaceholder) else entry
+    
+    @timed('node.find_by_pa_id')
+    def _find_entry(
+        self, pa_id: str
+    ) -> Union['IntentONRootNode', NodePlaceholder, None]:
+        """Find a node or placeholder in this subtree by PA ID"""
+        entry = self.registry.get(pa_id)
+        if entry is None:
+            return None
+        # Only nodes below this one are in scope; walk up the depth difference
+        ancestor = entry
+        for _ in range(entry.depth - self.depth):
+            ancestor = ancestor.parent
+        return entry if ancestor is self else None
+    
+    async def get_node(self, pa_id: str) -> Optional['IntentONRootNode']:
+        """Find a node in this subtree by PA ID, materializing it if needed
+        
+        Placeholders on the way are built on first access, and concurrent
+        lookups of the same child share one materialization. Returns None
+        if the pa_id is unknown or its subtree could not be built.
+        """
+        entry = self._find_entry(pa_id)
+        while entry is not None:
+            if isinstance(entry, NodePlaceholder):
+                placeholder = entry
+            else:
+                # A child is registered before its initialization completes
+                parent = entry.parent
+                placeholder = (parent.placeholders.get(entry.pa_id)
+                               if parent is not None else None)
+                if placeholder is None:
+                    entry.last_access = time.monotonic()
+                    return entry
+            built = await asyncio.shield(
+                placeholder.parent._start_materialize(placeholder)
+            )
+            if built is None:
+                return None
+            entry = self._find_entry(pa_id)
         return None
+    
+    def _register_lazy_children(self, max_depth: int):
+        """Register manifest children as placeholders built on first access"""
+        children = self.manifest.get('children', [])
+        if self.get_depth() >= max_depth or not children:
+            return
+        if not self.access_manager.validate_permission('create'):
+            self.log.warning("Insufficient permissions to spawn child node")
+            return
+        for index in range(len(children)):
+            self._add_placeholder(self._generate_pa_id(), index)
+    
+    def _add_placeholder(self, pa_id: str, index: int = -1,
+                         snapshot: bytes = None, members: Tuple = (),
+                         grants: Dict = None) -> NodePlaceholder:
+        """Register a placeholder child under this node"""
+        placeholder = NodePlaceholder(
+            pa_id, self, index, snapshot, tuple(members), grants
+        )
+        self.placeholders[pa_id] = placeholder
+        for key in placeholder.pa_ids():
+            self.registry[key] = placeholder
+        return placeholder
+    
+    def _start_materialize(self, placeholder: NodePlaceholder
+                           ) -> asyncio.Future:
+        """Return the placeholder's materialization, starting it if needed"""
+        task = placeholder.task
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(self._materialize(placeholder))
+            placeholder.task = task
+        return task
+    
+    @staticmethod
+    def _materialize_soon(placeholder: NodePlaceholder):
+        """Start building a placeholder in the background, if possible"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop; the next get_node() builds it
+            return
+        placeholder.parent._start_materialize(placeholder)
+    
+    @timed('node.materialize')
+    async def _materialize(
+        self, placeholder: NodePlaceholder
+    ) -> Optional['IntentONRootNode']:
+        """Build the child a placeholder stands for and swap it in
+        
+        Fresh placeholders are spawned from their manifest entry with the
+        placeholder's pa_id; demoted ones are restored from their snapshot.
+        On failure the placeholder stays registered for a later attempt.
+        """
+        try:
+            if placeholder.snapshot is not None:
+                child = await self.restore(
+                    placeholder.snapshot, manifest=self.manifest,
+                    authenticator=self.authenticator
+                )
+                self._attach(child)
+            else:
+                child = await self._build_child(
+                    placeholder.config, pa_id=placeholder.pa_id
+                )
+        except Exception as e:
+            self.log.error(
+                "Failed to materialize child node %s: %s", placeholder.pa_id, e
+            )
+            # Building may have taken over the placeholder's registry entries
+            for key in placeholder.pa_ids():
+                self.registry[key] = placeholder
+            return None
+        finally:
+            placeholder.task = None
+        del self.placeholders[placeholder.pa_id]
+        self.children.append(child)
+        if placeholder.grants:
+            self._apply_deferred_grants(placeholder.grants)
+        return child
+    
+    def _apply_deferred_grants(self, grants: Dict[str, Dict[str, Any]]):
+        """Grant permissions delegated while their targets were placeholders"""
+        for pa_id, permissions in grants.items():
+            target = self.registry.get(pa_id)
+            if isinstance(target, NodePlaceholder):
+                # Still folded inside a nested placeholder
+                for permission, value in permissions.items():
+                    target.defer_grant(pa_id, permission, value)
+            elif target is not None:
+                target.identity.grant_many(permissions)
+    
+    def demote_idle(self, idle_for: float) -> int:
+        """Fold child subtrees idle for ``idle_for`` seconds into placeholders
+        
+        Applies to trees spawned with spawn_mode "lazy"; nodes count as
+        accessed when get_node() or delegate_permission() reaches them. A
+        demoted subtree is kept as a snapshot, so its pa_ids, roles and
+        grants come back unchanged on the next access. Returns the number
+        of nodes released.
+        """
+        if self.manifest.get('recursive', {}).get('spawn_mode') != 'lazy':
+            return 0
+        cutoff = time.monotonic() - idle_for
+        
+        # Latest access anywhere below each node, children before parents
+        order = [self]
+        for node in order:
+            order.extend(node.children)
+        latest = {}
+        for node in reversed(order):
+            stamp = node.last_access
+            if any(p.task is not None for p in node.placeholders.values()):
+                # Never demote around a materialization in flight
+                stamp = float('inf')
+            for child in node.children:
+                stamp = max(stamp, latest[child])
+            latest[node] = stamp
+        
+        released = 0
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            for child in list(node.children):
+                if latest[child] <= cutoff:
+                    released += node._demote(child)
+                else:
+                    stack.append(child)
+        if released:
+            self.log.info("Demoted %d idle nodes to placeholders", released)
+        return released
+    
+    def _demote(self, child: 'IntentONRootNode') -> int:
+        """Replace a child subtree with a placeholder holding its snapshot"""
+        snapshot = child.snapshot()
+        members = []
+        count = 0
+        for node in child._iter_subtree():
+            count += 1
+            members.append(node.pa_id)
+            for placeholder in node.placeholders.values():
+                members.extend(placeholder.pa_ids())
+        self.detach_child(child)
+        # members[0] is the child itself
+        self._add_placeholder(child.pa_id, snapshot=snapshot,
+                              members=members[1:])
+        return count
+    
+    def snapshot(self) -> bytes:
+        """Serialize this initialized subtree for a warm start
+        
+        Records pa_ids, domains, parent/child links, placeholders of lazy
+        children and the identity fields in SNAPSHOT_FIELDS; tokens are
+        never written. Rebuild the tree with ``IntentONRootNode.restore``.
+        """
+        # Breadth-first, so parents precede their children in manifest order
+        nodes = [self]
+        for node in nodes:
+            nodes.extend(node.children)
+        position = {node: index for index, node in enumerate(nodes)}
+        fields = self.SNAPSHOT_FIELDS
+        return encode_snapshot({
+            'fields': fields,
+            'taken_at': time.time(),
+            'pa_ids': [node.pa_id for node in nodes],
+            'domains': [node.domain for node in nodes],
+            'parents': [-1] + [position[node.parent] for node in nodes[1:]],
+            'initialized': [node.initialized for node in nodes],
+            'identities': [tuple([getattr(node.identity, name) for name in fields]) for node in nodes],
+            'placeholders': [
+                (position[node], placeholder.pa_id, placeholder.index,
+                 placeholder.snapshot, placeholder.members,
+                 placeholder.grants)
+                for node in nodes
+                for placeholder in node.placeholders.values()
+            ],
+            'spawn_errors': self.spawn_errors,
+        })
+    
+    @timed('node.restore')
+    @classmethod
+    async def restore(cls, data: bytes, manifest: Dict = None,
+                      authenticator: EntraIDAuthenticator = None) -> 'IntentONRootNode':
+        """Rebuild a tree from ``snapshot()`` output without initializing it
+        
+        Nodes, links and identities are recreated in a single pass. Identities
+        in this domain keep no session state, so nothing is authenticated
+        again. The manifest and authenticator are shared by every node and
+        loaded by the root when not given. Raises SnapshotError if the
+        snapshot cannot be used.
+        """
+        payload = decode_snapshot(data)
+        fields = tuple(payload.get('fields', ()))
+        if fields != cls.SNAPSHOT_FIELDS:
+            raise SnapshotError("Snapshot was taken with different identity fields")
+        
+        nodes = []
+        try:
+            records = zip(payload['pa_ids'], payload['domains'], payload['parents'],
+                          payload['initialized'], payload['identities'], strict=True)
+            for pa_id, domain, parent, initialized, values in records:
+                if parent >= len(nodes) or (parent < 0) != (not nodes):
+                    raise ValueError(f"bad parent index {parent}")
+                node = cls(domain=domain, pa_id=pa_id, manifest=manifest, authenticator=authenticator)
+                # Children share the root's manifest and authenticator
+                manifest, authenticator = node.manifest, node.authenticator
+                for name, value in zip(fields, values, strict=True):
+                    setattr(node.identity, name, value)
+                node.initialized = initialized
+                if nodes:
+                    owner = nodes[parent]
+                    owner._attach(node)
+                    owner.children.append(node)
+                nodes.append(node)
+            for parent, pa_id, index, snapshot, members, grants in (
+                payload.get('placeholders', ())
+            ):
+                if not 0 <= parent < len(nodes):
+                    raise ValueError(f"bad parent index {parent}")
+                nodes[parent]._add_placeholder(
+                    pa_id, index, snapshot, members, grants
+                )
+        except (KeyError, TypeError, ValueError) as e:
+            raise SnapshotError(f"Snapshot payload is corrupt: {e}")
+        if not nodes:
+            raise SnapshotError("Snapshot holds no nodes")
+        
+        root = nodes[0]
+        root.spawn_errors = list(payload.get('spawn_errors', ()))
+        root.log.info("Restored %d nodes from snapshot", len(nodes))
+        return root
 
 
 async def main():
@@ -384,20 +1570,45 @@ async def main():
     # Determine domain from environment or config
     domain = "Business"
     
-    # Create and initialize root node
-    root_node = IntentONRootNode(domain=domain)
-    success = await root_node.initialize()
+    metrics = _component('metrics')
+    metrics_config = os.environ.get('INTENTON_METRICS_CONFIG', METRICS_CONFIG)
+    if metrics is not None and metrics_config:
+        metrics.load_config(metrics_config)
+
+    # Warm start from the snapshot named by INTENTON_SNAPSHOT, if present
+    snapshot_path = os.environ.get('INTENTON_SNAPSHOT')
+    root_node = None
+    if snapshot_path and os.path.exists(snapshot_path):
+        try:
+            root_node = await IntentONRootNode.restore(read_snapshot(snapshot_path))
+            success = True
+        except SnapshotError as e:
+            logger.warning("Ignoring snapshot %s: %s", snapshot_path, e)
+        if root_node is not None and root_node.domain != domain:
+            logger.warning("Ignoring snapshot of a %s tree", root_node.domain)
+            root_node = None
+    
+    if root_node is None:
+        # Create and initialize root node
+        root_node = IntentONRootNode(domain=domain)
+        success = await root_node.initialize()
+    if success and snapshot_path:
+        write_snapshot(snapshot_path, root_node.snapshot())
+    if metrics is not None and metrics.METRICS.export_path:
+        metrics.METRICS.export()
     
     if success:
-        logger.info(f"IntentON {domain} root node is active")
-        logger.info(f"PA ID: {root_node.pa_id}")
-        logger.info(f"Microsoft Identity: {root_node.identity.microsoft_365_identity}")
-        logger.info(f"GitHub Identity: {root_node.identity.github_identity}")
-        logger.info(f"Roles: {root_node.identity.roles}")
+        logger.info("IntentON %s root node is active", domain)
+        logger.info("PA ID: %s", root_node.pa_id)
+        logger.info("Microsoft Identity: %s", root_node.identity.microsoft_365_identity)
+        logger.info("GitHub Identity: %s", root_node.identity.github_identity)
+        logger.info("Roles: %s", root_node.identity.roles)
     else:
         logger.error("Failed to initialize IntentON root node")
         exit(1)
 
 
 if __name__ == "__main__":
+    # Configure logging
+    configure_logging(level=logging.INFO)
     asyncio.run(main())
\ No newline at end of file
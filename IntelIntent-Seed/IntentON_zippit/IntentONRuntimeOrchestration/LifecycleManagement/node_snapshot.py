@@ -0,0 +1,90 @@
+"""
+IntentON Node Snapshots
+Compact binary container for warm-starting an initialized node tree: a
+fixed header followed by a zlib-compressed marshal payload
+"""
+
+import marshal
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Union
+
+MAGIC = b'IONSNAP\x00'
+# Bumped whenever the payload layout changes; older snapshots are rejected
+SNAPSHOT_VERSION = 1
+# Speed matters more than size for a file read once per start
+COMPRESSION_LEVEL = 1
+
+# magic, snapshot version, marshal version, crc32 of the compressed
+# payload, uncompressed payload size
+_HEADER = struct.Struct('<8sHHIQ')
+
+
+class SnapshotError(ValueError):
+    """Raised for snapshots that are corrupt, truncated or incompatible"""
+
+
+def encode_snapshot(payload: Dict[str, Any]) -> bytes:
+    """Serialize a snapshot payload built from plain Python values
+
+    Only types marshal supports (None, bools, numbers, strings, bytes,
+    tuples, lists, dicts and sets) may appear in the payload.
+    """
+    try:
+        raw = marshal.dumps(payload)
+    except ValueError as e:
+        raise SnapshotError(f"Snapshot payload is not serializable: {e}")
+    body = zlib.compress(raw, COMPRESSION_LEVEL)
+    header = _HEADER.pack(MAGIC, SNAPSHOT_VERSION, marshal.version,
+                          zlib.crc32(body), len(raw))
+    return header + body
+
+
+def decode_snapshot(data: bytes) -> Dict[str, Any]:
+    """Verify and deserialize a snapshot written by encode_snapshot
+
+    The checksum guards against truncated or damaged files; snapshots are
+    local state and must not be accepted from untrusted sources.
+    """
+    if len(data) < _HEADER.size:
+        raise SnapshotError("Snapshot is truncated")
+    magic, version, _, crc, size = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError("Not an IntentON node snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(
+            f"Unsupported snapshot version {version}, "
+            f"expected {SNAPSHOT_VERSION}"
+        )
+    body = memoryview(data)[_HEADER.size:]
+    if zlib.crc32(body) != crc:
+        raise SnapshotError("Snapshot checksum mismatch")
+    try:
+        payload = marshal.loads(zlib.decompress(body, bufsize=size))
+    except (zlib.error, ValueError, EOFError, TypeError) as e:
+        raise SnapshotError(f"Snapshot payload is corrupt: {e}")
+    if not isinstance(payload, dict):
+        raise SnapshotError("Snapshot payload is corrupt")
+    return payload
+
+
+def write_snapshot(path: Union[str, Path], data: bytes):
+    """Replace the snapshot at path atomically"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temporary, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+
+
+def read_snapshot(path: Union[str, Path]) -> bytes:
+    return Path(path).read_bytes()
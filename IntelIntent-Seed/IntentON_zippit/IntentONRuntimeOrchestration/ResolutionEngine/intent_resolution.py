@@ -1 +1,435 @@
-# intent_resolution.py
+"""
+IntentON Intent Resolution Engine
+Compiles an intent manifest into lookup tables once and resolves requests
+to intents with bound, typed parameters
+"""
+
+import math
+import re
+import threading
+from dataclasses import dataclass, field
+from datetime import date
+from typing import (
+    Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+)
+
+# Weight of a query token matching an intent's name, parameter names and
+# description respectively
+NAME_WEIGHT = 3.0
+PARAMETER_WEIGHT = 1.5
+DESCRIPTION_WEIGHT = 1.0
+
+# Query tokens at least this long also match indexed tokens they prefix,
+# at a reduced weight
+MIN_PREFIX_LENGTH = 3
+PREFIX_FACTOR = 0.5
+
+# Number of compiled manifests kept by get_resolver()
+RESOLVER_CACHE_SIZE = 32
+
+# Description words that say nothing about which intent is meant
+STOPWORDS = frozenset({
+    'a', 'an', 'and', 'based', 'for', 'in', 'intent', 'new', 'of', 'on',
+    'or', 'related', 'specified', 'the', 'to', 'with'
+})
+
+_WORD = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+')
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+_ASSIGNMENT = re.compile(
+    r'''([A-Za-z_][\w-]*)\s*[=:]\s*("[^"]*"|'[^']*'|[^\s;]+)'''
+)
+_TRUE = frozenset({'true', 'yes', 'y', '1', 'on'})
+_FALSE = frozenset({'false', 'no', 'n', '0', 'off'})
+
+
+def normalize_name(name: str) -> str:
+    """Fold an intent or parameter name so CreateProject, create_project
+    and "create project" share one key"""
+    return _NON_ALNUM.sub('', name.lower())
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase words, breaking camelCase and snake_case"""
+    return [word.lower() for word in _WORD.findall(text)]
+
+
+def parse_date(value: str) -> date:
+    """Parse a YYYY-MM-DD date
+
+    Only the fixed format is accepted, which keeps the check to a length
+    and two separator tests before the C-level ISO parser runs.
+    """
+    if len(value) != 10 or value[4] != '-' or value[7] != '-':
+        raise ValueError(f"expected YYYY-MM-DD, got {value!r}")
+    return date.fromisoformat(value)
+
+
+def _coerce_number(value: Any):
+    if isinstance(value, bool):
+        raise ValueError(f"expected a number, got {value!r}")
+    if isinstance(value, (int, float)):
+        return value
+    if not isinstance(value, str):
+        raise ValueError(f"expected a number, got {type(value).__name__}")
+    text = value.strip()
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def _coerce_integer(value: Any) -> int:
+    number = _coerce_number(value)
+    if isinstance(number, float):
+        if not number.is_integer():
+            raise ValueError(f"expected an integer, got {value!r}")
+        number = int(number)
+    return number
+
+
+def _coerce_date(value: Any) -> date:
+    if isinstance(value, date):
+        return value
+    if not isinstance(value, str):
+        raise ValueError(f"expected a date, got {type(value).__name__}")
+    return parse_date(value.strip())
+
+
+def _coerce_array(value: Any) -> List:
+    if isinstance(value, list):
+        return value
+    if isinstance(value, tuple):
+        return list(value)
+    if not isinstance(value, str):
+        raise ValueError(f"expected an array, got {type(value).__name__}")
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _coerce_boolean(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f"expected a boolean, got {value!r}")
+
+
+def _coerce_string(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return str(value)
+    raise ValueError(f"expected a string, got {type(value).__name__}")
+
+
+def _coerce_object(value: Any) -> Mapping:
+    if not isinstance(value, Mapping):
+        raise ValueError(f"expected an object, got {type(value).__name__}")
+    return value
+
+
+# Converters for the parameter types an intent manifest may declare. Text
+# from free-form requests is parsed; values of the wrong kind raise
+# ValueError. validate_manifest checks request parameters with this same
+# table, so a value binds here exactly when it validates there.
+COERCERS: Dict[str, Callable[[Any], Any]] = {
+    'string': _coerce_string,
+    'number': _coerce_number,
+    'integer': _coerce_integer,
+    'boolean': _coerce_boolean,
+    'date': _coerce_date,
+    'array': _coerce_array,
+    'object': _coerce_object,
+}
+
+
+def parameter_type(declared: Any) -> Tuple[Any, bool]:
+    """Return (type, required) for a parameter declaration
+
+    A declaration is a type name or an object with ``type`` (default
+    ``"string"``) and ``required`` (default true). Type names are matched
+    against COERCERS case-insensitively; anything else is returned as is.
+    """
+    required = True
+    if isinstance(declared, Mapping):
+        required = bool(declared.get('required', True))
+        declared = declared.get('type', 'string')
+    if isinstance(declared, str):
+        declared = declared.lower()
+    return declared, required
+
+
+@dataclass(frozen=True)
+class IntentMatch:
+    """An intent resolved from a request, with its bound parameters"""
+    intent: str
+    score: float
+    parameters: Dict[str, Any] = field(default_factory=dict)
+    missing: Tuple[str, ...] = ()
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def complete(self) -> bool:
+        """True when every declared parameter was bound without errors"""
+        return not self.missing and not self.errors
+
+
+@dataclass(frozen=True)
+class _CompiledIntent:
+    name: str
+    description: str
+    # Declared parameter names in manifest order with their coercers
+    parameters: Tuple[Tuple[str, Callable[[Any], Any]], ...]
+    # normalize_name(parameter) -> declared parameter index
+    parameter_keys: Mapping[str, int]
+
+
+class _TokenTrie:
+    """Prefix tree over indexed tokens
+
+    Every node carries the best posting weight of all tokens below it, so a
+    prefix lookup costs one step per character of the query token.
+    """
+
+    __slots__ = ('root',)
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, token: str, postings: Dict[int, float]):
+        node = self.root
+        for char in token:
+            node = node.setdefault(char, {})
+            best = node.setdefault('', {})
+            for intent_id, weight in postings.items():
+                if weight > best.get(intent_id, 0.0):
+                    best[intent_id] = weight
+
+    def lookup(self, prefix: str) -> Dict[int, float]:
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return {}
+        return node.get('', {})
+
+
+class IntentResolver:
+    """Resolves requests against an intent manifest compiled ahead of time
+
+    Construction builds a hash table of normalized intent names, an inverted
+    index from tokens of names, parameter names and descriptions to weighted
+    postings, and a token trie for prefix matches. Resolving a request only
+    touches the entries for its own tokens and never walks the intent list.
+
+    A request is either free text, where ``key=value`` or ``key: value``
+    pairs bind parameters, or a mapping with an ``intent`` (or ``name``)
+    and optional ``parameters`` and ``text``.
+    """
+
+    def __init__(self, manifest: Mapping[str, Any], min_score: float = 1.0):
+        self.min_score = min_score
+        self._intents: List[_CompiledIntent] = []
+        self._by_name: Dict[str, int] = {}
+        self._index: Dict[str, Dict[int, float]] = {}
+        self._trie = _TokenTrie()
+        self._compile(manifest.get('intents') or ())
+
+    @property
+    def intents(self) -> List[str]:
+        """Names of the compiled intents in manifest order"""
+        return [intent.name for intent in self._intents]
+
+    def _compile(self, intents: Iterable[Mapping[str, Any]]):
+        postings: Dict[str, Dict[int, float]] = {}
+
+        def add(intent_id: int, text: str, weight: float, skip=()):
+            for token in tokenize(text):
+                if token in skip:
+                    continue
+                entry = postings.setdefault(token, {})
+                if weight > entry.get(intent_id, 0.0):
+                    entry[intent_id] = weight
+
+        for spec in intents:
+            name = spec.get('name')
+            if not name:
+                continue
+            intent_id = len(self._intents)
+            description = spec.get('description') or ''
+            parameters = []
+            parameter_keys = {}
+            for parameter, declared in (spec.get('parameters') or {}).items():
+                kind, _ = parameter_type(declared)
+                # Unknown types, which validate_manifest rejects, bind as-is
+                coercer = COERCERS.get(kind, lambda v: v)
+                parameter_keys[normalize_name(parameter)] = len(parameters)
+                parameters.append((parameter, coercer))
+                add(intent_id, parameter, PARAMETER_WEIGHT)
+
+            self._intents.append(_CompiledIntent(
+                name, description, tuple(parameters), parameter_keys
+            ))
+            # The first declaration of a name wins
+            self._by_name.setdefault(normalize_name(name), intent_id)
+            add(intent_id, name, NAME_WEIGHT)
+            add(intent_id, description, DESCRIPTION_WEIGHT, skip=STOPWORDS)
+
+        # Tokens shared by many intents discriminate less between them
+        total = len(self._intents)
+        for token, entry in postings.items():
+            idf = math.log(1.0 + total / len(entry))
+            scaled = {i: weight * idf for i, weight in entry.items()}
+            self._index[token] = scaled
+            self._trie.insert(token, scaled)
+
+    def resolve(self, request: Any) -> Optional[IntentMatch]:
+        """Resolve one request, or return None if no intent matches"""
+        if isinstance(request, Mapping):
+            return self._resolve_mapping(request)
+        return self._resolve_text(str(request))
+
+    def resolve_many(self, requests: Iterable[Any]
+                     ) -> List[Optional[IntentMatch]]:
+        """Resolve a batch of requests, scoring repeated texts once"""
+        seen: Dict[str, Optional[IntentMatch]] = {}
+        results = []
+        for request in requests:
+            if isinstance(request, str):
+                if request not in seen:
+                    seen[request] = self._resolve_text(request)
+                results.append(seen[request])
+            else:
+                results.append(self.resolve(request))
+        return results
+
+    def _resolve_mapping(self, request: Mapping[str, Any]
+                         ) -> Optional[IntentMatch]:
+        name = request.get('intent') or request.get('name')
+        parameters = dict(request.get('parameters') or {})
+        # Assignments in the text bind even when the intent is named
+        text, assigned = self._split_assignments(request.get('text') or '')
+        for key, value in assigned.items():
+            parameters.setdefault(key, value)
+
+        intent_id = None
+        score = math.inf
+        if name:
+            intent_id = self._by_name.get(normalize_name(str(name)))
+            if intent_id is None:
+                text = f"{name} {text}"
+        if intent_id is None:
+            intent_id, score = self._score(text, parameters)
+            if intent_id is None:
+                return None
+        return self._bind(intent_id, score, parameters)
+
+    def _resolve_text(self, text: str) -> Optional[IntentMatch]:
+        intent_id = self._by_name.get(normalize_name(text))
+        if intent_id is not None:
+            return self._bind(intent_id, math.inf, {})
+        text, parameters = self._split_assignments(text)
+        intent_id, score = self._score(text, parameters)
+        if intent_id is None:
+            return None
+        return self._bind(intent_id, score, parameters)
+
+    @staticmethod
+    def _split_assignments(text: str) -> Tuple[str, Dict[str, str]]:
+        """Pull ``key=value`` pairs out of free text"""
+        parameters = {}
+
+        def take(match):
+            value = match.group(2)
+            if value[:1] in '"\'':
+                value = value[1:-1]
+            else:
+                value = value.rstrip(',')
+            parameters[match.group(1)] = value
+            return ' '
+        return _ASSIGNMENT.sub(take, text), parameters
+
+    def _score(self, text: str, parameters: Mapping[str, Any]
+               ) -> Tuple[Optional[int], float]:
+        scores: Dict[int, float] = {}
+        tokens = tokenize(text)
+        for key in parameters:
+            tokens.extend(tokenize(str(key)))
+        for token in set(tokens):
+            postings = self._index.get(token)
+            factor = 1.0
+            if postings is None:
+                if len(token) < MIN_PREFIX_LENGTH:
+                    continue
+                postings = self._trie.lookup(token)
+                factor = PREFIX_FACTOR
+            for intent_id, weight in postings.items():
+                weight *= factor
+                scores[intent_id] = scores.get(intent_id, 0.0) + weight
+
+        if not scores:
+            return None, 0.0
+        # Highest score wins; ties go to the intent declared first
+        intent_id = min(scores, key=lambda i: (-scores[i], i))
+        if scores[intent_id] < self.min_score:
+            return None, 0.0
+        return intent_id, scores[intent_id]
+
+    def _bind(self, intent_id: int, score: float,
+              values: Mapping[str, Any]) -> IntentMatch:
+        intent = self._intents[intent_id]
+        bound: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+        for key, value in values.items():
+            position = intent.parameter_keys.get(normalize_name(str(key)))
+            if position is None:
+                continue
+            parameter, coercer = intent.parameters[position]
+            try:
+                bound[parameter] = coercer(value)
+            except (TypeError, ValueError) as e:
+                errors[parameter] = str(e)
+        missing = tuple(
+            parameter for parameter, _ in intent.parameters
+            if parameter not in bound and parameter not in errors
+        )
+        return IntentMatch(intent.name, score, bound, missing, errors)
+
+
+_resolver_lock = threading.Lock()
+# id(manifest) -> (manifest, resolver); holding the manifest keeps its id
+# from being reused while the entry is cached
+_resolvers: Dict[int, Tuple[Mapping[str, Any], IntentResolver]] = {}
+
+
+def get_resolver(manifest: Mapping[str, Any]) -> IntentResolver:
+    """Return the shared resolver for a manifest object
+
+    Nodes loading the same manifest through the document cache receive the
+    same object, so the manifest is compiled once per process and version.
+    """
+    key = id(manifest)
+    with _resolver_lock:
+        cached = _resolvers.get(key)
+        if cached is not None and cached[0] is manifest:
+            return cached[1]
+    resolver = IntentResolver(manifest)
+    with _resolver_lock:
+        if len(_resolvers) >= RESOLVER_CACHE_SIZE:
+            del _resolvers[next(iter(_resolvers))]
+        _resolvers[key] = (manifest, resolver)
+    return resolver
+
+
+def resolve(manifest: Mapping[str, Any], request: Any
+            ) -> Optional[IntentMatch]:
+    """Resolve a request against a manifest using its shared resolver"""
+    return get_resolver(manifest).resolve(request)
+
+
+def resolve_many(manifest: Mapping[str, Any], requests: Iterable[Any]
+                 ) -> List[Optional[IntentMatch]]:
+    """Resolve a batch of requests against a manifest"""
+    return get_resolver(manifest).resolve_many(requests)
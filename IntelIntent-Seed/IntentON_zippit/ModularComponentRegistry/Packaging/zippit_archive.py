@@ -0,0 +1,251 @@
+"""
+IntentON Zippit Archive Loader
+Serves modules and documents straight from a memory-mapped zippit archive
+without extracting it
+"""
+
+import errno
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import json
+import mmap
+import os
+import sys
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+
+from zippit_pack import FORMAT_VERSION, TRAILER, ZIPPIT_MAGIC
+
+# zlib window bits that accept a gzip header and trailer
+_GZIP_WBITS = 31
+
+
+class ZippitArchive:
+    """Read-only view of a zippit archive
+
+    The archive is memory-mapped once and its central index parsed on open.
+    Members are located through the index and decompressed only when read,
+    so opening an archive costs one index parse regardless of its size.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path).resolve()
+        with open(self.path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Documents parsed from this archive stay valid until it changes
+        self.signature = (str(self.path), stat.st_mtime_ns, stat.st_size)
+
+        size = len(self._map)
+        if (size < len(ZIPPIT_MAGIC) + TRAILER.size
+                or self._map[:len(ZIPPIT_MAGIC)] != ZIPPIT_MAGIC):
+            self.close()
+            raise ValueError(f"{self.path} is not a zippit archive")
+        offset, length, magic = TRAILER.unpack_from(self._map,
+                                                    size - TRAILER.size)
+        if magic != ZIPPIT_MAGIC or offset + length > size - TRAILER.size:
+            self.close()
+            raise ValueError(f"{self.path} has a damaged trailer")
+        central = json.loads(self._map[offset:offset + length])
+        if central.get('version') != FORMAT_VERSION:
+            self.close()
+            raise ValueError(
+                f"{self.path}: unsupported zippit version "
+                f"{central.get('version')!r}"
+            )
+
+        self.compression = central.get('compression', 'gzip')
+        self.packages: Dict[str, Dict] = central.get('packages', {})
+        self.members: Dict[str, Dict] = central['members']
+        # Every directory that holds a member, for package lookups
+        self.directories = {
+            name.rsplit('/', depth)[0]
+            for name in self.members
+            for depth in range(1, name.count('/') + 1)
+        }
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.members
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.members)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+    def member_for(self, path: Union[str, Path]) -> Optional[str]:
+        """Map a path inside the archive, such as a module's __file__
+        sibling, to a member name"""
+        path = str(path).replace(os.sep, '/')
+        prefix = str(self.path).replace(os.sep, '/') + '/'
+        if not path.startswith(prefix):
+            return None
+        name = path[len(prefix):]
+        return name if name in self.members else None
+
+    def read(self, name: str) -> bytes:
+        """Return a member's contents, decompressing it on demand"""
+        try:
+            entry = self.members[name]
+        except KeyError:
+            raise KeyError(f"{name!r} is not in {self.path}") from None
+        start = entry['offset']
+        view = memoryview(self._map)[start:start + entry['size']]
+        try:
+            if self.compression == 'gzip':
+                return zlib.decompress(view, _GZIP_WBITS)
+            return bytes(view)
+        finally:
+            view.release()
+
+
+_archive_lock = threading.Lock()
+_archives: Dict[Path, ZippitArchive] = {}
+
+
+def open_archive(path: Union[str, Path]) -> ZippitArchive:
+    """Return the process-wide mapping of an archive
+
+    A rebuilt archive (different mtime or size) is mapped afresh; the old
+    mapping stays valid for modules already loaded from it.
+    """
+    resolved = Path(path).resolve()
+    stat = resolved.stat()
+    with _archive_lock:
+        archive = _archives.get(resolved)
+        if archive is None or archive.signature[1:] != (stat.st_mtime_ns,
+                                                        stat.st_size):
+            archive = ZippitArchive(resolved)
+            _archives[resolved] = archive
+        return archive
+
+
+class ZippitLoader(importlib.abc.InspectLoader):
+    """Loads one module from a zippit archive member
+
+    ``get_data`` serves any member addressed by archive path, which is how
+    a loaded module finds documents shipped next to its ``__file__``.
+    """
+
+    def __init__(self, archive: ZippitArchive, member: Optional[str],
+                 package_dir: Optional[str] = None):
+        self.archive = archive
+        self.member = member
+        self.package_dir = package_dir
+
+    def get_filename(self, fullname: str = None) -> str:
+        return f"{self.archive.path}/{self.member or self.package_dir}"
+
+    def is_package(self, fullname: str) -> bool:
+        return self.member is None or self.member.endswith('/__init__.py')
+
+    def get_source(self, fullname: str) -> str:
+        if self.member is None:
+            return ''
+        return importlib.util.decode_source(self.archive.read(self.member))
+
+    def get_code(self, fullname: str):
+        return compile(self.get_source(fullname), self.get_filename(),
+                       'exec', dont_inherit=True)
+
+    def get_data(self, path: Union[str, Path]) -> bytes:
+        member = self.archive.member_for(path)
+        if member is None:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT),
+                                    str(path))
+        return self.archive.read(member)
+
+
+def _module_spec(archive: ZippitArchive, fullname: str, base: str
+                 ) -> Optional[importlib.machinery.ModuleSpec]:
+    relative = fullname.replace('.', '/')
+    stem = f"{base}/{relative}" if base else relative
+    if f"{stem}.py" in archive:
+        loader = ZippitLoader(archive, f"{stem}.py")
+    elif f"{stem}/__init__.py" in archive:
+        loader = ZippitLoader(archive, f"{stem}/__init__.py", stem)
+    elif stem in archive.directories:
+        # A directory of modules without __init__.py is still importable
+        loader = ZippitLoader(archive, None, stem)
+    else:
+        return None
+    spec = importlib.util.spec_from_loader(
+        fullname, loader, origin=loader.get_filename(),
+        is_package=loader.is_package(fullname)
+    )
+    spec.has_location = True
+    if spec.submodule_search_locations is not None:
+        spec.submodule_search_locations.append(
+            f"{archive.path}/{loader.package_dir}"
+        )
+    return spec
+
+
+class ZippitFinder(importlib.abc.MetaPathFinder):
+    """Meta path finder resolving imports against one archive root
+
+    ``ZippitFinder(archive, 'Enterprise/RootNode')`` makes ``import
+    init_node`` load that root's init_node.py from the archive, and
+    ``import modules.core`` its modules/core package.
+    """
+
+    def __init__(self, archive: ZippitArchive, root: str = ''):
+        self.archive = archive
+        self.root = root.strip('/')
+
+    def find_spec(self, fullname: str, path=None, target=None):
+        return _module_spec(self.archive, fullname, self.root)
+
+    def invalidate_caches(self):
+        pass
+
+
+def install(archive_path: Union[str, Path], root: str = '') -> ZippitFinder:
+    """Map an archive and put a finder for one of its roots on sys.meta_path
+    """
+    finder = ZippitFinder(open_archive(archive_path), root)
+    sys.meta_path.insert(0, finder)
+    return finder
+
+
+def uninstall(finder: ZippitFinder):
+    """Remove a finder added by install()"""
+    if finder in sys.meta_path:
+        sys.meta_path.remove(finder)
+
+
+def load_module(archive_path: Union[str, Path], member: str,
+                name: Optional[str] = None):
+    """Import a single archive member under ``name``
+
+    Lets one process load several roots' init_node.py side by side, e.g.
+    ``load_module(path, 'Enterprise/RootNode/init_node.py',
+    'enterprise_init_node')``.
+    """
+    archive = open_archive(archive_path)
+    if member not in archive:
+        raise ImportError(f"{member!r} is not in {archive.path}")
+    name = name or member.rsplit('/', 1)[-1][:-len('.py')]
+    loader = ZippitLoader(archive, member)
+    spec = importlib.util.spec_from_loader(
+        name, loader, origin=loader.get_filename()
+    )
+    spec.has_location = True
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        sys.modules.pop(name, None)
+        raise
+    return module
+
@@ -0,0 +1,463 @@
+"""
+IntentON Zippit Packer
+Builds a single zippit archive from one or more node roots according to
+the packaging section of each root's zippit.json
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Archive layout:
+#   magic | member blobs | JSON central index | trailer
+# The trailer records where the index starts and how long it is, so a
+# reader seeks to the end, reads the index and maps members by offset.
+ZIPPIT_MAGIC = b'ZIPPIT01'
+TRAILER = struct.Struct('<QQ8s')
+FORMAT_VERSION = 1
+
+SPEC_FILE = 'zippit.json'
+DEFAULT_INCLUDE = ('**/*',)
+DEFAULT_EXCLUDE = ('**/__pycache__', '*.pyc', '.env')
+DEFAULT_COMPRESSLEVEL = 6
+
+# Below this many files a process pool costs more than it saves
+PARALLEL_THRESHOLD = 8
+
+COMPRESSIONS = ('gzip', 'none')
+
+DEFAULT_CACHE_DIR = '.zippit-cache'
+
+
+def _translate(pattern: str) -> str:
+    """Translate one glob into a regular expression body
+
+    ``**`` spans directories, ``*`` and ``?`` stay within one path segment
+    and ``[...]`` is a character class.
+    """
+    parts = []
+    i = 0
+    length = len(pattern)
+    while i < length:
+        char = pattern[i]
+        if pattern.startswith('**/', i):
+            parts.append('(?:[^/]+/)*')
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+            continue
+        if char == '*':
+            parts.append('[^/]*')
+        elif char == '?':
+            parts.append('[^/]')
+        elif char == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                parts.append(re.escape(char))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                parts.append('[' + body.replace('\\', '\\\\') + ']')
+                i = end
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    return ''.join(parts)
+
+
+def compile_patterns(patterns: Iterable[str], anchored: bool = True
+                     ) -> Optional['re.Pattern']:
+    """Compile globs into one regular expression matching any of them
+
+    Unanchored patterns without a slash match a name at any depth, the way
+    ``*.pyc`` or ``.env`` are meant in exclude lists.
+    """
+    bodies = []
+    for pattern in patterns:
+        pattern = pattern.strip().rstrip('/')
+        if pattern.startswith('./'):
+            pattern = pattern[2:]
+        if not pattern:
+            continue
+        if not anchored and '/' not in pattern:
+            pattern = '**/' + pattern
+        bodies.append(_translate(pattern))
+    if not bodies:
+        return None
+    return re.compile('(?:' + '|'.join(bodies) + r')\Z')
+
+
+def load_spec(root: Path) -> Dict[str, Any]:
+    """Return a root's parsed zippit.json, or {} if it has none"""
+    spec_path = root / SPEC_FILE
+    if not spec_path.exists():
+        return {}
+    with open(spec_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def collect_files(root: Path, include: Sequence[str] = DEFAULT_INCLUDE,
+                  exclude: Sequence[str] = DEFAULT_EXCLUDE
+                  ) -> List[Tuple[str, Path]]:
+    """Walk a root once and return (relative name, path) for every file
+    matched by ``include`` and not by ``exclude``
+
+    Excluded directories are pruned, so nothing below them is visited.
+    """
+    included = compile_patterns(include)
+    excluded = compile_patterns(exclude, anchored=False)
+    found = []
+    for directory, subdirs, files in os.walk(root):
+        relative = os.path.relpath(directory, root).replace(os.sep, '/')
+        prefix = '' if relative == '.' else relative + '/'
+        if excluded is not None:
+            subdirs[:] = [
+                name for name in subdirs
+                if not excluded.match(prefix + name)
+            ]
+        subdirs.sort()
+        for name in sorted(files):
+            member = prefix + name
+            if included is None or not included.match(member):
+                continue
+            if excluded is not None and excluded.match(member):
+                continue
+            found.append((member, Path(directory) / name))
+    return found
+
+
+@dataclass
+class CacheStats:
+    """Counters for one build against a BuildCache"""
+    files: int = 0
+    hits: int = 0
+    misses: int = 0
+    deduplicated: int = 0
+    # Raw bytes served from cached blobs instead of being compressed again
+    bytes_reused: int = 0
+    # Compressed bytes not written because identical content was stored
+    bytes_deduplicated: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'files': self.files,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hit_rate, 4),
+            'deduplicated': self.deduplicated,
+            'bytes_reused': self.bytes_reused,
+            'bytes_deduplicated': self.bytes_deduplicated,
+        }
+
+
+class BuildCache:
+    """Content-addressed store of compressed member blobs
+
+    Blobs live under ``blobs/<compression>-<level>/<sha256[:2]>/<sha256>``,
+    so a file is compressed once per content and settings no matter which
+    root or build it belongs to. ``files.json`` remembers the digest of
+    every packed path by mtime and size, which lets unchanged files skip
+    reading and hashing entirely.
+    """
+
+    INDEX_FILE = 'files.json'
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.stats = CacheStats()
+        self._files: Dict[str, List] = {}
+        try:
+            with open(self.directory / self.INDEX_FILE, 'r',
+                      encoding='utf-8') as f:
+                self._files = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def blob_dir(self, compression: str, compresslevel: int) -> Path:
+        return self.directory / 'blobs' / f"{compression}-{compresslevel}"
+
+    @staticmethod
+    def blob_path(blob_dir: Path, digest: str) -> Path:
+        return Path(blob_dir) / digest[:2] / digest
+
+    def known_digest(self, path: Path, stat: os.stat_result
+                     ) -> Optional[str]:
+        """Return the digest recorded for an unchanged file"""
+        entry = self._files.get(str(path))
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2]
+        return None
+
+    def remember(self, path: Path, stat: os.stat_result, digest: str):
+        self._files[str(path)] = [stat.st_mtime_ns, stat.st_size, digest]
+
+    def read(self, blob_dir: Path, digest: str) -> Optional[bytes]:
+        try:
+            return self.blob_path(blob_dir, digest).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def write(self, blob_dir: Path, digest: str, blob: bytes):
+        path = self.blob_path(blob_dir, digest)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f"{digest}.{os.getpid()}.tmp")
+        temporary.write_bytes(blob)
+        os.replace(temporary, path)
+
+    def save(self):
+        """Persist the path -> digest table"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / self.INDEX_FILE
+        temporary = path.with_name(path.name + '.tmp')
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(self._files, f, separators=(',', ':'))
+        os.replace(temporary, path)
+
+
+def _compress_file(job: Tuple[str, str, int, Optional[str]]
+                   ) -> Tuple[Optional[bytes], str, int]:
+    """Read and compress one file; runs in a worker process
+
+    Returns no blob when ``blob_dir`` already holds this content.
+    """
+    path, compression, compresslevel, blob_dir = job
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if blob_dir and BuildCache.blob_path(blob_dir, digest).exists():
+        return None, digest, len(data)
+    if compression == 'gzip':
+        # mtime=0 keeps archives byte-identical across rebuilds
+        blob = gzip.compress(data, compresslevel=compresslevel, mtime=0)
+    else:
+        blob = data
+    return blob, digest, len(data)
+
+
+def compress_files(paths: Sequence[Path], compression: str = 'gzip',
+                   compresslevel: int = DEFAULT_COMPRESSLEVEL,
+                   workers: Optional[int] = None,
+                   blob_dir: Optional[Path] = None
+                   ) -> Iterable[Tuple[Optional[bytes], str, int]]:
+    """Compress files in parallel, yielding (blob, sha256, length) in order
+
+    The blob is None for content already present in ``blob_dir``.
+    """
+    blob_dir = str(blob_dir) if blob_dir else None
+    jobs = [(str(path), compression, compresslevel, blob_dir)
+            for path in paths]
+    if workers == 1 or len(jobs) < PARALLEL_THRESHOLD:
+        yield from map(_compress_file, jobs)
+        return
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(_compress_file, jobs, chunksize=chunksize)
+
+
+def pack(roots: Sequence[Path], output: Path, base: Optional[Path] = None,
+         include: Optional[Sequence[str]] = None,
+         exclude: Optional[Sequence[str]] = None,
+         compresslevel: int = DEFAULT_COMPRESSLEVEL,
+         workers: Optional[int] = None,
+         cache: Optional[BuildCache] = None) -> Dict[str, Any]:
+    """Package node roots into one zippit archive and return its index
+
+    Members are named relative to ``base``, which defaults to the deepest
+    directory shared by all roots. ``include`` and ``exclude`` override the
+    globs of each root's zippit.json. Identical files are stored once and
+    share an offset in the index. With a ``cache``, unchanged content is
+    copied from previously compressed blobs instead of being compressed
+    again, and ``cache.stats`` describes the build.
+    """
+    roots = [Path(root).resolve() for root in roots]
+    if base is None:
+        base = Path(os.path.commonpath(roots))
+    base = Path(base).resolve()
+
+    packages = {}
+    members = []
+    compression = None
+    for root in roots:
+        spec = load_spec(root)
+        packaging = spec.get('packaging', {})
+        root_compression = packaging.get('compression', 'gzip')
+        if root_compression not in COMPRESSIONS:
+            raise ValueError(
+                f"{root / SPEC_FILE}: unsupported compression "
+                f"{root_compression!r}"
+            )
+        if compression not in (None, root_compression):
+            raise ValueError("All roots in one archive must share a "
+                             "compression method")
+        compression = root_compression
+
+        prefix = os.path.relpath(root, base).replace(os.sep, '/')
+        prefix = '' if prefix == '.' else prefix + '/'
+        packages[prefix.rstrip('/')] = {
+            key: spec[key] for key in ('name', 'version', 'domain', 'type')
+            if key in spec
+        }
+        for member, path in collect_files(
+            root,
+            include or packaging.get('include') or DEFAULT_INCLUDE,
+            exclude or packaging.get('exclude') or DEFAULT_EXCLUDE
+        ):
+            members.append((prefix + member, path))
+
+    members.sort()
+    names = [name for name, _ in members]
+    if len(set(names)) != len(names):
+        raise ValueError("Overlapping roots produce duplicate members")
+    compression = compression or 'gzip'
+
+    # Files whose digest is known and whose blob is cached need no work;
+    # everything else goes to the compression pool
+    blob_dir = None
+    known = [None] * len(members)
+    stats = [None] * len(members)
+    if cache is not None:
+        blob_dir = cache.blob_dir(compression, compresslevel)
+        for position, (_, path) in enumerate(members):
+            stats[position] = path.stat()
+            digest = cache.known_digest(path, stats[position])
+            if digest and cache.blob_path(blob_dir, digest).exists():
+                known[position] = digest
+    pending = [path for (_, path), digest in zip(members, known)
+               if digest is None]
+    compressed = compress_files(pending, compression, compresslevel,
+                                workers, blob_dir)
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    temporary = output.with_name(output.name + '.tmp')
+    index = {}
+    written = {}
+    with open(temporary, 'wb') as f:
+        f.write(ZIPPIT_MAGIC)
+        offset = len(ZIPPIT_MAGIC)
+        for position, (name, path) in enumerate(members):
+            blob = None
+            if known[position] is not None:
+                digest, length = known[position], stats[position].st_size
+            else:
+                blob, digest, length = next(compressed)
+
+            if cache is not None:
+                cache.stats.files += 1
+                cache.remember(path, stats[position], digest)
+                if blob is None:
+                    cache.stats.hits += 1
+                    cache.stats.bytes_reused += length
+                else:
+                    cache.stats.misses += 1
+                    cache.write(blob_dir, digest, blob)
+
+            if digest in written:
+                entry = dict(written[digest])
+                if cache is not None:
+                    cache.stats.deduplicated += 1
+                    cache.stats.bytes_deduplicated += entry['size']
+            else:
+                if blob is None:
+                    blob = cache.read(blob_dir, digest)
+                    if blob is None:
+                        raise FileNotFoundError(
+                            f"Cached blob {digest} for {path} disappeared"
+                        )
+                f.write(blob)
+                entry = {
+                    'offset': offset,
+                    'size': len(blob),
+                    'length': length,
+                    'sha256': digest,
+                }
+                written[digest] = entry
+                offset += len(blob)
+            index[name] = entry
+
+        central = {
+            'format': 'zippit',
+            'version': FORMAT_VERSION,
+            'compression': compression,
+            'packages': packages,
+            'members': index,
+        }
+        encoded = json.dumps(central, separators=(',', ':')).encode('utf-8')
+        f.write(encoded)
+        f.write(TRAILER.pack(offset, len(encoded), ZIPPIT_MAGIC))
+    os.replace(temporary, output)
+    if cache is not None:
+        cache.save()
+    return central
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build a zippit archive from node roots"
+    )
+    parser.add_argument('roots', nargs='+', type=Path,
+                        help="directories holding a zippit.json")
+    parser.add_argument('-o', '--output', type=Path, required=True)
+    parser.add_argument('--base', type=Path,
+                        help="directory member names are relative to")
+    parser.add_argument('--include', action='append',
+                        help="override the include globs of every root")
+    parser.add_argument('--exclude', action='append',
+                        help="override the exclude globs of every root")
+    parser.add_argument('--level', type=int, default=DEFAULT_COMPRESSLEVEL)
+    parser.add_argument('--workers', type=int,
+                        help="compression processes (default: all cores)")
+    parser.add_argument('--cache', type=Path,
+                        help="build cache directory (default: "
+                             f"{DEFAULT_CACHE_DIR} next to the output)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="compress every file without a build cache")
+    parser.add_argument('--stats', action='store_true',
+                        help="print build cache statistics as JSON")
+    args = parser.parse_args()
+
+    cache = None
+    if not args.no_cache:
+        cache = BuildCache(
+            args.cache or args.output.parent / DEFAULT_CACHE_DIR
+        )
+    central = pack(args.roots, args.output, args.base, args.include,
+                   args.exclude, args.level, args.workers, cache)
+    stored = {member['offset']: member for member in
+              central['members'].values()}.values()
+    raw = sum(member['length'] for member in central['members'].values())
+    packed = sum(member['size'] for member in stored)
+    print(f"{args.output}: {len(central['members'])} files, "
+          f"{raw:,} -> {packed:,} bytes")
+    if cache is not None:
+        stats = cache.stats
+        print(f"cache: {stats.hits}/{stats.hits + stats.misses} hits "
+              f"({stats.hit_rate:.0%}), {stats.bytes_reused:,} bytes not "
+              f"recompressed, {stats.deduplicated} duplicates saved "
+              f"{stats.bytes_deduplicated:,} bytes")
+        if args.stats:
+            print(json.dumps(stats.as_dict(), indent=2))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1 +1,686 @@
-# audit_log.py
+"""
+IntentON Audit Trail Store
+Bounded in-memory storage and a durable append-only journal for access
+control audit entries
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import (
+    Any, Callable, Dict, Iterator, List, Optional, Sequence, Union
+)
+
+logger = logging.getLogger(__name__)
+
+# Default retention for a single node's audit store
+DEFAULT_MAX_ENTRIES = 10000
+
+# Journal defaults: segment rotation size, sparse index spacing and the
+# group commit window of the background flusher
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+DEFAULT_INDEX_BYTES = 64 * 1024
+DEFAULT_FLUSH_INTERVAL = 0.05
+DEFAULT_BATCH_SIZE = 1024
+
+# Segment record: payload length, timestamp, then the JSON payload
+_RECORD_HEADER = struct.Struct('<Id')
+# Sparse index entry: timestamp of the record at a segment offset
+_INDEX_ENTRY = struct.Struct('<dQ')
+
+# The ring starts small and doubles up to max_entries
+_INITIAL_CAPACITY = 64
+
+_DECODER = json.JSONDecoder()
+
+TimeValue = Union[datetime, float, int, None]
+
+
+def as_timestamp(value: TimeValue) -> Optional[float]:
+    """Convert a datetime (naive values are UTC) or epoch seconds to a float"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def format_timestamp(timestamp: float) -> str:
+    """Render epoch seconds as the naive UTC ISO string used in audit entries"""
+    moment = datetime.fromtimestamp(timestamp, timezone.utc)
+    return moment.replace(tzinfo=None).isoformat()
+
+
+def _make_entry(timestamp: float, pa_id: str, action: str, resource: str,
+                context: Optional[Dict], roles: Sequence[str]) -> Dict:
+    return {
+        "timestamp": format_timestamp(timestamp),
+        "pa_id": pa_id,
+        "action": action,
+        "resource": resource,
+        "context": context or {},
+        "roles": list(roles)
+    }
+
+
+class AuditStore:
+    """Ring buffer of audit entries ordered by numeric timestamp
+
+    Entries arrive in time order, so range queries bisect the timestamp array
+    rather than scanning every entry. Retention is bounded by ``max_entries``
+    and optionally by ``max_age`` in seconds; the oldest entries go first.
+
+    With a ``journal`` every entry is also appended to disk. A query
+    reaching further back than the retained entries reads the journal up to
+    the oldest retained entry and memory from there on, and only when the
+    journal holds older entries for the queried pa_id.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_age: float = None,
+                 clock: Callable[[], float] = time.time,
+                 journal: 'AuditJournal' = None):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._clock = clock
+        capacity = min(_INITIAL_CAPACITY, max_entries)
+        self._timestamps = array('d', bytes(8 * capacity))
+        self._records = [None] * capacity
+        self._head = 0
+        self._size = 0
+        self._last = float('-inf')
+        self.journal = journal
+        # Every entry newer than the horizon is still held in memory; older
+        # ones may only exist in the journal
+        self._horizon = clock() if journal is not None else float('-inf')
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, pa_id: str, action: str, resource: str = None,
+               context: Dict = None, roles: Sequence[str] = (),
+               timestamp: float = None) -> float:
+        """Record an access attempt and return its timestamp"""
+        timestamp = self._clock() if timestamp is None else timestamp
+        # Keep the buffer sorted even if the wall clock steps backwards
+        if timestamp < self._last:
+            timestamp = self._last
+        self._last = timestamp
+
+        capacity = len(self._records)
+        if self._size == capacity and capacity < self.max_entries:
+            self._grow()
+            capacity = len(self._records)
+
+        if self._size == capacity:
+            # Full: overwrite the oldest entry
+            self._horizon = max(self._horizon, self._timestamps[self._head])
+            index = self._head
+            self._head = (self._head + 1) % capacity
+        else:
+            index = (self._head + self._size) % capacity
+            self._size += 1
+
+        if not isinstance(roles, tuple):
+            roles = tuple(roles)
+        self._timestamps[index] = timestamp
+        self._records[index] = (pa_id, action, resource, context or None,
+                                roles)
+
+        if self.max_age is not None:
+            self._expire(timestamp - self.max_age)
+        if self.journal is not None:
+            self.journal.append(pa_id, action, resource, context, roles,
+                                timestamp=timestamp)
+        return timestamp
+
+    def query(self, start_time: TimeValue = None,
+              end_time: TimeValue = None,
+              pa_id: str = None) -> List[Dict[str, Any]]:
+        """Return entries with start_time <= timestamp <= end_time"""
+        if self.max_age is not None:
+            self._expire(self._clock() - self.max_age)
+
+        start = as_timestamp(start_time)
+        end = as_timestamp(end_time)
+        horizon = self._horizon
+        entries = []
+        if self.journal is not None and (
+            start is None or start <= horizon
+        ) and self.journal.holds_before(horizon, pa_id):
+            # Entries up to the horizon come from disk, newer ones from the
+            # ring, which journals everything it holds
+            if end is not None and end <= horizon:
+                return self.journal.query(start, end, pa_id=pa_id)
+            entries = self.journal.query(start, horizon, pa_id=pa_id)
+            first = self._bisect(horizon, bisect_right)
+        else:
+            first = 0 if start is None else self._bisect(start, bisect_left)
+        stop = self._size if end is None else self._bisect(end, bisect_right)
+
+        capacity = len(self._records)
+        for position in range(first, stop):
+            index = (self._head + position) % capacity
+            if pa_id is None or self._records[index][0] == pa_id:
+                entries.append(self._entry(index))
+        return entries
+
+    def clear(self):
+        """Drop every entry"""
+        if self.journal is not None:
+            self._horizon = max(self._horizon, self._last)
+        self._records = [None] * len(self._records)
+        self._head = 0
+        self._size = 0
+
+    def _entry(self, index: int) -> Dict[str, Any]:
+        return _make_entry(self._timestamps[index], *self._records[index])
+
+    def _segments(self):
+        """Physical (start, stop) ranges of the ring in logical order"""
+        capacity = len(self._records)
+        end = self._head + self._size
+        if end <= capacity:
+            return ((self._head, end),)
+        return ((self._head, capacity), (0, end - capacity))
+
+    def _bisect(self, value: float, find) -> int:
+        """Logical position of value using bisect_left or bisect_right"""
+        offset = 0
+        for start, stop in self._segments():
+            position = find(self._timestamps, value, start, stop)
+            if position < stop:
+                return offset + position - start
+            offset += stop - start
+        return offset
+
+    def _expire(self, cutoff: float):
+        """Drop entries older than cutoff from the head of the ring"""
+        capacity = len(self._records)
+        while self._size and self._timestamps[self._head] < cutoff:
+            self._horizon = max(self._horizon, self._timestamps[self._head])
+            self._records[self._head] = None
+            self._head = (self._head + 1) % capacity
+            self._size -= 1
+
+    def _grow(self):
+        """Double the ring capacity, unrolling it so the head is at zero"""
+        capacity = min(len(self._records) * 2, self.max_entries)
+        timestamps = array('d', bytes(8 * capacity))
+        records = [None] * capacity
+        position = 0
+        for start, stop in self._segments():
+            count = stop - start
+            timestamps[position:position + count] = self._timestamps[start:stop]
+            records[position:position + count] = self._records[start:stop]
+            position += count
+        self._timestamps = timestamps
+        self._records = records
+        self._head = 0
+
+
+class _Segment:
+    """One append-only segment file with its sparse timestamp index
+
+    ``pa_ids`` maps every pa_id in the segment to the timestamp and offset
+    of its first record. It is persisted as JSON lines in the ``.ids`` file
+    next to the segment, and only rebuilt from the records if that file is
+    missing or damaged.
+    """
+
+    __slots__ = ('path', 'index_path', 'ids_path', 'size', 'first', 'last',
+                 'index_timestamps', 'index_offsets', 'last_indexed',
+                 'pa_ids')
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.index_path = path.with_suffix('.idx')
+        self.ids_path = path.with_suffix('.ids')
+        self.size = 0
+        self.first = None
+        self.last = None
+        self.index_timestamps = array('d')
+        self.index_offsets = array('Q')
+        self.last_indexed = None
+        self.pa_ids: Optional[Dict[str, tuple]] = None
+
+
+def _encode_pa_id(pa_id: str, timestamp: float, offset: int) -> bytes:
+    """One line of a segment's .ids file"""
+    return json.dumps([pa_id, timestamp, offset],
+                      separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def _record_pa_id(buffer, begin: int, finish: int) -> str:
+    # The payload is a JSON array led by the pa_id
+    return _DECODER.raw_decode(buffer[begin:finish].decode('utf-8'), 1)[0]
+
+
+def _iter_records(buffer, start: int, stop: int):
+    """Yield (offset, timestamp, payload_start, payload_end) from a segment
+
+    Stops at the first incomplete record, which marks a torn write.
+    """
+    offset = start
+    header_size = _RECORD_HEADER.size
+    while offset + header_size <= stop:
+        length, timestamp = _RECORD_HEADER.unpack_from(buffer, offset)
+        payload_start = offset + header_size
+        payload_end = payload_start + length
+        if payload_end > stop:
+            return
+        yield offset, timestamp, payload_start, payload_end
+        offset = payload_end
+
+
+class AuditJournal:
+    """Durable append-only audit log made of rotating segment files
+
+    ``append`` only encodes the record and queues it. A background flusher
+    writes each batch with one write call and commits it with one fsync, so
+    callers never wait on the disk. Segments rotate at ``max_segment_bytes``
+    and keep a sparse timestamp index every ``index_bytes``, so a time range
+    query maps the segment files and only touches pages in the range. A
+    query for one pa_id skips segments without it, according to the pa_id
+    table each segment keeps on disk, and starts each scan at its first
+    record. Reads never flush; entries still queued are served from memory.
+    """
+
+    def __init__(self, directory: Union[str, Path],
+                 max_segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+                 index_bytes: int = DEFAULT_INDEX_BYTES,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_segments: int = None,
+                 fsync: bool = True):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_segment_bytes = max_segment_bytes
+        self.index_bytes = index_bytes
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_segments = max_segments
+        self.fsync = fsync
+
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._data_file = None
+        self._index_file = None
+        self._ids_file = None
+
+        paths = sorted(self.directory.glob('audit-*.seg'))
+        self._segments = [
+            self._load_segment(path, recover=path == paths[-1])
+            for path in paths
+        ]
+        self._last = max(
+            (s.last for s in self._segments if s.last is not None),
+            default=float('-inf')
+        )
+
+        self._flusher = threading.Thread(
+            target=self._run, name='audit-journal-flusher', daemon=True
+        )
+        self._flusher.start()
+
+    def append(self, pa_id: str, action: str, resource: str = None,
+               context: Dict = None, roles: Sequence[str] = (),
+               timestamp: float = None) -> float:
+        """Queue an entry for the next group commit and return its time"""
+        payload = json.dumps(
+            [pa_id, action, resource, context or None, list(roles)],
+            separators=(',', ':'), default=str
+        ).encode('utf-8')
+        with self._pending_lock:
+            if self._closed:
+                raise ValueError("audit journal is closed")
+            if timestamp is None:
+                timestamp = time.time()
+            if timestamp < self._last:
+                timestamp = self._last
+            self._last = timestamp
+            self._pending.append((timestamp, pa_id, payload))
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.set()
+        return timestamp
+
+    def flush(self):
+        """Write and fsync every queued entry before returning"""
+        with self._io_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if batch:
+                self._write_batch(batch)
+
+    def close(self):
+        """Stop the flusher and commit whatever is still queued"""
+        with self._pending_lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wakeup.set()
+        self._flusher.join()
+        self.flush()
+        with self._io_lock:
+            self._close_active()
+
+    def query(self, start_time: TimeValue = None, end_time: TimeValue = None,
+              pa_id: str = None) -> List[Dict[str, Any]]:
+        """Return entries with start_time <= timestamp <= end_time"""
+        return list(self.scan(start_time, end_time, pa_id))
+
+    def holds_before(self, timestamp: float, pa_id: str = None) -> bool:
+        """Whether any entry (for pa_id) is timestamped at or before
+        timestamp"""
+        with self._io_lock:
+            for segment in self._segments:
+                if segment.first is None or segment.first > timestamp:
+                    break
+                if pa_id is None:
+                    return True
+                first = self._segment_pa_ids(segment).get(pa_id)
+                if first is not None and first[0] <= timestamp:
+                    return True
+            pending = self._queued()
+        return any(
+            queued <= timestamp and (pa_id is None or queued_pa_id == pa_id)
+            for queued, queued_pa_id, _ in pending
+        )
+
+    def scan(self, start_time: TimeValue = None, end_time: TimeValue = None,
+             pa_id: str = None) -> Iterator[Dict[str, Any]]:
+        """Stream matching entries from memory-mapped segments, then from
+        the queue"""
+        start = as_timestamp(start_time)
+        end = as_timestamp(end_time)
+        # Payloads start with the JSON-encoded pa_id, so other identities'
+        # records are skipped without decoding them
+        prefix = None
+        if pa_id is not None:
+            prefix = json.dumps([pa_id])[:-1].encode('utf-8') + b','
+
+        segments = []
+        with self._io_lock:
+            for s in self._segments:
+                if s.first is None or (start is not None and s.last < start):
+                    continue
+                if end is not None and s.first > end:
+                    break
+                offset = 0
+                if pa_id is not None:
+                    first = self._segment_pa_ids(s).get(pa_id)
+                    if first is None:
+                        continue
+                    offset = first[1]
+                segments.append((s.path, s.size, offset,
+                                 s.index_timestamps[:], s.index_offsets[:]))
+            # Everything not yet in the segments above is still queued
+            pending = self._queued()
+
+        for path, size, offset, index_ts, index_offsets in segments:
+            if start is not None:
+                # Resume from the last indexed record before the range
+                position = bisect_left(index_ts, start)
+                if position:
+                    offset = max(offset, index_offsets[position - 1])
+            with open(path, 'rb') as handle, mmap.mmap(
+                handle.fileno(), size, access=mmap.ACCESS_READ
+            ) as mapped:
+                for _, timestamp, begin, finish in _iter_records(
+                    mapped, offset, size
+                ):
+                    if start is not None and timestamp < start:
+                        continue
+                    if end is not None and timestamp > end:
+                        return
+                    if prefix is not None and (
+                        mapped[begin:begin + len(prefix)] != prefix
+                    ):
+                        continue
+                    record = json.loads(mapped[begin:finish])
+                    yield _make_entry(timestamp, *record)
+
+        for timestamp, queued_pa_id, payload in pending:
+            if start is not None and timestamp < start:
+                continue
+            if end is not None and timestamp > end:
+                return
+            if pa_id is None or queued_pa_id == pa_id:
+                yield _make_entry(timestamp, *json.loads(payload))
+
+    def _queued(self) -> List:
+        """Entries waiting for the flusher; callers hold _io_lock, so none
+        of them is being written"""
+        with self._pending_lock:
+            return self._pending[:]
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Audit journal flush failed")
+
+    def _write_batch(self, batch: List):
+        position = 0
+        while position < len(batch):
+            segment = self._active_segment()
+            data = bytearray()
+            index = bytearray()
+            ids = bytearray()
+            offset = segment.size
+            while position < len(batch) and (
+                offset < self.max_segment_bytes
+            ):
+                timestamp, pa_id, payload = batch[position]
+                if segment.last_indexed is None or (
+                    offset - segment.last_indexed >= self.index_bytes
+                ):
+                    index += _INDEX_ENTRY.pack(timestamp, offset)
+                    segment.index_timestamps.append(timestamp)
+                    segment.index_offsets.append(offset)
+                    segment.last_indexed = offset
+                if pa_id not in segment.pa_ids:
+                    segment.pa_ids[pa_id] = (timestamp, offset)
+                    ids += _encode_pa_id(pa_id, timestamp, offset)
+                data += _RECORD_HEADER.pack(len(payload), timestamp)
+                data += payload
+                offset += _RECORD_HEADER.size + len(payload)
+                if segment.first is None:
+                    segment.first = timestamp
+                segment.last = timestamp
+                position += 1
+
+            # Index entries are only committed after the data they point to
+            # and the pa_ids it holds, so recovery only has to look for
+            # pa_ids missing from .ids after the last index entry
+            self._commit(self._data_file, data)
+            if ids:
+                self._commit(self._ids_file, ids)
+            if index:
+                self._commit(self._index_file, index)
+            segment.size = offset
+
+    def _commit(self, handle, data: bytes):
+        handle.write(data)
+        handle.flush()
+        if self.fsync:
+            os.fsync(handle.fileno())
+
+    def _active_segment(self) -> _Segment:
+        segment = self._segments[-1] if self._segments else None
+        if segment is not None and segment.size < self.max_segment_bytes:
+            if self._data_file is None:
+                self._open_active(segment)
+            return segment
+
+        sequence = int(segment.path.stem.split('-')[1]) + 1 if segment else 0
+        segment = _Segment(self.directory / f"audit-{sequence:08d}.seg")
+        segment.pa_ids = {}
+        self._segments.append(segment)
+        self._open_active(segment)
+        if self.max_segments and len(self._segments) > self.max_segments:
+            for expired in self._segments[:-self.max_segments]:
+                expired.path.unlink(missing_ok=True)
+                expired.index_path.unlink(missing_ok=True)
+                expired.ids_path.unlink(missing_ok=True)
+            del self._segments[:-self.max_segments]
+        return segment
+
+    def _open_active(self, segment: _Segment):
+        self._close_active()
+        # Appends extend the table, so it must be complete first
+        self._segment_pa_ids(segment)
+        self._data_file = open(segment.path, 'ab')
+        self._index_file = open(segment.index_path, 'ab')
+        self._ids_file = open(segment.ids_path, 'ab')
+
+    def _close_active(self):
+        for handle in (self._data_file, self._index_file, self._ids_file):
+            if handle is not None:
+                handle.close()
+        self._data_file = None
+        self._index_file = None
+        self._ids_file = None
+
+    def _segment_pa_ids(self, segment: _Segment) -> Dict[str, tuple]:
+        """Return a segment's pa_id table, rebuilding it from the records
+        and persisting it if its .ids file was missing; callers hold
+        _io_lock"""
+        if segment.pa_ids is None:
+            pa_ids = {}
+            if segment.size:
+                with open(segment.path, 'rb') as handle, mmap.mmap(
+                    handle.fileno(), segment.size, access=mmap.ACCESS_READ
+                ) as mapped:
+                    for offset, timestamp, begin, finish in _iter_records(
+                        mapped, 0, segment.size
+                    ):
+                        pa_ids.setdefault(
+                            _record_pa_id(mapped, begin, finish),
+                            (timestamp, offset)
+                        )
+            segment.ids_path.write_bytes(b''.join(
+                _encode_pa_id(pa_id, timestamp, offset)
+                for pa_id, (timestamp, offset) in pa_ids.items()
+            ))
+            segment.pa_ids = pa_ids
+        return segment.pa_ids
+
+    @staticmethod
+    def _read_pa_ids(segment: _Segment) -> Optional[Dict[str, tuple]]:
+        """Load a segment's .ids file, dropping a torn line and entries
+        past the end of the segment; None if it must be rebuilt"""
+        if not segment.ids_path.exists():
+            return None
+        data = segment.ids_path.read_bytes()
+        pa_ids = {}
+        kept = 0
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b'\n'):
+                break
+            try:
+                pa_id, timestamp, offset = json.loads(line)
+            except (TypeError, ValueError):
+                logger.warning("Rebuilding damaged audit pa_id table %s",
+                               segment.ids_path)
+                segment.ids_path.unlink()
+                return None
+            if offset >= segment.size:
+                break
+            pa_ids[pa_id] = (timestamp, offset)
+            kept += len(line)
+        if kept < len(data):
+            os.truncate(segment.ids_path, kept)
+        return pa_ids
+
+    def _load_segment(self, path: Path, recover: bool) -> _Segment:
+        """Load a segment's index, rebuilding it or the tail if needed"""
+        segment = _Segment(path)
+        segment.size = path.stat().st_size
+
+        entries = b''
+        if segment.index_path.exists():
+            entries = segment.index_path.read_bytes()
+        whole = len(entries) // _INDEX_ENTRY.size * _INDEX_ENTRY.size
+        for timestamp, offset in _INDEX_ENTRY.iter_unpack(entries[:whole]):
+            if offset >= segment.size:
+                break
+            segment.index_timestamps.append(timestamp)
+            segment.index_offsets.append(offset)
+        kept = len(segment.index_offsets) * _INDEX_ENTRY.size
+        if len(entries) > kept:
+            # Entries appended after a torn one would be misaligned
+            logger.warning("Truncating torn audit index in %s",
+                           segment.index_path)
+            os.truncate(segment.index_path, kept)
+
+        if segment.size == 0:
+            segment.pa_ids = self._read_pa_ids(segment)
+            return segment
+
+        # Scan from the last indexed record, or the whole file if the index
+        # was lost, to find the newest timestamp and any torn tail. pa_ids
+        # are committed before the index, so only records after its last
+        # entry can be missing from the .ids file
+        scan_from = segment.index_offsets[-1] if segment.index_offsets else 0
+        end = scan_from
+        rebuild = not segment.index_offsets
+        tail_ids = {}
+        with open(path, 'rb') as handle, mmap.mmap(
+            handle.fileno(), segment.size, access=mmap.ACCESS_READ
+        ) as mapped:
+            for offset, timestamp, begin, end in _iter_records(
+                mapped, scan_from, segment.size
+            ):
+                if recover:
+                    tail_ids.setdefault(_record_pa_id(mapped, begin, end),
+                                        (timestamp, offset))
+                if rebuild and (
+                    not segment.index_offsets
+                    or offset - segment.index_offsets[-1] >= self.index_bytes
+                ):
+                    segment.index_timestamps.append(timestamp)
+                    segment.index_offsets.append(offset)
+                segment.last = timestamp
+
+        if segment.index_timestamps:
+            segment.first = segment.index_timestamps[0]
+            segment.last_indexed = segment.index_offsets[-1]
+        if rebuild:
+            segment.index_path.write_bytes(b''.join(
+                _INDEX_ENTRY.pack(timestamp, offset)
+                for timestamp, offset in zip(segment.index_timestamps,
+                                             segment.index_offsets)
+            ))
+        if end < segment.size and recover:
+            logger.warning("Truncating torn audit record in %s", path)
+            os.truncate(path, end)
+            segment.size = end
+
+        segment.pa_ids = self._read_pa_ids(segment)
+        if segment.pa_ids is not None:
+            missing = b''
+            for pa_id, (timestamp, offset) in tail_ids.items():
+                if pa_id not in segment.pa_ids:
+                    segment.pa_ids[pa_id] = (timestamp, offset)
+                    missing += _encode_pa_id(pa_id, timestamp, offset)
+            if missing:
+                with open(segment.ids_path, 'ab') as f:
+                    f.write(missing)
+        return segment
@@ -1 +1,195 @@
-# intent_engine.py
+"""
+IntentON Semantic Intent Engine
+Matches free-text utterances to manifest intents using hashed character
+n-gram vectors, scored in batches with NumPy
+"""
+
+import re
+import threading
+from typing import Any, Dict, List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+# Width of the hashed feature space and the character n-gram sizes
+DEFAULT_DIMENSIONS = 4096
+DEFAULT_NGRAM_RANGE = (2, 4)
+
+# Upper bound on the dense utterance block materialized per matmul
+CHUNK_BYTES = 16 * 1024 * 1024
+
+# Number of compiled manifests kept by get_engine()
+ENGINE_CACHE_SIZE = 32
+
+_CAMEL = re.compile(r'(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])')
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+# Polynomial hash over n-gram bytes followed by a 64-bit finalizer; uint64
+# arithmetic wraps, which is the intended modulo 2**64
+_HASH_BASE = np.uint64(1099511628211)
+_HASH_MIX = np.uint64(0x9E3779B97F4A7C15)
+_HASH_SHIFT = np.uint64(29)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase text, split camelCase and snake_case words and pad it"""
+    words = _NON_ALNUM.sub(' ', _CAMEL.sub(' ', text).lower()).split()
+    return f" {' '.join(words)} "
+
+
+def hash_ngrams(texts: Sequence[str], dimensions: int = DEFAULT_DIMENSIONS,
+                ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE
+                ) -> np.ndarray:
+    """Embed texts as L2-normalized rows of signed n-gram counts
+
+    All texts are packed into one byte buffer and every n-gram of every
+    text is hashed in the same vectorized pass.
+    """
+    encoded = [normalize_text(text).encode('utf-8') for text in texts]
+    count = len(encoded)
+    matrix = np.zeros((count, dimensions), dtype=np.float32)
+    if not count:
+        return matrix
+
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=count)
+    ends = np.cumsum(lengths)
+    buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    owner = np.repeat(np.arange(count), lengths)
+    positions = np.arange(buffer.size)
+    remaining = ends[owner] - positions
+
+    rows = []
+    columns = []
+    signs = []
+    low, high = ngram_range
+    for size in range(low, high + 1):
+        # An n-gram is valid if it ends inside the text it starts in
+        valid = remaining >= size
+        starts = positions[valid]
+        if not starts.size:
+            continue
+        hashed = np.full(starts.size, size, dtype=np.uint64)
+        for offset in range(size):
+            hashed = hashed * _HASH_BASE + buffer[starts + offset]
+        hashed = hashed * _HASH_MIX
+        hashed ^= hashed >> _HASH_SHIFT
+        rows.append(owner[valid])
+        columns.append((hashed % np.uint64(dimensions)).astype(np.int64))
+        # The top bit picks the sign so collisions tend to cancel out
+        signs.append(np.where(
+            hashed >> np.uint64(63), np.float32(-1), np.float32(1)
+        ))
+
+    if rows:
+        flat = np.concatenate(rows) * dimensions + np.concatenate(columns)
+        np.add.at(matrix.reshape(-1), flat, np.concatenate(signs))
+    norms = np.sqrt(np.einsum('ij,ij->i', matrix, matrix))[:, None]
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+class IntentEngine:
+    """Scores utterances against the intents of one manifest
+
+    Each intent is embedded once from its name, description and parameter
+    names into a read-only matrix. Scoring embeds a whole batch and takes
+    cosine similarities with one matrix multiply per block of utterances,
+    followed by a vectorized top-k selection.
+    """
+
+    def __init__(self, manifest: Mapping[str, Any],
+                 dimensions: int = DEFAULT_DIMENSIONS,
+                 ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE):
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+        names = []
+        documents = []
+        for spec in manifest.get('intents') or ():
+            name = spec.get('name')
+            if not name:
+                continue
+            names.append(name)
+            # The name is repeated so it outweighs a long description
+            documents.append(' '.join((
+                name, name, spec.get('description') or '',
+                *(spec.get('parameters') or {})
+            )))
+        self.intents: Tuple[str, ...] = tuple(names)
+        self.matrix = hash_ngrams(documents, dimensions, ngram_range)
+        self.matrix.flags.writeable = False
+        # Rows per matmul so a dense utterance block stays under CHUNK_BYTES
+        self._chunk_rows = max(1, CHUNK_BYTES // (dimensions * 4))
+
+    def embed(self, utterances: Sequence[str]) -> np.ndarray:
+        """Embed utterances into the engine's feature space"""
+        return hash_ngrams(utterances, self.dimensions, self.ngram_range)
+
+    def score(self, utterances: Sequence[str]) -> np.ndarray:
+        """Return the (utterances x intents) cosine similarity matrix"""
+        if isinstance(utterances, str):
+            utterances = [utterances]
+        scores = np.empty((len(utterances), len(self.intents)),
+                          dtype=np.float32)
+        step = self._chunk_rows
+        for start in range(0, len(utterances), step):
+            block = self.embed(utterances[start:start + step])
+            np.matmul(block, self.matrix.T, out=scores[start:start + step])
+        return scores
+
+    def top_k(self, utterances: Sequence[str], k: int = 3
+              ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (intent indices, scores) of the k best intents per row,
+        best first"""
+        scores = self.score(utterances)
+        k = min(k, scores.shape[1])
+        if k <= 0:
+            empty = np.empty((scores.shape[0], 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        if k < scores.shape[1]:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(k), scores.shape)
+        picked = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-picked, axis=1, kind='stable')
+        return (np.take_along_axis(candidates, order, axis=1),
+                np.take_along_axis(picked, order, axis=1))
+
+    def match(self, utterance: str, k: int = 3,
+              min_score: float = 0.0) -> List[Tuple[str, float]]:
+        """Return the best (intent, score) pairs for one utterance"""
+        return self.match_many([utterance], k, min_score)[0]
+
+    def match_many(self, utterances: Sequence[str], k: int = 1,
+                   min_score: float = 0.0) -> List[List[Tuple[str, float]]]:
+        """Return the best (intent, score) pairs for every utterance"""
+        indices, scores = self.top_k(utterances, k)
+        names = self.intents
+        return [
+            [(names[i], float(s)) for i, s in zip(row, row_scores)
+             if s >= min_score]
+            for row, row_scores in zip(indices.tolist(), scores.tolist())
+        ]
+
+
+_engine_lock = threading.Lock()
+# id(manifest) -> (manifest, engine); holding the manifest keeps its id
+# from being reused while the entry is cached
+_engines: Dict[int, Tuple[Mapping[str, Any], IntentEngine]] = {}
+
+
+def get_engine(manifest: Mapping[str, Any]) -> IntentEngine:
+    """Return the shared engine for a manifest object
+
+    Nodes of a domain share the manifest loaded through the document cache,
+    so its intent matrix is built once per process and manifest version.
+    """
+    key = id(manifest)
+    with _engine_lock:
+        cached = _engines.get(key)
+        if cached is not None and cached[0] is manifest:
+            return cached[1]
+    engine = IntentEngine(manifest)
+    with _engine_lock:
+        if len(_engines) >= ENGINE_CACHE_SIZE:
+            del _engines[next(iter(_engines))]
+        _engines[key] = (manifest, engine)
+    return engine
@@ -1 +1,349 @@
-# context_handler.py
+"""
+IntentON Memory Context Store
+Per-PA-ID conversational and intent context held within a fixed memory
+budget, with LRU eviction, per-entry expiry and an optional sqlite tier
+for evicted contexts that are still warm
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+# Memory budget of the in-process tier
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Lifetime of a context after its last write, in seconds
+DEFAULT_TTL = 3600.0
+# Budget of the sqlite tier; None leaves it unbounded
+DEFAULT_SPILL_MAX_BYTES = 1024 * 1024 * 1024
+
+# Approximate bookkeeping per in-memory entry on 64-bit CPython: the
+# OrderedDict slot and link, the entry tuple, the expiry float and the
+# bytes object header. Added to the key and payload lengths.
+ENTRY_OVERHEAD = 200
+
+# Eviction frees this fraction of max_bytes beyond what is needed, so
+# spills are written in batches rather than one transaction per put
+EVICTION_SLACK = 1 / 32
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contexts (
+    pa_id TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    expires REAL NOT NULL,
+    spilled REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contexts_spilled ON contexts (spilled);
+"""
+
+
+def encode_context(context: Dict[str, Any]) -> bytes:
+    """Serialize a context to compact JSON bytes"""
+    return json.dumps(context, separators=(',', ':'),
+                      ensure_ascii=False).encode('utf-8')
+
+
+def decode_context(data: bytes) -> Dict[str, Any]:
+    return json.loads(data)
+
+
+class ContextStore:
+    """Size-bounded LRU store of contexts keyed by pa_id
+
+    Contexts are JSON-serializable dicts kept in encoded form, so the
+    memory they take is known exactly and callers always receive a private
+    copy. ``get`` and ``put`` are O(1): an ``OrderedDict`` tracks recency
+    and the least recently used entries are evicted once ``max_bytes`` is
+    exceeded. Every entry expires ``ttl`` seconds after its last write.
+
+    With ``spill_path`` set, evicted contexts move to a sqlite database
+    instead of being dropped, and a later ``get`` promotes them back. The
+    spill tier is a cache: it is written without fsync and trimmed oldest
+    first beyond ``spill_max_bytes``.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl: Optional[float] = DEFAULT_TTL,
+                 spill_path: Union[str, Path, None] = None,
+                 spill_max_bytes: Optional[int] = DEFAULT_SPILL_MAX_BYTES,
+                 clock: Callable[[], float] = time.time):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.spill_max_bytes = spill_max_bytes
+        self._clock = clock
+        # pa_id -> (encoded context, expiry timestamp)
+        self._entries: 'OrderedDict[str, Tuple[bytes, float]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.spill_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._spill: Optional[sqlite3.Connection] = None
+        self._spill_bytes = 0
+        if spill_path is not None:
+            self._open_spill(Path(spill_path))
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'ContextStore':
+        """Build a store from the ``memory_context`` section of
+        agent_config.yaml"""
+        section = config.get('memory_context', config) or {}
+        return cls(
+            max_bytes=section.get('max_bytes', DEFAULT_MAX_BYTES),
+            ttl=section.get('ttl', DEFAULT_TTL),
+            spill_path=section.get('spill_path'),
+            spill_max_bytes=section.get('spill_max_bytes',
+                                        DEFAULT_SPILL_MAX_BYTES),
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, pa_id: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(pa_id)
+            return entry is not None and entry[1] > self._clock()
+
+    @property
+    def bytes_used(self) -> int:
+        """Accounted size of the in-memory tier"""
+        return self._bytes
+
+    def get(self, pa_id: str, default: Any = None) -> Any:
+        """Return a copy of the context for pa_id, or ``default``"""
+        with self._lock:
+            context = self._lookup(pa_id)
+        return default if context is None else context
+
+    def put(self, pa_id: str, context: Dict[str, Any],
+            ttl: Optional[float] = None):
+        """Store the context for pa_id, replacing any previous one"""
+        data = encode_context(context)
+        ttl = self.ttl if ttl is None else ttl
+        expires = self._clock() + ttl if ttl is not None else float('inf')
+        with self._lock:
+            if pa_id in self._entries:
+                self._discard(pa_id)
+            elif self._spill is not None:
+                with self._spill:
+                    self._drop_spilled(pa_id)
+            self._insert(pa_id, data, expires)
+
+    def update(self, pa_id: str, changes: Dict[str, Any],
+               ttl: Optional[float] = None) -> Dict[str, Any]:
+        """Merge changes into the context for pa_id and return the result"""
+        with self._lock:
+            # Held across get and put so concurrent updates do not interleave
+            context = self._lookup(pa_id) or {}
+            context.update(changes)
+            data = encode_context(context)
+            ttl = self.ttl if ttl is None else ttl
+            expires = (self._clock() + ttl if ttl is not None
+                       else float('inf'))
+            if pa_id in self._entries:
+                self._discard(pa_id)
+            self._insert(pa_id, data, expires)
+            return context
+
+    def delete(self, pa_id: str) -> bool:
+        """Forget pa_id in both tiers; returns True if it was stored"""
+        with self._lock:
+            found = pa_id in self._entries
+            if found:
+                self._discard(pa_id)
+            if self._spill is not None:
+                with self._spill:
+                    found = self._drop_spilled(pa_id) or found
+            return found
+
+    def purge_expired(self) -> int:
+        """Drop every expired context now rather than on access"""
+        now = self._clock()
+        with self._lock:
+            expired = [pa_id for pa_id, (_, expires) in self._entries.items()
+                       if expires <= now]
+            for pa_id in expired:
+                self._discard(pa_id)
+            removed = len(expired)
+            if self._spill is not None:
+                with self._spill:
+                    count, size = self._spill.execute(
+                        "SELECT count(*), coalesce(sum(length(data)), 0) "
+                        "FROM contexts WHERE expires <= ?", (now,)
+                    ).fetchone()
+                    self._spill.execute(
+                        "DELETE FROM contexts WHERE expires <= ?", (now,)
+                    )
+                self._spill_bytes -= size
+                removed += count
+            self.expirations += removed
+            return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._spill is not None:
+                with self._spill:
+                    self._spill.execute("DELETE FROM contexts")
+                self._spill_bytes = 0
+
+    def keys(self) -> Iterator[str]:
+        """pa_ids held in memory, least recently used first"""
+        with self._lock:
+            return iter(list(self._entries))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            spilled = 0
+            if self._spill is not None:
+                spilled = self._spill.execute(
+                    "SELECT count(*) FROM contexts"
+                ).fetchone()[0]
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'spilled': spilled,
+                'spill_bytes': self._spill_bytes,
+                'hits': self.hits,
+                'spill_hits': self.spill_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+
+    def _lookup(self, pa_id: str) -> Optional[Dict[str, Any]]:
+        """Decode the live context for pa_id, promoting it from the spill
+        tier if needed; the caller holds the lock"""
+        now = self._clock()
+        entry = self._entries.get(pa_id)
+        if entry is not None:
+            if entry[1] > now:
+                self._entries.move_to_end(pa_id)
+                self.hits += 1
+                return decode_context(entry[0])
+            self._discard(pa_id)
+            self.expirations += 1
+        elif self._spill is not None:
+            data = self._unspill(pa_id, now)
+            if data is not None:
+                self.spill_hits += 1
+                return decode_context(data)
+        self.misses += 1
+        return None
+
+    def _insert(self, pa_id: str, data: bytes, expires: float):
+        size = len(data) + len(pa_id) + ENTRY_OVERHEAD
+        self._entries[pa_id] = (data, expires)
+        self._bytes += size
+        if self._bytes > self.max_bytes:
+            self._evict()
+
+    def _discard(self, pa_id: str):
+        data, _ = self._entries.pop(pa_id)
+        self._bytes -= len(data) + len(pa_id) + ENTRY_OVERHEAD
+
+    def _evict(self):
+        """Drop least recently used entries until below the low-water mark
+
+        The newest entry is never evicted, even if it alone exceeds the
+        budget. Live evictees are spilled in a single transaction.
+        """
+        now = self._clock()
+        target = self.max_bytes * (1 - EVICTION_SLACK)
+        spilled: List[Tuple[str, bytes, float, float]] = []
+        while self._bytes > target and len(self._entries) > 1:
+            pa_id, (data, expires) = self._entries.popitem(last=False)
+            self._bytes -= len(data) + len(pa_id) + ENTRY_OVERHEAD
+            if expires <= now:
+                self.expirations += 1
+                continue
+            self.evictions += 1
+            if self._spill is not None:
+                spilled.append((pa_id, data, expires, now))
+        if spilled:
+            self._write_spill(spilled)
+
+    def _open_spill(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(str(path), check_same_thread=False)
+        # A cache tier: losing it on a crash only costs warm contexts
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=OFF")
+        connection.executescript(_SCHEMA)
+        self._spill_bytes = connection.execute(
+            "SELECT coalesce(sum(length(data)), 0) FROM contexts"
+        ).fetchone()[0]
+        self._spill = connection
+
+    def _write_spill(self, rows: List[Tuple[str, bytes, float, float]]):
+        with self._spill:
+            for pa_id, data, _, _ in rows:
+                self._drop_spilled(pa_id)
+                self._spill_bytes += len(data)
+            self._spill.executemany(
+                "INSERT INTO contexts (pa_id, data, expires, spilled) "
+                "VALUES (?, ?, ?, ?)", rows
+            )
+            if (self.spill_max_bytes is not None
+                    and self._spill_bytes > self.spill_max_bytes):
+                self._trim_spill()
+
+    def _trim_spill(self):
+        """Delete the longest-spilled contexts until within budget"""
+        cursor = self._spill.execute(
+            "SELECT pa_id, length(data) FROM contexts ORDER BY spilled"
+        )
+        doomed = []
+        excess = self._spill_bytes - self.spill_max_bytes
+        for pa_id, size in cursor:
+            if excess <= 0:
+                break
+            doomed.append((pa_id,))
+            excess -= size
+            self._spill_bytes -= size
+        cursor.close()
+        self._spill.executemany("DELETE FROM contexts WHERE pa_id = ?",
+                                doomed)
+
+    def _drop_spilled(self, pa_id: str) -> bool:
+        """Delete a spilled context; the caller commits"""
+        row = self._spill.execute(
+            "SELECT length(data) FROM contexts WHERE pa_id = ?", (pa_id,)
+        ).fetchone()
+        if row is None:
+            return False
+        self._spill.execute("DELETE FROM contexts WHERE pa_id = ?", (pa_id,))
+        self._spill_bytes -= row[0]
+        return True
+
+    def _unspill(self, pa_id: str, now: float) -> Optional[bytes]:
+        """Move a spilled context back into memory and return its data"""
+        row = self._spill.execute(
+            "SELECT data, expires FROM contexts WHERE pa_id = ?", (pa_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        with self._spill:
+            self._spill.execute("DELETE FROM contexts WHERE pa_id = ?",
+                                (pa_id,))
+        data, expires = row
+        self._spill_bytes -= len(data)
+        if expires <= now:
+            self.expirations += 1
+            return None
+        self._insert(pa_id, data, expires)
+        return data
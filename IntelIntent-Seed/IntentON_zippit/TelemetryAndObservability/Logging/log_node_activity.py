@@ -1 +1,368 @@
-# log_node_activity.py
+"""
+IntentON Node Activity Logging
+Queue-based logging pipeline for root nodes: callers enqueue unformatted
+records, a background listener formats and writes them in batches, and
+high-frequency events are sampled or rate limited before they are queued
+"""
+
+import abc
+import atexit
+import itertools
+import logging
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_FORMAT = (
+    '%(asctime)s %(levelname)s %(name)s '
+    '[%(domain)s %(pa_id)s depth=%(depth)s] %(message)s'
+)
+
+# Records drained from the queue per write
+DEFAULT_BATCH_SIZE = 256
+# Keep one in this many permission grants
+GRANT_SAMPLE_RATE = 100
+# Per message template: sustained records per second, and burst allowance
+DEFAULT_RATE_LIMIT = 20.0
+DEFAULT_BURST = 50
+
+# Node fields filled in for records that did not come through a node
+_NODE_FIELDS = {'pa_id': '-', 'domain': '-', 'depth': '-'}
+
+_STOP = object()
+# Shared "admit without changes" result of _GateFilter.check; never mutated
+_PASS: Dict = {}
+
+
+class NodeLogAdapter(logging.LoggerAdapter):
+    """Logger adapter attaching a node's pa_id, domain and depth
+
+    Fields are read from the node only for records that pass the level
+    check, and travel as record attributes rather than message text.
+    Sampling and rate limiting run before the record is created, so a
+    dropped event costs a level check and a filter lookup.
+    """
+
+    def __init__(self, logger: logging.Logger, node):
+        super().__init__(logger, None)
+        self.node = node
+
+    def log(self, level, msg, *args, **kwargs):
+        if not self.isEnabledFor(level):
+            return
+        node = self.node
+        extra = {
+            'pa_id': node.pa_id,
+            'domain': node.domain,
+            'depth': node.depth,
+        }
+        name = self.logger.name
+        for gate in _gates:
+            marks = gate.check(name, level, msg)
+            if marks is None:
+                return
+            extra.update(marks)
+        extra['admitted'] = True
+        kwargs['extra'] = extra
+        # Report the caller, not this method, as the record's origin
+        kwargs['stacklevel'] = kwargs.get('stacklevel', 1) + 1
+        self.logger.log(level, msg, *args, **kwargs)
+
+
+def node_logger(logger: logging.Logger, node) -> NodeLogAdapter:
+    """Return an adapter logging through ``logger`` on behalf of ``node``"""
+    return NodeLogAdapter(logger, node)
+
+
+class NodeFormatter(logging.Formatter):
+    """Formatter tolerating records without node fields
+
+    Notes how many similar records a rate limiter dropped before this one.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = record.__dict__
+        for name, default in _NODE_FIELDS.items():
+            fields.setdefault(name, default)
+        text = super().format(record)
+        suppressed = fields.get('suppressed')
+        if suppressed:
+            text += f" (+{suppressed} similar suppressed)"
+        return text
+
+
+class LazyQueueHandler(QueueHandler):
+    """Queue handler that leaves formatting to the listener thread
+
+    The stock ``QueueHandler.prepare`` formats every record in the calling
+    thread; this one enqueues the record untouched, so callers only pay for
+    creating it. Message arguments are therefore formatted later and should
+    not be mutated after logging.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            # Tracebacks keep their frames alive; render them right away
+            record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_EXC_FORMATTER = logging.Formatter()
+
+
+class _GateFilter(logging.Filter, abc.ABC):
+    """Filter whose decision needs only the logger, level and template
+
+    ``check`` returns None to drop an event, otherwise attributes to set on
+    its record. NodeLogAdapter calls it before creating records; records
+    it already admitted pass ``filter`` untouched.
+    """
+
+    @abc.abstractmethod
+    def check(self, name: str, levelno: int, msg) -> Optional[Dict]:
+        ...
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.__dict__.get('admitted'):
+            return True
+        marks = self.check(record.name, record.levelno, record.msg)
+        if marks is None:
+            return False
+        record.__dict__.update(marks)
+        return True
+
+
+class SamplingFilter(_GateFilter):
+    """Keep one in ``rate`` low-level records from matching loggers
+
+    Applies to records at or below ``max_level`` from loggers whose name
+    ends with one of ``suffixes``; everything else passes. Kept records
+    carry ``sample_rate`` so readers can scale counts back up.
+    """
+
+    def __init__(self, rate: int, suffixes: Iterable[str] = ('.access',),
+                 max_level: int = logging.INFO):
+        super().__init__()
+        self.rate = max(int(rate), 1)
+        self.suffixes = tuple(suffixes)
+        self.max_level = max_level
+        self._seen = itertools.count()
+
+    def check(self, name: str, levelno: int, msg) -> Optional[Dict]:
+        if (self.rate == 1 or levelno > self.max_level
+                or not name.endswith(self.suffixes)):
+            return _PASS
+        if next(self._seen) % self.rate:
+            return None
+        return {'sample_rate': self.rate}
+
+
+class RateLimitFilter(_GateFilter):
+    """Token bucket per logger and message template
+
+    Records at or above ``exempt_level`` (WARNING by default, so permission
+    denials are never dropped) always pass. Dropped records are counted and
+    reported on the next record of the same template that gets through.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE_LIMIT,
+                 burst: int = DEFAULT_BURST,
+                 exempt_level: int = logging.WARNING):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.exempt_level = exempt_level
+        # (logger, template) -> [tokens, last refill, suppressed]
+        self._buckets: Dict[Tuple[str, str], List] = {}
+        self._lock = threading.Lock()
+
+    def check(self, name: str, levelno: int, msg) -> Optional[Dict]:
+        if levelno >= self.exempt_level:
+            return _PASS
+        key = (name, msg if isinstance(msg, str) else type(msg))
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now, 0]
+            tokens = min(self.burst,
+                         bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                bucket[2] += 1
+                return None
+            bucket[0] = tokens - 1
+            suppressed, bucket[2] = bucket[2], 0
+        return {'suppressed': suppressed} if suppressed else _PASS
+
+
+class _BatchEmitMixin:
+    """Adds ``emit_batch``: format many records, then write and flush once"""
+
+    def emit_batch(self, records: List[logging.LogRecord]):
+        parts = []
+        for record in records:
+            try:
+                parts.append(self.format(record) + self.terminator)
+            except Exception:
+                self.handleError(record)
+        if not parts:
+            return
+        with self.lock:
+            try:
+                if self.stream is None:
+                    self.stream = self._open()
+                self.stream.write(''.join(parts))
+                self.flush()
+            except Exception:
+                self.handleError(records[-1])
+
+
+class BatchStreamHandler(_BatchEmitMixin, logging.StreamHandler):
+    """Stream handler writing whole batches at once"""
+
+
+class BatchFileHandler(_BatchEmitMixin, logging.FileHandler):
+    """File handler writing whole batches at once"""
+
+
+class BatchingQueueListener:
+    """Drains a log queue on a background thread
+
+    Every wakeup takes whatever is already queued, up to ``batch_size``
+    records, and hands it to each handler in one ``emit_batch`` call, so a
+    burst of records costs one write instead of one per record. An idle
+    queue is written through immediately.
+    """
+
+    def __init__(self, log_queue, *handlers: logging.Handler,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.queue = log_queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name='intenton-log-listener', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Write out everything queued so far and end the thread"""
+        if self._thread is not None:
+            self.queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        for handler in self.handlers:
+            handler.flush()
+
+    def _run(self):
+        get, get_nowait = self.queue.get, self.queue.get_nowait
+        while True:
+            batch = [get()]
+            while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                try:
+                    batch.append(get_nowait())
+                except queue.Empty:
+                    break
+            stopping = batch[-1] is _STOP
+            if stopping:
+                batch.pop()
+            if batch:
+                self._dispatch(batch)
+            if stopping:
+                return
+
+    def _dispatch(self, batch: List[logging.LogRecord]):
+        for handler in self.handlers:
+            records = [
+                record for record in batch
+                if record.levelno >= handler.level and handler.filter(record)
+            ]
+            if not records:
+                continue
+            emit_batch = getattr(handler, 'emit_batch', None)
+            if emit_batch is not None:
+                emit_batch(records)
+            else:
+                for record in records:
+                    handler.handle(record)
+
+
+_listener: Optional[BatchingQueueListener] = None
+# Filters NodeLogAdapter applies before creating a record
+_gates: Tuple[_GateFilter, ...] = ()
+_queue_handler: Optional[LazyQueueHandler] = None
+_configure_lock = threading.Lock()
+
+
+def configure_logging(level: int = logging.INFO, stream=None,
+                      path: Optional[str] = None,
+                      fmt: str = DEFAULT_FORMAT,
+                      batch_size: int = DEFAULT_BATCH_SIZE,
+                      grant_sample_rate: int = GRANT_SAMPLE_RATE,
+                      rate_limit: Optional[float] = DEFAULT_RATE_LIMIT,
+                      burst: int = DEFAULT_BURST) -> BatchingQueueListener:
+    """Route the root logger through the queued, batched pipeline
+
+    Replaces ``logging.basicConfig`` for root nodes. Records go to
+    ``path`` when given, otherwise to ``stream`` (stderr by default).
+    Permission grants (``*.access`` loggers) are sampled at
+    ``grant_sample_rate``; repeated messages are rate limited unless
+    ``rate_limit`` is None. Calling it again replaces the previous
+    pipeline after draining it.
+    """
+    global _listener, _queue_handler, _gates
+    with _configure_lock:
+        root = logging.getLogger()
+        if _listener is not None:
+            root.removeHandler(_queue_handler)
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+
+        if path is not None:
+            output = BatchFileHandler(path, encoding='utf-8', delay=True)
+        else:
+            output = BatchStreamHandler(stream or sys.stderr)
+        output.setFormatter(NodeFormatter(fmt))
+
+        log_queue = queue.SimpleQueue()
+        gates = [SamplingFilter(grant_sample_rate)]
+        if rate_limit is not None:
+            gates.append(RateLimitFilter(rate_limit, burst))
+        _queue_handler = LazyQueueHandler(log_queue)
+        for gate in gates:
+            _queue_handler.addFilter(gate)
+        _gates = tuple(gates)
+
+        _listener = BatchingQueueListener(log_queue, output,
+                                          batch_size=batch_size)
+        _listener.start()
+        # Drains the pipeline at exit; registered once however often the
+        # pipeline is replaced
+        atexit.unregister(shutdown_logging)
+        atexit.register(shutdown_logging)
+        root.addHandler(_queue_handler)
+        root.setLevel(level)
+        return _listener
+
+
+def shutdown_logging():
+    """Drain the pipeline and detach it from the root logger"""
+    global _listener, _queue_handler, _gates
+    with _configure_lock:
+        if _listener is None:
+            return
+        _gates = ()
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = _queue_handler = None
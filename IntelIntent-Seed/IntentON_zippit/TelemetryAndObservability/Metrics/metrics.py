@@ -0,0 +1,403 @@
+"""
+IntentON Metrics Registry
+In-process counters and latency histograms for node hot paths, with
+decorators and context managers that cost close to nothing when disabled
+"""
+
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Union
+
+# Histogram layout: values below 2**SUB_BUCKET_BITS nanoseconds get one
+# bucket each, every power of two above is split into as many sub-buckets,
+# which bounds the relative error of any reported value to 1/16
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# Largest trackable value: 2**42 ns, a little over an hour
+MAX_VALUE_BITS = 42
+BUCKETS = (MAX_VALUE_BITS - SUB_BUCKET_BITS + 1) * SUB_BUCKETS
+
+DEFAULT_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+# INTENTON_METRICS=off disables metrics before anything is instrumented, so
+# decorators return the undecorated function and cost nothing at all
+_ENV_DISABLED = os.environ.get('INTENTON_METRICS', '').lower() in (
+    '0', 'off', 'false', 'no'
+)
+
+
+def bucket_index(value: int) -> int:
+    """Map a non-negative integer value to its histogram bucket"""
+    if value < SUB_BUCKETS:
+        return max(value, 0)
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    index = (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+    return min(index, BUCKETS - 1)
+
+
+def bucket_bounds(index: int) -> tuple:
+    """Return the [low, high) range of values counted by a bucket"""
+    if index < SUB_BUCKETS:
+        return index, index + 1
+    shift = index // SUB_BUCKETS - 1
+    low = (index % SUB_BUCKETS + SUB_BUCKETS) << shift
+    return low, low + (1 << shift)
+
+
+class Counter:
+    """Monotonic counter
+
+    Like Histogram, every thread increments its own shard, so ``inc`` needs
+    no lock; ``value`` sums the shards.
+    """
+
+    __slots__ = ('name', '_shards', '_lock')
+
+    def __init__(self, name: str):
+        self.name = name
+        self._shards: Dict[int, array] = {}
+        self._lock = threading.Lock()
+
+    def _shard(self) -> array:
+        shard = array('Q', [0])
+        with self._lock:
+            self._shards[threading.get_ident()] = shard
+        return shard
+
+    def inc(self, _get_ident=threading.get_ident):
+        shard = self._shards.get(_get_ident()) or self._shard()
+        shard[0] += 1
+
+    def add(self, amount: int, _get_ident=threading.get_ident):
+        """Advance by more than one"""
+        shard = self._shards.get(_get_ident()) or self._shard()
+        shard[0] += amount
+
+    @property
+    def value(self) -> int:
+        with self._lock:
+            shards = list(self._shards.values())
+        return sum(shard[0] for shard in shards)
+
+    def reset(self):
+        with self._lock:
+            self._shards.clear()
+
+
+class Histogram:
+    """Fixed-bucket log-linear latency histogram in nanoseconds
+
+    Every thread records into its own ``array`` of bucket counts, so
+    recording is an index computation and an increment without locks.
+    Snapshots merge the shards.
+    """
+
+    __slots__ = ('name', '_shards', '_lock')
+
+    def __init__(self, name: str):
+        self.name = name
+        self._shards: Dict[int, array] = {}
+        self._lock = threading.Lock()
+
+    def _shard(self) -> array:
+        ident = threading.get_ident()
+        shard = self._shards.get(ident)
+        if shard is None:
+            # The last two slots hold the total and the maximum
+            shard = array('Q', bytes(8 * (BUCKETS + 2)))
+            with self._lock:
+                self._shards[ident] = shard
+        return shard
+
+    def record(self, value: int, _get_ident=threading.get_ident):
+        """Record a duration in nanoseconds"""
+        shard = self._shards.get(_get_ident()) or self._shard()
+        # bucket_index() inlined: this runs on every instrumented call
+        if value < SUB_BUCKETS:
+            value = max(int(value), 0)
+            index = value
+        else:
+            value = int(value)
+            shift = value.bit_length() - SUB_BUCKET_BITS - 1
+            index = min((shift << SUB_BUCKET_BITS) + (value >> shift),
+                        BUCKETS - 1)
+        shard[index] += 1
+        shard[BUCKETS] += value
+        if value > shard[BUCKETS + 1]:
+            shard[BUCKETS + 1] = value
+
+    def merged(self) -> array:
+        """Return bucket counts summed over every thread"""
+        with self._lock:
+            shards = list(self._shards.values())
+        total = array('Q', bytes(8 * (BUCKETS + 2)))
+        for shard in shards:
+            for index, count in enumerate(shard[:BUCKETS]):
+                if count:
+                    total[index] += count
+            total[BUCKETS] += shard[BUCKETS]
+            total[BUCKETS + 1] = max(total[BUCKETS + 1], shard[BUCKETS + 1])
+        return total
+
+    def snapshot(self, percentiles=DEFAULT_PERCENTILES) -> Dict[str, Any]:
+        """Return count, sum, mean, max and percentiles in milliseconds"""
+        counts = self.merged()
+        count = sum(counts[:BUCKETS])
+        result = {
+            'count': count,
+            'sum_ms': counts[BUCKETS] / 1e6,
+            'mean_ms': counts[BUCKETS] / count / 1e6 if count else 0.0,
+            'max_ms': counts[BUCKETS + 1] / 1e6,
+        }
+        targets = sorted(percentiles)
+        seen = 0
+        position = 0
+        for index in range(BUCKETS):
+            if position == len(targets):
+                break
+            seen += counts[index]
+            while position < len(targets) and count and (
+                seen >= count * targets[position] / 100.0
+            ):
+                # Report the bucket midpoint, capped at the true maximum
+                low, high = bucket_bounds(index)
+                value = min((low + high) / 2, counts[BUCKETS + 1])
+                result[f"p{targets[position]:g}_ms"] = value / 1e6
+                position += 1
+        for target in targets[position:]:
+            result[f"p{target:g}_ms"] = 0.0
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._shards.clear()
+
+
+class _Timer:
+    """Context manager recording the duration of its block"""
+
+    __slots__ = ('_registry', '_name', '_start')
+
+    def __init__(self, registry: 'MetricsRegistry', name: str):
+        self._registry = registry
+        self._name = name
+        self._start = None
+
+    def __enter__(self):
+        if self._registry.enabled:
+            self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._start is not None:
+            elapsed = time.perf_counter_ns() - self._start
+            self._start = None
+            self._registry.histogram(self._name).record(elapsed)
+            if exc_type is not None:
+                self._registry.counter(self._name + '.errors').inc()
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class MetricsRegistry:
+    """Named counters and histograms for one process
+
+    With ``enabled`` False, instrumented calls pay one attribute check.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.percentiles = DEFAULT_PERCENTILES
+        self.export_format = 'json'
+        self.export_path: Optional[str] = None
+        self._counters: Dict[str, Counter] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str) -> Counter:
+        counter = self._counters.get(name)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(name, Counter(name))
+        return counter
+
+    def histogram(self, name: str) -> Histogram:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(
+                    name, Histogram(name)
+                )
+        return histogram
+
+    def timer(self, name: str) -> _Timer:
+        """Context manager (sync or async) timing its block"""
+        return _Timer(self, name)
+
+    def timed(self, name: Optional[str] = None) -> Callable:
+        """Decorator recording the latency of a function or coroutine
+
+        Exceptions are counted under ``<name>.errors``.
+        """
+        def decorate(func: Callable) -> Callable:
+            if _ENV_DISABLED:
+                return func
+            metric = name or func.__qualname__
+            histogram = self.histogram(metric)
+            errors = self.counter(metric + '.errors')
+            clock = time.perf_counter_ns
+
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await func(*args, **kwargs)
+                    start = clock()
+                    try:
+                        return await func(*args, **kwargs)
+                    except BaseException:
+                        errors.inc()
+                        raise
+                    finally:
+                        histogram.record(clock() - start)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = clock()
+                try:
+                    return func(*args, **kwargs)
+                except BaseException:
+                    errors.inc()
+                    raise
+                finally:
+                    histogram.record(clock() - start)
+            return wrapper
+        return decorate
+
+    def counted(self, name: Optional[str] = None) -> Callable:
+        """Decorator counting calls of a function"""
+        def decorate(func: Callable) -> Callable:
+            if _ENV_DISABLED:
+                return func
+            counter = self.counter(name or func.__qualname__)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if self.enabled:
+                    counter.inc()
+                return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def snapshot(self, percentiles=None) -> Dict[str, Any]:
+        """Return current values of every metric"""
+        percentiles = percentiles or self.percentiles
+        with self._lock:
+            counters = list(self._counters.values())
+            histograms = list(self._histograms.values())
+        return {
+            'timestamp': time.time(),
+            'counters': {c.name: c.value for c in counters},
+            'histograms': {
+                h.name: h.snapshot(percentiles) for h in histograms
+            },
+        }
+
+    def export(self, format: Optional[str] = None,
+               path: Union[str, os.PathLike, None] = None) -> str:
+        """Render a snapshot as JSON or Prometheus text; optionally write it
+
+        ``format`` and ``path`` default to the configured export settings.
+        """
+        format = format or self.export_format
+        path = path or self.export_path
+        snapshot = self.snapshot()
+        if format == 'json':
+            text = json.dumps(snapshot, indent=2, sort_keys=True)
+        elif format == 'prometheus':
+            text = _to_prometheus(snapshot)
+        else:
+            raise ValueError(f"Unknown metrics export format: {format}")
+        if path is not None:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        return text
+
+    def reset(self):
+        """Zero every metric, keeping instrumented references valid"""
+        with self._lock:
+            metrics = [*self._counters.values(), *self._histograms.values()]
+        for metric in metrics:
+            metric.reset()
+
+    def configure(self, config: Dict[str, Any]):
+        """Apply the ``metrics`` section of metrics_config.yaml"""
+        section = config.get('metrics', config) or {}
+        if 'enabled' in section:
+            self.enabled = bool(section['enabled']) and not _ENV_DISABLED
+        if section.get('percentiles'):
+            self.percentiles = tuple(
+                float(p) for p in section['percentiles']
+            )
+        export = section.get('export') or {}
+        self.export_format = export.get('format', self.export_format)
+        self.export_path = export.get('path', self.export_path)
+
+
+def _metric_name(name: str) -> str:
+    return ''.join(c if c.isalnum() else '_' for c in name)
+
+
+def _to_prometheus(snapshot: Dict[str, Any]) -> str:
+    lines: List[str] = []
+    for name, value in sorted(snapshot['counters'].items()):
+        metric = f"intenton_{_metric_name(name)}_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    for name, values in sorted(snapshot['histograms'].items()):
+        metric = f"intenton_{_metric_name(name)}_seconds"
+        lines.append(f"# TYPE {metric} summary")
+        for key, value in values.items():
+            if key.startswith('p'):
+                quantile = float(key[1:-3]) / 100
+                lines.append(
+                    f'{metric}{{quantile="{quantile:g}"}} {value / 1e3:.9f}'
+                )
+        lines.append(f"{metric}_sum {values['sum_ms'] / 1e3:.9f}")
+        lines.append(f"{metric}_count {values['count']}")
+    return '\n'.join(lines) + '\n'
+
+
+def load_config(path: Union[str, os.PathLike]) -> Dict[str, Any]:
+    """Read metrics_config.yaml and apply it to the shared registry
+
+    A missing file leaves the defaults in place.
+    """
+    if not os.path.exists(path):
+        return {}
+    import yaml
+    with open(path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    METRICS.configure(config)
+    return config
+
+
+# Shared registry used by the node modules
+METRICS = MetricsRegistry(enabled=not _ENV_DISABLED)
+timed = METRICS.timed
+counted = METRICS.counted
+timer = METRICS.timer
+snapshot = METRICS.snapshot
+export = METRICS.export
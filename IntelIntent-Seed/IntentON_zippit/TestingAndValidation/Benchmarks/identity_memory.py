@@ -0,0 +1,212 @@
+"""
+IntentON Identity Memory Benchmark
+Builds a synthetic node tree from a domain's init_node module and reports
+bytes per node and per identity with the compact PAIdentity and with the
+dict-based layout it replaced
+"""
+
+import argparse
+import gc
+import importlib.util
+import json
+import logging
+import sys
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+DOMAINS = ("Enterprise", "Personal", "Family", "Business")
+
+DEFAULT_NODE_ROOT = (
+    Path(__file__).resolve().parents[3] / "Desktop" / "IntentON"
+)
+
+
+@dataclass
+class LegacyPAIdentity:
+    """The Personal, Family and Business PAIdentity before it was slotted,
+    kept as the baseline"""
+    pa_id: str
+    github_identity: Optional[str] = None
+    microsoft_365_identity: Optional[str] = None
+    entra_object_id: Optional[str] = None
+    roles: List[str] = None
+    permissions: Dict[str, Any] = None
+    created_at: datetime = None
+    last_verified: datetime = None
+    revision: int = field(default=0, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.roles is None:
+            self.roles = []
+        if self.permissions is None:
+            self.permissions = {}
+        if self.created_at is None:
+            self.created_at = datetime.utcnow()
+
+    def __setattr__(self, name: str, value: Any):
+        object.__setattr__(self, name, value)
+        if name in ('roles', 'permissions'):
+            revision = getattr(self, 'revision', 0) + 1
+            object.__setattr__(self, 'revision', revision)
+
+    def grant(self, permission: str, value: Any = True):
+        self.permissions[permission] = value
+        self.revision += 1
+
+    def grant_many(self, permissions: Dict[str, Any]):
+        self.permissions.update(permissions)
+        self.revision += 1
+
+
+@dataclass
+class LegacyEnterprisePAIdentity(LegacyPAIdentity):
+    """The Enterprise layout, which also carried a security context"""
+    security_context: Dict[str, Any] = None
+
+    def __post_init__(self):
+        super().__post_init__()
+        if self.security_context is None:
+            self.security_context = {
+                "mfa_verified": False,
+                "last_auth_time": None,
+                "session_expiry": None,
+                "security_level": "standard"
+            }
+
+
+# Baseline identity class per domain; others use LegacyPAIdentity
+LEGACY_IDENTITIES = {"Enterprise": LegacyEnterprisePAIdentity}
+
+
+def load_node_module(node_root: Path, domain: str):
+    """Import a domain's init_node.py under a domain-specific name"""
+    path = node_root / domain / "RootNode" / "init_node.py"
+    spec = importlib.util.spec_from_file_location(
+        f"{domain.lower()}_init_node", path
+    )
+    module = importlib.util.module_from_spec(spec)
+    # dataclasses resolves string annotations through sys.modules
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_tree(module, domain: str, nodes: int, fanout: int):
+    """Build a breadth-first tree of ``nodes`` nodes without authenticating
+
+    Each node gets its domain's default roles and inherits permissions from
+    its parent, as initialize() would do.
+    """
+    authenticator = module.EntraIDAuthenticator()
+    root = module.IntentONRootNode(
+        domain=domain, manifest={}, authenticator=authenticator
+    )
+    root._assign_default_roles()
+    level = [root]
+    count = 1
+    while count < nodes:
+        next_level = []
+        for parent in level:
+            for _ in range(fanout):
+                if count >= nodes:
+                    break
+                child = module.IntentONRootNode(
+                    domain=parent.domain, pa_id=f"{parent.pa_id}.{count}",
+                    manifest=parent.manifest, authenticator=authenticator
+                )
+                child._assign_default_roles()
+                child.identity.grant_many(
+                    child.access_manager.inherit_permissions(parent.identity)
+                )
+                parent._attach(child)
+                next_level.append(child)
+                count += 1
+        level = next_level
+    return root
+
+
+def measure(func, *args) -> Tuple[int, Any]:
+    """Return the bytes still allocated by func's result, and the result"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func(*args)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def make_identities(module, count: int):
+    identities = []
+    for index in range(count):
+        identity = module.PAIdentity(pa_id=f"PA-BENCH-{index:08d}")
+        identity.roles = ["admin"]
+        identities.append(identity)
+    return identities
+
+
+def run(node_root: Path, domain: str, nodes: int, fanout: int) -> Dict:
+    module = load_node_module(node_root, domain)
+    compact = module.PAIdentity
+    # Populate one-off caches (metrics, role closures) outside the measurement
+    build_tree(module, domain, fanout + 1, fanout)
+    report = {}
+    legacy = LEGACY_IDENTITIES.get(domain, LegacyPAIdentity)
+    for label, identity_class in (("before", legacy), ("after", compact)):
+        module.PAIdentity = identity_class
+        try:
+            identity_bytes, identities = measure(
+                make_identities, module, nodes
+            )
+            del identities
+            tree_bytes, root = measure(
+                build_tree, module, domain, nodes, fanout
+            )
+            del root
+        finally:
+            module.PAIdentity = compact
+        report[label] = {
+            "bytes_per_identity": identity_bytes / nodes,
+            "bytes_per_node": tree_bytes / nodes,
+        }
+    report["saved_per_node"] = (report["before"]["bytes_per_node"]
+                                - report["after"]["bytes_per_node"])
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--node-root", type=Path, default=DEFAULT_NODE_ROOT)
+    parser.add_argument("--domain", action="append", choices=DOMAINS)
+    parser.add_argument("--nodes", type=int, default=50000)
+    parser.add_argument("--fanout", type=int, default=8)
+    parser.add_argument("--json", action="store_true",
+                        help="print the full report as JSON")
+    args = parser.parse_args()
+
+    # Denied inheritance is logged per node; keep the run quiet
+    logging.disable(logging.WARNING)
+    report = {
+        domain: run(args.node_root, domain, args.nodes, args.fanout)
+        for domain in args.domain or DOMAINS
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    for domain, result in report.items():
+        before, after = result["before"], result["after"]
+        print(f"{domain}: {args.nodes} nodes, fanout {args.fanout}")
+        print(f"  identity  {before['bytes_per_identity']:8.0f} -> "
+              f"{after['bytes_per_identity']:6.0f} bytes")
+        print(f"  node      {before['bytes_per_node']:8.0f} -> "
+              f"{after['bytes_per_node']:6.0f} bytes "
+              f"({result['saved_per_node']:.0f} saved)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+IntentON Import Time Benchmark
+Measures how long importing each domain's init_node module takes using
+``python -X importtime`` and reports the heaviest imports
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+DOMAINS = ("Enterprise", "Personal", "Family", "Business")
+
+# Identity packages must only be imported once authentication needs them
+LAZY_MODULES = ("msal", "jwt", "azure", "yaml")
+
+DEFAULT_NODE_ROOT = (
+    Path(__file__).resolve().parents[3] / "Desktop" / "IntentON"
+)
+
+
+def _parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Parse ``-X importtime`` output into (module, self_us, cumulative_us)"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure_import(node_dir: Path) -> Dict:
+    """Import init_node in a fresh interpreter and return its import profile"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import init_node"],
+        cwd=node_dir, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"Importing {node_dir / 'init_node.py'} failed:\n{result.stderr}"
+        )
+    rows = _parse_importtime(result.stderr)
+    total = next(
+        (cumulative for name, _, cumulative in rows if name == "init_node"), 0
+    )
+    top_level = {name.split(".")[0] for name, _, _ in rows}
+    return {
+        "total_us": total,
+        "modules": len(rows),
+        "eager_lazy_modules": sorted(top_level.intersection(LAZY_MODULES)),
+        "heaviest": sorted(rows, key=lambda row: row[1], reverse=True)[:10],
+    }
+
+
+def run(node_root: Path, domains=DOMAINS, repeat: int = 5) -> Dict:
+    """Benchmark every domain and keep the median of ``repeat`` runs"""
+    report = {}
+    for domain in domains:
+        node_dir = node_root / domain / "RootNode"
+        runs = [measure_import(node_dir) for _ in range(repeat)]
+        median = statistics.median(run["total_us"] for run in runs)
+        report[domain] = dict(runs[-1], median_us=median)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--node-root", type=Path, default=DEFAULT_NODE_ROOT)
+    parser.add_argument("--domain", action="append", choices=DOMAINS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true",
+                        help="print the full report as JSON")
+    args = parser.parse_args()
+
+    report = run(args.node_root, args.domain or DOMAINS, args.repeat)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    for domain, result in report.items():
+        print(f"{domain}: {result['median_us'] / 1000:.1f} ms "
+              f"({result['modules']} modules)")
+        if result["eager_lazy_modules"]:
+            print("  imported eagerly: "
+                  + ", ".join(result["eager_lazy_modules"]))
+        for name, self_us, _ in result["heaviest"][:5]:
+            print(f"  {self_us / 1000:8.2f} ms  {name}")
+
+    if any(result["eager_lazy_modules"] for result in report.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
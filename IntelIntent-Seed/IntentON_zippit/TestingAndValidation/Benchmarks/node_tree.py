@@ -0,0 +1,295 @@
+"""
+IntentON Node Tree Benchmark
+Initializes synthetic node trees of configurable fan-out, depth and domain
+mix against a local fake identity provider, and reports initialization
+time, peak RSS, permission check and delegation throughput, audit query
+latency and snapshot warm-start time as JSON
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+DOMAINS = ("Enterprise", "Personal", "Family", "Business")
+
+DEFAULT_NODE_ROOT = (
+    Path(__file__).resolve().parents[3] / "Desktop" / "IntentON"
+)
+
+ACTIONS = ("read", "create", "update", "delete", "delegate", "override")
+
+
+class FakeIdentityApp:
+    """Stands in for an MSAL client; every token request succeeds locally
+
+    The simulated access token makes bind_microsoft_identity skip JWT
+    decoding, so the run needs neither network access nor PyJWT.
+    """
+
+    def __init__(self, client_id: str, authority: str,
+                 client_credential: str = None):
+        self.client_id = client_id
+        self.calls = 0
+
+    def _token(self) -> Dict:
+        self.calls += 1
+        return {"access_token": "simulated_token", "expires_in": 3600}
+
+    def acquire_token_for_client(self, scopes: Sequence[str]) -> Dict:
+        return self._token()
+
+    def acquire_token_interactive(self, scopes: Sequence[str]) -> Dict:
+        return self._token()
+
+
+def make_manifest(fanout: int, depth: int, domains: Sequence[str],
+                  spawn_mode: str = "concurrent",
+                  max_concurrency: int = 8) -> Dict:
+    """Build an intent_manifest.json whose tree has the given shape
+
+    Every node spawns ``fanout`` children, cycling through ``domains``,
+    down to ``depth`` levels below the root.
+    """
+    cycle = itertools.cycle(domains)
+    return {
+        "intents": [],
+        "recursive": {
+            "enabled": True,
+            "max_depth": depth,
+            "spawn_mode": spawn_mode,
+            "max_concurrency": max_concurrency,
+        },
+        "children": [{"domain": next(cycle)} for _ in range(fanout)],
+    }
+
+
+def load_node_module(node_root: Path, domain: str):
+    """Import a domain's init_node.py under a domain-specific name"""
+    path = node_root / domain / "RootNode" / "init_node.py"
+    spec = importlib.util.spec_from_file_location(
+        f"{domain.lower()}_init_node", path
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _walk(node) -> List:
+    nodes, stack = [], [node]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(node.children)
+    return nodes
+
+
+def _throughput(func, operations: int) -> float:
+    start = time.perf_counter()
+    func()
+    return operations / (time.perf_counter() - start)
+
+
+def run_case(node_root: Path, module_domain: str, fanout: int, depth: int,
+             domains: Sequence[str], spawn_mode: str = "concurrent",
+             operations: int = 100000, queries: int = 200,
+             seed: int = 0) -> Dict:
+    """Build, initialize and exercise one tree in this process"""
+    module = load_node_module(node_root, module_domain)
+    rng = random.Random(seed)
+    apps: List[FakeIdentityApp] = []
+
+    def app_factory(*args, **kwargs):
+        app = FakeIdentityApp(*args, **kwargs)
+        apps.append(app)
+        return app
+
+    authenticator = module.EntraIDAuthenticator(
+        config={"azure": {"tenant_id": "bench-tenant",
+                          "client_id": "bench-client"}},
+        app_factory=app_factory,
+        token_cache=module.TokenCache(),
+    )
+    manifest = make_manifest(fanout, depth, domains, spawn_mode)
+    root = module.IntentONRootNode(
+        domain=module_domain, manifest=manifest, authenticator=authenticator
+    )
+
+    start = time.perf_counter()
+    initialized = asyncio.run(root.initialize())
+    init_seconds = time.perf_counter() - start
+    nodes = _walk(root)
+
+    managers = [node.access_manager for node in nodes]
+    checks = [(rng.choice(managers), rng.choice(ACTIONS))
+              for _ in range(operations)]
+
+    def validate():
+        for manager, action in checks:
+            manager.validate_permission(action)
+
+    targets = [rng.choice(nodes).pa_id for _ in range(operations)]
+
+    def delegate():
+        for target in targets:
+            root.delegate_permission(target, "read")
+
+    result = {
+        "module": module_domain,
+        "fanout": fanout,
+        "depth": depth,
+        "domains": list(domains),
+        "spawn_mode": spawn_mode,
+        "initialized": initialized,
+        "nodes": len(nodes),
+        # Lazily spawned children not built during the run
+        "placeholders": sum(len(node.placeholders) for node in nodes),
+        "spawn_errors": len(root.spawn_errors),
+        "token_requests": sum(app.calls for app in apps),
+        "init_seconds": init_seconds,
+        "init_us_per_node": init_seconds / len(nodes) * 1e6,
+        "validate_per_second": _throughput(validate, operations),
+        "delegate_per_second": _throughput(delegate, operations),
+    }
+
+    # Only domains with an audit trail (Enterprise) can be queried
+    auditors = [manager for manager in managers
+                if hasattr(manager, "get_audit_logs")]
+    if auditors:
+        latencies = []
+        for _ in range(queries):
+            manager = rng.choice(auditors)
+            begin = time.perf_counter()
+            manager.get_audit_logs()
+            latencies.append((time.perf_counter() - begin) * 1e6)
+        latencies.sort()
+        result["audit_query_us"] = {
+            "p50": statistics.median(latencies),
+            "p99": latencies[min(len(latencies) - 1,
+                                 int(len(latencies) * 0.99))],
+            "max": latencies[-1],
+        }
+
+    # Taken before restoring, which builds a second tree
+    result["peak_rss_bytes"] = peak_rss_bytes()
+
+    start = time.perf_counter()
+    snapshot = root.snapshot()
+    result["snapshot_seconds"] = time.perf_counter() - start
+    result["snapshot_bytes"] = len(snapshot)
+    start = time.perf_counter()
+    asyncio.run(module.IntentONRootNode.restore(
+        snapshot, manifest=manifest, authenticator=authenticator
+    ))
+    result["restore_seconds"] = time.perf_counter() - start
+    return result
+
+
+def run_isolated(case: Dict, node_root: Path) -> Dict:
+    """Run one case in a fresh interpreter so peak RSS is its own"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    completed = subprocess.run(
+        [sys.executable, __file__, "--node-root", str(node_root),
+         "--case", json.dumps(case)],
+        env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark case {case} failed:\n"
+                           f"{completed.stderr}")
+    return json.loads(completed.stdout)
+
+
+def _int_list(text: str) -> List[int]:
+    return [int(value) for value in text.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--node-root", type=Path, default=DEFAULT_NODE_ROOT)
+    parser.add_argument("--module", action="append", choices=DOMAINS,
+                        help="init_node module to benchmark (repeatable)")
+    parser.add_argument("--fanout", type=_int_list, default=[4],
+                        help="comma-separated fan-outs, e.g. 2,4,8")
+    parser.add_argument("--depth", type=_int_list, default=[4],
+                        help="comma-separated depths below the root")
+    parser.add_argument("--domains", default=",".join(DOMAINS),
+                        help="domain mix cycled through by children")
+    parser.add_argument("--spawn-mode", default="concurrent",
+                        choices=("concurrent", "sequential", "lazy"))
+    parser.add_argument("--operations", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--write-manifest", type=Path,
+                        help="write the first case's manifest and exit")
+    parser.add_argument("--output", type=Path,
+                        help="write the JSON report here instead of stdout")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Node activity would otherwise be logged once per node and check
+    logging.disable(logging.CRITICAL)
+    if args.case:
+        case = json.loads(args.case)
+        print(json.dumps(run_case(args.node_root, **case)))
+        return
+
+    domains = [domain.strip() for domain in args.domains.split(",")]
+    if args.write_manifest:
+        manifest = make_manifest(args.fanout[0], args.depth[0], domains,
+                                 args.spawn_mode)
+        args.write_manifest.write_text(json.dumps(manifest, indent=2))
+        return
+
+    results = []
+    for module_domain in args.module or ["Enterprise"]:
+        for fanout in args.fanout:
+            for depth in args.depth:
+                case = {
+                    "module_domain": module_domain,
+                    "fanout": fanout,
+                    "depth": depth,
+                    "domains": domains,
+                    "spawn_mode": args.spawn_mode,
+                    "operations": args.operations,
+                    "queries": args.queries,
+                }
+                results.append(run_isolated(case, args.node_root))
+                print(f"{module_domain} fanout={fanout} depth={depth}: "
+                      f"{results[-1]['nodes']} nodes in "
+                      f"{results[-1]['init_seconds']:.2f}s",
+                      file=sys.stderr)
+
+    report = {
+        "benchmark": "node_tree",
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+IntentON Parameter Validation Benchmark
+Compares precompiled intent validators with interpreting the parameter
+schema on every call
+"""
+
+import argparse
+import sys
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+COMPONENT_ROOT = Path(__file__).resolve().parents[2]
+for _directory in ("IntentONRuntimeOrchestration/ResolutionEngine",
+                   "TestingAndValidation/SchemaValidation"):
+    sys.path.insert(0, str(COMPONENT_ROOT / _directory))
+from validate_manifest import compile_validator  # noqa: E402
+
+INTENT = {
+    "name": "AssignTask",
+    "parameters": {
+        "taskName": "string",
+        "assignee": {"type": "string", "description": "Team member"},
+        "dueDate": "date",
+        "priority": {"type": "integer", "required": False},
+        "labels": {"type": "array", "required": False},
+    },
+}
+
+REQUEST = {
+    "taskName": "Quarterly review",
+    "assignee": "alex",
+    "dueDate": "2025-06-30",
+    "labels": ["finance", "q2"],
+}
+
+_PYTHON_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "array": (list, tuple),
+    "object": dict,
+}
+
+
+def interpret(intent, parameters):
+    """Baseline: walk the schema dict and parse dates on every call"""
+    values = {}
+    for name, declared in intent["parameters"].items():
+        if isinstance(declared, dict):
+            kind = declared.get("type")
+            required = declared.get("required", True)
+        else:
+            kind, required = declared, True
+        if name not in parameters:
+            if required:
+                raise ValueError(f"{name}: missing")
+            continue
+        value = parameters[name]
+        if kind == "date":
+            value = datetime.strptime(value, "%Y-%m-%d").date()
+        elif not isinstance(value, _PYTHON_TYPES[kind]):
+            raise ValueError(f"{name}: expected {kind}")
+        values[name] = value
+    for name in parameters:
+        if name not in intent["parameters"]:
+            raise ValueError(f"{name}: unknown parameter")
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--number", type=int, default=200000)
+    args = parser.parse_args()
+
+    validator = compile_validator(INTENT)
+    assert validator(REQUEST) == interpret(INTENT, REQUEST)
+
+    results = {
+        "interpreted": timeit.timeit(
+            lambda: interpret(INTENT, REQUEST), number=args.number
+        ),
+        "compiled": timeit.timeit(
+            lambda: validator(REQUEST), number=args.number
+        ),
+    }
+    for name, elapsed in results.items():
+        print(f"{name:>12}: {elapsed / args.number * 1e6:7.2f} us/call "
+              f"({args.number / elapsed:,.0f} calls/s)")
+    print(f"{'speedup':>12}: "
+          f"{results['interpreted'] / results['compiled']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,170 @@
-# validate_manifest.py
+"""
+IntentON Manifest Validation
+Checks intent manifests at load time and compiles each intent's parameter
+schema into a validation function
+
+Parameter values are checked and converted with the coercers of
+ResolutionEngine/intent_resolution.py, which must be importable.
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Mapping, Tuple
+
+from intent_resolution import COERCERS, parameter_type
+
+# Parameter types an intent manifest may declare
+KNOWN_TYPES = frozenset(COERCERS)
+
+# Number of compiled manifests kept by get_validators()
+VALIDATOR_CACHE_SIZE = 32
+
+Validator = Callable[[Mapping[str, Any]], Dict[str, Any]]
+
+
+class ManifestValidationError(ValueError):
+    """Raised when an intent manifest is malformed"""
+
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        super().__init__("Invalid intent manifest: " + "; ".join(errors))
+
+
+class ParameterValidationError(ValueError):
+    """Raised when request parameters do not match an intent's schema"""
+
+    def __init__(self, intent: str, errors: Dict[str, str]):
+        self.intent = intent
+        self.errors = errors
+        details = ", ".join(f"{name}: {error}"
+                            for name, error in errors.items())
+        super().__init__(f"Invalid parameters for {intent}: {details}")
+
+
+def check_manifest(manifest: Any) -> List[str]:
+    """Return every structural problem found in a manifest"""
+    if not isinstance(manifest, Mapping):
+        return ["manifest must be an object"]
+    # A manifest without intents declares none
+    intents = manifest.get('intents', [])
+    if not isinstance(intents, (list, tuple)):
+        return ["'intents' must be a list"]
+
+    errors = []
+    seen = set()
+    for position, intent in enumerate(intents):
+        if not isinstance(intent, Mapping):
+            errors.append(f"intents[{position}] must be an object")
+            continue
+        name = intent.get('name')
+        if not isinstance(name, str) or not name:
+            errors.append(f"intents[{position}] has no name")
+            continue
+        if name in seen:
+            errors.append(f"duplicate intent {name!r}")
+        seen.add(name)
+
+        parameters = intent.get('parameters', {})
+        if not isinstance(parameters, Mapping):
+            errors.append(f"{name}: 'parameters' must be an object")
+            continue
+        for parameter, declared in parameters.items():
+            kind, _ = parameter_type(declared)
+            if kind not in KNOWN_TYPES:
+                errors.append(
+                    f"{name}.{parameter}: unknown type {kind!r}"
+                )
+    return errors
+
+
+def validate_manifest(manifest: Any):
+    """Raise ManifestValidationError unless the manifest is well formed"""
+    errors = check_manifest(manifest)
+    if errors:
+        raise ManifestValidationError(errors)
+
+
+def compile_validator(intent: Mapping[str, Any]) -> Validator:
+    """Compile an intent's parameter schema into a validation function
+
+    The schema is read once here. The returned function runs a request's
+    parameters through prebound coercers, returns the converted values
+    and raises ParameterValidationError listing every problem.
+    """
+    name = intent['name']
+    checks = {}
+    required = []
+    for parameter, declared in (intent.get('parameters') or {}).items():
+        kind, is_required = parameter_type(declared)
+        checks[parameter] = COERCERS[kind]
+        if is_required:
+            required.append(parameter)
+    required = tuple(required)
+
+    def validate(parameters: Mapping[str, Any]) -> Dict[str, Any]:
+        values = {}
+        errors = None
+        for parameter, value in parameters.items():
+            check = checks.get(parameter)
+            try:
+                if check is None:
+                    raise ValueError("unknown parameter")
+                values[parameter] = check(value)
+            except (TypeError, ValueError) as e:
+                if errors is None:
+                    errors = {}
+                errors[parameter] = str(e)
+        for parameter in required:
+            if parameter not in parameters:
+                if errors is None:
+                    errors = {}
+                errors[parameter] = "missing"
+        if errors:
+            raise ParameterValidationError(name, errors)
+        return values
+
+    validate.__name__ = f"validate_{name}"
+    validate.__qualname__ = validate.__name__
+    return validate
+
+
+def compile_manifest(manifest: Mapping[str, Any]) -> Dict[str, Validator]:
+    """Validate a manifest and compile a validator for each intent"""
+    validate_manifest(manifest)
+    return {
+        intent['name']: compile_validator(intent)
+        for intent in manifest.get('intents', [])
+    }
+
+
+_validator_lock = threading.Lock()
+# id(manifest) -> (manifest, validators); holding the manifest keeps its id
+# from being reused while the entry is cached
+_validators: Dict[int, Tuple[Mapping[str, Any], Dict[str, Validator]]] = {}
+
+
+def get_validators(manifest: Mapping[str, Any]) -> Dict[str, Validator]:
+    """Return the compiled validators for a manifest object
+
+    A manifest loaded through the document cache stays the same object
+    until its file changes, so it is checked and compiled once per load.
+    """
+    key = id(manifest)
+    with _validator_lock:
+        cached = _validators.get(key)
+        if cached is not None and cached[0] is manifest:
+            return cached[1]
+    validators = compile_manifest(manifest)
+    with _validator_lock:
+        if len(_validators) >= VALIDATOR_CACHE_SIZE:
+            del _validators[next(iter(_validators))]
+        _validators[key] = (manifest, validators)
+    return validators
+
+
+def validate_parameters(manifest: Mapping[str, Any], intent: str,
+                        parameters: Mapping[str, Any]) -> Dict[str, Any]:
+    """Validate request parameters for one intent of a manifest"""
+    validators = get_validators(manifest)
+    if intent not in validators:
+        raise ParameterValidationError(intent, {'intent': "unknown intent"})
+    return validators[intent](parameters)
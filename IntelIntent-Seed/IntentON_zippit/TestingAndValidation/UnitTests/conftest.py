@@ -0,0 +1,75 @@
+"""
+Shared fixtures for the IntentON unit tests
+Components and root nodes are loaded from their files the way the
+benchmarks load them, and nodes authenticate against the benchmarks' fake
+identity provider, so no identity libraries or network access are needed
+"""
+
+import importlib.util
+import logging
+import sys
+from pathlib import Path
+
+import pytest
+
+ZIPPIT_ROOT = Path(__file__).resolve().parents[2]
+
+DOMAINS = ("Enterprise", "Personal", "Family", "Business")
+
+
+def load_file(name: str, path: Path):
+    """Import a module from its file once, under its own name"""
+    module = sys.modules.get(name)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            sys.modules.pop(name, None)
+            raise
+    return module
+
+
+@pytest.fixture(scope="session")
+def node_tree():
+    """The node tree benchmark, for FakeIdentityApp and make_manifest"""
+    return load_file(
+        "node_tree",
+        ZIPPIT_ROOT / "TestingAndValidation/Benchmarks/node_tree.py",
+    )
+
+
+@pytest.fixture(scope="session", params=DOMAINS)
+def domain(request):
+    return request.param
+
+
+@pytest.fixture(scope="session")
+def node_module(domain, node_tree):
+    """The domain's init_node.py"""
+    module = sys.modules.get(f"{domain.lower()}_init_node")
+    if module is None:
+        module = node_tree.load_node_module(node_tree.DEFAULT_NODE_ROOT,
+                                            domain)
+    return module
+
+
+@pytest.fixture
+def authenticator(node_module, node_tree):
+    """An authenticator with its own token cache and a fake MSAL client"""
+    return node_module.EntraIDAuthenticator(
+        config={"azure": {"tenant_id": "test-tenant",
+                          "client_id": "test-client"}},
+        app_factory=node_tree.FakeIdentityApp,
+        token_cache=node_module.TokenCache(),
+    )
+
+
+@pytest.fixture(autouse=True)
+def quiet_nodes():
+    # Nodes log every spawn and permission check
+    logging.disable(logging.CRITICAL)
+    yield
+    logging.disable(logging.NOTSET)
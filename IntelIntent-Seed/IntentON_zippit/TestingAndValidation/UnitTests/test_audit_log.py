@@ -0,0 +1,189 @@
+# test_audit_log.py
+import pytest
+
+from conftest import ZIPPIT_ROOT, load_file
+
+audit_log = load_file(
+    "audit_log",
+    ZIPPIT_ROOT / "SecurityAndCompliance/AuditTrails/audit_log.py",
+)
+
+ENTRIES = 40
+
+
+def _open(directory):
+    # Small segments and a dense index so the journal spans several files
+    return audit_log.AuditJournal(directory, max_segment_bytes=512,
+                                  index_bytes=64, fsync=False)
+
+
+def _fill(directory, count=ENTRIES):
+    journal = _open(directory)
+    for number in range(count):
+        journal.append(f"PA-{number % 3}", "read", f"doc-{number}",
+                       timestamp=1000.0 + number)
+    journal.close()
+
+
+def _segments(directory):
+    return sorted(directory.glob("audit-*.seg"))
+
+
+def _resources(entries):
+    return [entry["resource"] for entry in entries]
+
+
+# A record header promising more payload than follows, or half a header
+TORN_TAILS = [
+    audit_log._RECORD_HEADER.pack(100, 2000.0) + b'["PA-0","re',
+    audit_log._RECORD_HEADER.pack(100, 2000.0)[:5],
+]
+
+
+@pytest.mark.parametrize("tail", TORN_TAILS, ids=["payload", "header"])
+def test_torn_tail_is_truncated_on_reopen(tmp_path, tail):
+    _fill(tmp_path)
+    segments = _segments(tmp_path)
+    assert len(segments) > 1
+    intact = segments[-1].stat().st_size
+    with open(segments[-1], "ab") as f:
+        f.write(tail)
+
+    journal = _open(tmp_path)
+    assert segments[-1].stat().st_size == intact
+    assert _resources(journal.query()) == [
+        f"doc-{number}" for number in range(ENTRIES)
+    ]
+    journal.append("PA-0", "update", "after-recovery", timestamp=3000.0)
+    journal.close()
+
+    journal = _open(tmp_path)
+    entries = journal.query(start_time=1000.0 + ENTRIES - 1)
+    assert _resources(entries) == [f"doc-{ENTRIES - 1}", "after-recovery"]
+    assert entries[-1]["action"] == "update"
+    journal.close()
+
+
+def test_lost_index_is_rebuilt(tmp_path):
+    _fill(tmp_path)
+    for segment in _segments(tmp_path):
+        segment.with_suffix(".idx").unlink()
+
+    journal = _open(tmp_path)
+    assert all(segment.with_suffix(".idx").stat().st_size
+               for segment in _segments(tmp_path))
+    entries = journal.query(start_time=1010.0, end_time=1012.0)
+    assert _resources(entries) == ["doc-10", "doc-11", "doc-12"]
+    journal.close()
+
+
+def test_torn_index_entry_is_truncated(tmp_path):
+    _fill(tmp_path)
+    with open(_segments(tmp_path)[-1].with_suffix(".idx"), "ab") as f:
+        f.write(b"\x01\x02\x03")
+
+    journal = _open(tmp_path)
+    entries = journal.query(start_time=1000.0 + ENTRIES - 6, pa_id="PA-1")
+    expected = [f"doc-{number}" for number in range(ENTRIES - 6, ENTRIES)
+                if number % 3 == 1]
+    assert _resources(entries) == expected
+    for number in range(ENTRIES):
+        journal.append("PA-1", "update", f"late-{number}",
+                       timestamp=2000.0 + number)
+    journal.close()
+
+    for segment in _segments(tmp_path):
+        size = segment.with_suffix(".idx").stat().st_size
+        assert size % audit_log._INDEX_ENTRY.size == 0
+    journal = _open(tmp_path)
+    # Entries written after recovery are indexed at their own offsets
+    assert journal._segments[-1].index_timestamps[-1] >= 2000.0
+    entries = journal.query(start_time=2000.0 + ENTRIES - 3, pa_id="PA-1")
+    assert _resources(entries) == [
+        f"late-{number}" for number in range(ENTRIES - 3, ENTRIES)
+    ]
+    journal.close()
+
+
+def test_queued_entries_are_served_without_flushing(tmp_path, monkeypatch):
+    _fill(tmp_path)
+    # The flusher would not run before the test ends
+    journal = audit_log.AuditJournal(tmp_path, max_segment_bytes=512,
+                                     index_bytes=64, flush_interval=60,
+                                     fsync=False)
+    commits = []
+    monkeypatch.setattr(journal, "_commit",
+                        lambda handle, data: commits.append(data))
+    journal.append("PA-new", "create", "queued", timestamp=3000.0)
+
+    assert journal.holds_before(3000.0, "PA-new")
+    assert not journal.holds_before(2999.0, "PA-new")
+    assert _resources(journal.query(start_time=1000.0 + ENTRIES - 1)) == [
+        f"doc-{ENTRIES - 1}", "queued"
+    ]
+    assert _resources(journal.query(pa_id="PA-new")) == ["queued"]
+    assert commits == []
+    monkeypatch.undo()
+    journal.close()
+
+
+def test_pa_id_tables_are_read_from_disk(tmp_path, monkeypatch):
+    _fill(tmp_path)
+    journal = _open(tmp_path)
+
+    def decode(*args):
+        raise AssertionError("records were decoded for their pa_id")
+
+    monkeypatch.setattr(audit_log, "_record_pa_id", decode)
+    assert journal.holds_before(1010.0, "PA-2")
+    assert not journal.holds_before(2000.0, "PA-unknown")
+    assert _resources(journal.query(pa_id="PA-2")) == [
+        f"doc-{number}" for number in range(ENTRIES) if number % 3 == 2
+    ]
+    journal.close()
+
+
+def test_pa_id_table_tail_is_recovered(tmp_path):
+    # Only PA-3 and later identities appear in the newest records
+    _fill(tmp_path, count=ENTRIES // 2)
+    journal = _open(tmp_path)
+    for number in range(ENTRIES // 2, ENTRIES):
+        journal.append(f"PA-{number}", "read", f"doc-{number}",
+                       timestamp=1000.0 + number)
+    journal.close()
+
+    # As if the writer stopped after committing the last batch's records
+    # but before its pa_ids and index entries
+    segment = _segments(tmp_path)[-1]
+    index = segment.with_suffix(".idx").read_bytes()
+    last_indexed = audit_log._INDEX_ENTRY.unpack_from(
+        index, len(index) - audit_log._INDEX_ENTRY.size
+    )[1]
+    ids = segment.with_suffix(".ids")
+    lines = ids.read_bytes().splitlines(keepends=True)
+    kept = [line for line in lines
+            if audit_log.json.loads(line)[2] <= last_indexed]
+    assert len(kept) < len(lines)
+    ids.write_bytes(b"".join(kept) + b'["PA-torn",10')
+
+    journal = _open(tmp_path)
+    assert _resources(journal.query(pa_id=f"PA-{ENTRIES - 1}")) == [
+        f"doc-{ENTRIES - 1}"
+    ]
+    journal.close()
+    assert ids.read_bytes().endswith(b"\n")
+    assert len(ids.read_bytes().splitlines()) == len(lines)
+
+
+def test_missing_pa_id_table_is_rebuilt(tmp_path):
+    _fill(tmp_path)
+    for segment in _segments(tmp_path):
+        segment.with_suffix(".ids").unlink()
+
+    journal = _open(tmp_path)
+    assert _resources(journal.query(pa_id="PA-0", end_time=1006.0)) == [
+        "doc-0", "doc-3", "doc-6"
+    ]
+    journal.close()
+    # Rebuilt and kept for the segment the query had to look into
+    assert _segments(tmp_path)[0].with_suffix(".ids").stat().st_size
@@ -1 +1,301 @@
 # test_init_node.py
+import asyncio
+
+import pytest
+
+KEY = ("test-tenant", "test-client", ("User.Read",))
+
+
+class Acquirer:
+    """Token acquisition that counts its calls and takes a moment"""
+
+    def __init__(self, expires_in: float = 3600):
+        self.expires_in = expires_in
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return {"access_token": f"token-{self.calls}",
+                "expires_in": self.expires_in}
+
+
+def test_concurrent_callers_share_one_acquisition(node_module):
+    cache = node_module.TokenCache()
+    acquire = Acquirer()
+
+    async def run():
+        return await asyncio.gather(
+            *(cache.get_token(KEY, acquire) for _ in range(20))
+        )
+
+    results = asyncio.run(run())
+    assert acquire.calls == 1
+    assert {result["access_token"] for result in results} == {"token-1"}
+
+
+def test_fresh_token_is_served_from_the_cache(node_module):
+    cache = node_module.TokenCache()
+    acquire = Acquirer()
+
+    async def run():
+        first = await cache.get_token(KEY, acquire)
+        second = await cache.get_token(KEY, acquire)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first is second
+    assert acquire.calls == 1
+
+
+def test_token_inside_refresh_margin_is_renewed_in_background(node_module):
+    cache = node_module.TokenCache(refresh_margin=300)
+    # Valid for longer than the test, but already inside the margin
+    acquire = Acquirer(expires_in=100)
+
+    async def run():
+        await cache.get_token(KEY, acquire)
+        # Callers are served the current token while one refresh runs
+        served = await asyncio.gather(
+            *(cache.get_token(KEY, acquire) for _ in range(10))
+        )
+        assert {result["access_token"] for result in served} == {"token-1"}
+        assert acquire.calls == 2
+        await asyncio.sleep(0.05)
+        return await cache.get_token(KEY, acquire)
+
+    renewed = asyncio.run(run())
+    assert renewed["access_token"] == "token-2"
+
+
+def test_expired_token_is_acquired_again(node_module):
+    cache = node_module.TokenCache(refresh_margin=0)
+    acquire = Acquirer(expires_in=0)
+
+    async def run():
+        first = await cache.get_token(KEY, acquire)
+        second = await cache.get_token(KEY, acquire)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert (first["access_token"], second["access_token"]) == (
+        "token-1", "token-2"
+    )
+
+
+def test_invalidate_forces_a_new_acquisition(node_module):
+    cache = node_module.TokenCache()
+    acquire = Acquirer()
+
+    async def run():
+        await cache.get_token(KEY, acquire)
+        cache.invalidate(KEY)
+        return await cache.get_token(KEY, acquire)
+
+    assert asyncio.run(run())["access_token"] == "token-2"
+
+
+def test_nodes_sharing_a_client_request_one_token(node_module, node_tree,
+                                                  monkeypatch):
+    monkeypatch.delenv("AZURE_CLIENT_SECRET", raising=False)
+    apps = []
+
+    def app_factory(*args, **kwargs):
+        app = node_tree.FakeIdentityApp(*args, **kwargs)
+        apps.append(app)
+        return app
+
+    cache = node_module.TokenCache()
+    authenticators = [
+        node_module.EntraIDAuthenticator(
+            config={"azure": {"tenant_id": "test-tenant",
+                              "client_id": "test-client"}},
+            app_factory=app_factory, token_cache=cache,
+        )
+        for _ in range(5)
+    ]
+
+    async def run():
+        return await asyncio.gather(
+            *(authenticator.authenticate() for authenticator in authenticators)
+        )
+
+    results = asyncio.run(run())
+    assert all(result["access_token"] == "simulated_token"
+               for result in results)
+    assert len(apps) == 1
+    assert apps[0].calls == 1
+
+
+def _lazy_root(node_module, node_tree, authenticator, fanout=3, depth=2):
+    manifest = node_tree.make_manifest(fanout, depth, node_tree.DOMAINS,
+                                       spawn_mode="lazy")
+    # An Enterprise root holds the delegate permission in every module
+    return node_module.IntentONRootNode(
+        domain="Enterprise", manifest=manifest, authenticator=authenticator
+    )
+
+
+def _count_builds(node_module, monkeypatch):
+    """Record the pa_id of every child built from here on"""
+    built = []
+    build_child = node_module.IntentONRootNode._build_child
+
+    async def spy(self, config, *args, **kwargs):
+        built.append(kwargs.get("pa_id"))
+        # Long enough for concurrent lookups to overlap
+        await asyncio.sleep(0.01)
+        return await build_child(self, config, *args, **kwargs)
+
+    monkeypatch.setattr(node_module.IntentONRootNode, "_build_child", spy)
+    return built
+
+
+def test_lazy_children_are_registered_unbuilt(node_module, node_tree,
+                                              authenticator, monkeypatch):
+    built = _count_builds(node_module, monkeypatch)
+    root = _lazy_root(node_module, node_tree, authenticator)
+
+    assert asyncio.run(root.initialize())
+    assert built == []
+    assert root.children == []
+    assert len(root.placeholders) == 3
+    assert set(root.registry) == {root.pa_id, *root.placeholders}
+    placeholder = next(iter(root.placeholders.values()))
+    assert isinstance(placeholder, node_module.NodePlaceholder)
+    assert root._find_node_by_pa_id(placeholder.pa_id) is None
+
+
+def test_concurrent_lookups_materialize_once(node_module, node_tree,
+                                             authenticator, monkeypatch):
+    built = _count_builds(node_module, monkeypatch)
+    root = _lazy_root(node_module, node_tree, authenticator)
+
+    async def run():
+        await root.initialize()
+        pa_id = next(iter(root.placeholders))
+        nodes = await asyncio.gather(
+            *(root.get_node(pa_id) for _ in range(5))
+        )
+        return pa_id, nodes
+
+    pa_id, nodes = asyncio.run(run())
+    child = nodes[0]
+    assert all(node is child for node in nodes)
+    assert built == [pa_id]
+    assert child.pa_id == pa_id and child.initialized
+    assert root.children == [child]
+    assert pa_id not in root.placeholders
+    assert root._find_node_by_pa_id(pa_id) is child
+    # The child's own children wait as placeholders in turn
+    assert len(child.placeholders) == 3
+    assert child.children == []
+
+
+def test_root_lookup_materializes_a_grandchild(node_module, node_tree,
+                                              authenticator, monkeypatch):
+    built = _count_builds(node_module, monkeypatch)
+    root = _lazy_root(node_module, node_tree, authenticator)
+
+    async def run():
+        await root.initialize()
+        child = await root.get_node(next(iter(root.placeholders)))
+        # The grandchild's placeholder is found through the shared registry
+        return child, await root.get_node(next(iter(child.placeholders)))
+
+    child, grandchild = asyncio.run(run())
+    assert grandchild.parent is child
+    assert grandchild.depth == 2
+    assert built == [child.pa_id, grandchild.pa_id]
+
+
+def test_grants_to_placeholders_apply_once_built(node_module, node_tree,
+                                                 authenticator):
+    root = _lazy_root(node_module, node_tree, authenticator)
+
+    async def run():
+        await root.initialize()
+        pa_id = next(iter(root.placeholders))
+        assert root.delegate_permission(pa_id, "custom")
+        return await root.get_node(pa_id)
+
+    child = asyncio.run(run())
+    assert child.access_manager.validate_permission("custom")
+
+
+def test_failed_materialization_keeps_the_placeholder(
+        node_module, node_tree, authenticator, monkeypatch):
+    root = _lazy_root(node_module, node_tree, authenticator)
+    asyncio.run(root.initialize())
+    pa_id = next(iter(root.placeholders))
+    placeholder = root.placeholders[pa_id]
+
+    async def fail(self, *args, **kwargs):
+        raise RuntimeError("identity provider unavailable")
+
+    monkeypatch.setattr(node_module.IntentONRootNode, "_build_child", fail)
+    assert asyncio.run(root.get_node(pa_id)) is None
+    assert root.placeholders[pa_id] is placeholder
+    assert root.registry[pa_id] is placeholder
+    assert placeholder.task is None
+
+    monkeypatch.undo()
+    assert asyncio.run(root.get_node(pa_id)).pa_id == pa_id
+
+
+def test_idle_subtrees_are_demoted_and_restored(node_module, node_tree,
+                                                authenticator):
+    root = _lazy_root(node_module, node_tree, authenticator)
+
+    async def build():
+        await root.initialize()
+        child = await root.get_node(next(iter(root.placeholders)))
+        grandchild = await root.get_node(next(iter(child.placeholders)))
+        assert root.delegate_permission(grandchild.pa_id, "custom")
+        return child, grandchild
+
+    child, grandchild = asyncio.run(build())
+    assert root.demote_idle(-1) == 2
+    assert root.children == []
+    demoted = root.placeholders[child.pa_id]
+    assert demoted.snapshot is not None
+    assert grandchild.pa_id in demoted.members
+    assert root.registry[grandchild.pa_id] is demoted
+
+    restored = asyncio.run(root.get_node(grandchild.pa_id))
+    assert restored is not grandchild
+    assert restored.pa_id == grandchild.pa_id
+    assert restored.parent.pa_id == child.pa_id
+    assert restored.access_manager.validate_permission("custom")
+
+
+@pytest.mark.parametrize("spawn_mode", ["sequential", "concurrent"])
+def test_failed_children_are_left_out_of_the_tree(
+        node_module, node_tree, authenticator, monkeypatch, spawn_mode):
+    manifest = node_tree.make_manifest(3, 2, node_tree.DOMAINS, spawn_mode)
+    root = node_module.IntentONRootNode(
+        domain="Enterprise", manifest=manifest, authenticator=authenticator
+    )
+    assign_roles = node_module.IntentONRootNode._assign_default_roles
+
+    def assign(self):
+        # Children cycle through the domains, so one in three fails
+        if self.domain == "Family":
+            raise RuntimeError("role service unavailable")
+        assign_roles(self)
+
+    monkeypatch.setattr(node_module.IntentONRootNode,
+                        "_assign_default_roles", assign)
+    assert asyncio.run(root.initialize())
+
+    nodes = list(root._iter_subtree())
+    # Two surviving children with two surviving children each
+    assert len(nodes) == 1 + 2 + 4
+    assert all(node.initialized and node.domain != "Family"
+               for node in nodes)
+    assert set(root.registry) == {node.pa_id for node in nodes}
+    if spawn_mode == "concurrent":
+        assert len(root.spawn_errors) == 3
+        assert {error["error"] for error in root.spawn_errors} == {
+            "initialization failed"
+        }
@@ -0,0 +1,153 @@
+# test_node_snapshot.py
+import asyncio
+import os
+import zlib
+
+import pytest
+
+from conftest import ZIPPIT_ROOT, load_file
+
+node_snapshot = load_file(
+    "node_snapshot",
+    ZIPPIT_ROOT / "IntentONRuntimeOrchestration/LifecycleManagement"
+    / "node_snapshot.py",
+)
+
+PAYLOAD = {
+    "version": 1,
+    "nodes": [("pa-1", "Enterprise", 0, None), ("pa-2", "Family", 1, 0)],
+    "roles": {("admin", "user"): 2},
+    "flags": {True, False},
+    "blob": b"\x00\xff",
+    "missing": None,
+    "ratio": 0.5,
+}
+
+
+def _reheader(data: bytes, **fields) -> bytes:
+    """Rewrite header fields of an encoded snapshot"""
+    header = node_snapshot._HEADER
+    values = dict(zip(("magic", "version", "marshal", "crc", "size"),
+                      header.unpack_from(data)))
+    values.update(fields)
+    return header.pack(*values.values()) + data[header.size:]
+
+
+def test_round_trip():
+    data = node_snapshot.encode_snapshot(PAYLOAD)
+    assert data.startswith(node_snapshot.MAGIC)
+    assert node_snapshot.decode_snapshot(data) == PAYLOAD
+
+
+def test_unserializable_payload_is_rejected():
+    with pytest.raises(node_snapshot.SnapshotError):
+        node_snapshot.encode_snapshot({"node": object()})
+
+
+def test_other_version_is_rejected():
+    data = node_snapshot.encode_snapshot(PAYLOAD)
+    stale = _reheader(data, version=node_snapshot.SNAPSHOT_VERSION + 1)
+    with pytest.raises(node_snapshot.SnapshotError, match="version"):
+        node_snapshot.decode_snapshot(stale)
+
+
+def test_foreign_file_is_rejected():
+    data = node_snapshot.encode_snapshot(PAYLOAD)
+    with pytest.raises(node_snapshot.SnapshotError, match="Not an IntentON"):
+        node_snapshot.decode_snapshot(_reheader(data, magic=b"NOTSNAP\x00"))
+
+
+def test_damaged_body_fails_the_checksum():
+    data = bytearray(node_snapshot.encode_snapshot(PAYLOAD))
+    data[-1] ^= 0xFF
+    with pytest.raises(node_snapshot.SnapshotError, match="checksum"):
+        node_snapshot.decode_snapshot(bytes(data))
+
+
+def test_checksummed_garbage_is_rejected():
+    body = zlib.compress(b"not marshal data")
+    data = _reheader(node_snapshot.encode_snapshot(PAYLOAD),
+                     crc=zlib.crc32(body), size=16)
+    data = data[:node_snapshot._HEADER.size] + body
+    with pytest.raises(node_snapshot.SnapshotError, match="corrupt"):
+        node_snapshot.decode_snapshot(data)
+
+
+@pytest.mark.parametrize("keep", [0, 7, node_snapshot._HEADER.size, -1])
+def test_truncated_snapshot_is_rejected(keep):
+    data = node_snapshot.encode_snapshot(PAYLOAD)
+    end = len(data) + keep if keep < 0 else keep
+    with pytest.raises(node_snapshot.SnapshotError):
+        node_snapshot.decode_snapshot(data[:end])
+
+
+def test_write_replaces_the_previous_snapshot(tmp_path):
+    path = tmp_path / "snapshots" / "tree.snap"
+    node_snapshot.write_snapshot(path, b"first")
+    node_snapshot.write_snapshot(path, b"second")
+    assert node_snapshot.read_snapshot(path) == b"second"
+    assert os.listdir(path.parent) == ["tree.snap"]
+
+
+def test_failed_write_keeps_the_previous_snapshot(tmp_path, monkeypatch):
+    path = tmp_path / "tree.snap"
+    node_snapshot.write_snapshot(path, b"first")
+
+    def fail(source, target):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(node_snapshot.os, "replace", fail)
+    with pytest.raises(OSError):
+        node_snapshot.write_snapshot(path, b"second")
+    assert path.read_bytes() == b"first"
+    assert os.listdir(tmp_path) == ["tree.snap"]
+
+
+def _tree(node):
+    """Structure and persisted identity fields of a tree, by pa_id"""
+    nodes, stack = {}, [node]
+    while stack:
+        node = stack.pop()
+        nodes[node.pa_id] = (
+            node.domain, node.depth,
+            node.parent.pa_id if node.parent else None,
+            sorted(child.pa_id for child in node.children),
+            tuple(getattr(node.identity, name, None)
+                  for name in type(node).SNAPSHOT_FIELDS),
+        )
+        stack.extend(node.children)
+    return nodes
+
+
+def test_node_tree_round_trip(node_module, node_tree, authenticator):
+    manifest = node_tree.make_manifest(2, 2, node_tree.DOMAINS)
+    # An Enterprise root holds the delegate permission in every module
+    root = node_module.IntentONRootNode(
+        domain="Enterprise", manifest=manifest, authenticator=authenticator
+    )
+    assert asyncio.run(root.initialize())
+    target = root.children[1].children[0]
+    assert root.delegate_permission(target.pa_id, "custom")
+
+    restored = asyncio.run(node_module.IntentONRootNode.restore(
+        root.snapshot(), manifest=manifest, authenticator=authenticator
+    ))
+    assert _tree(restored) == _tree(root)
+    assert set(restored.registry) == set(root.registry)
+    copy = restored._find_node_by_pa_id(target.pa_id)
+    assert copy.access_manager.validate_permission("custom")
+
+
+def test_node_restore_rejects_a_damaged_snapshot(domain, node_module,
+                                                 node_tree, authenticator):
+    manifest = node_tree.make_manifest(1, 1, [domain])
+    root = node_module.IntentONRootNode(
+        domain=domain, manifest=manifest, authenticator=authenticator
+    )
+    asyncio.run(root.initialize())
+    data = root.snapshot()
+    with pytest.raises(node_module.SnapshotError):
+        asyncio.run(node_module.IntentONRootNode.restore(
+            data[:len(data) // 2], manifest=manifest,
+            authenticator=authenticator
+        ))
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Generate a synthetic structure.yaml for benchmarking make_toc.py
+- Writes domains one at a time, so catalogs larger than memory are fine
+- A share of domains omit portfolios and fall back to portfolio_templates
+
+Usage:
+  python docfx_project/make_fixture.py --domains 5000 --portfolios 4 --modules 12 \
+      --out bench/structure.yaml
+  python docfx_project/make_toc.py --structure bench/structure.yaml --stream
+"""
+import argparse, random
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def write_fixture(out: Path, domains: int, portfolios: int, modules: int,
+                  template_share: float = 0.1, seed: int = 0):
+    rng = random.Random(seed)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        f.write('portfolio_templates:\n')
+        for p in range(portfolios):
+            f.write(f'  - Template{p}:\n      modules:\n')
+            for m in range(modules):
+                f.write(f'        - template-{p}-module-{m}\n')
+        f.write('domains:\n')
+        for d in range(domains):
+            f.write(f'  - name: domain-{d:06d}\n')
+            if rng.random() < template_share:
+                continue
+            f.write('    portfolios:\n')
+            for p in range(portfolios):
+                f.write(f'      - Portfolio{p}:\n          modules:\n')
+                for m in range(rng.randint(1, modules)):
+                    f.write(f'            - d{d}-p{p}-module-{m}\n')
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--domains', type=int, default=1000)
+    ap.add_argument('--portfolios', type=int, default=4)
+    ap.add_argument('--modules', type=int, default=10,
+                    help='maximum modules per portfolio')
+    ap.add_argument('--template-share', type=float, default=0.1,
+                    help='fraction of domains using portfolio_templates')
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--out', default='bench/structure.yaml')
+    args = ap.parse_args()
+    out = ROOT / args.out
+    write_fixture(out, args.domains, args.portfolios, args.modules,
+                  args.template_share, args.seed)
+    print(f'Wrote {args.domains} domains to {out} '
+          f'({out.stat().st_size / 1e6:.1f} MB).')
+
+if __name__ == '__main__':
+    main()
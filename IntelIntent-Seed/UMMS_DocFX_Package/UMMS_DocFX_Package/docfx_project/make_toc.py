@@ -3,18 +3,100 @@
 Generate DocFX TOCs from structure.yaml
 - Creates toc.yml at repo root (navbar) if missing
 - Creates toc.yml under each domain folder to list portfolios/modules
+- Leaves a toc.yml untouched when its rendered content is unchanged, so
+  DocFX's incremental build and file mtimes are not disturbed
+- With --changed-only, re-renders only domains whose structure.yaml entry
+  (or the portfolio_templates they fall back to) changed since the last run
+- With --stream, parses structure.yaml one domain at a time and renders and
+  writes TOCs on a process pool, keeping memory bounded for large catalogs
 
 Usage:
   python docfx_project/make_toc.py --structure docs/00-foundations/structure.yaml
+  python docfx_project/make_toc.py --changed-only
+  python docfx_project/make_toc.py --stream --workers 8
 """
-import argparse, yaml, os
+import argparse, hashlib, json, yaml, os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+try:
+    from yaml import CSafeLoader as StreamLoader
+except ImportError:
+    StreamLoader = yaml.SafeLoader
+
 ROOT = Path(__file__).resolve().parents[1]
+CACHE = ROOT / '.toc_cache.json'
+
+# Streaming mode: domains per worker task, and tasks in flight per worker
+BATCH_SIZE = 256
+PENDING_PER_WORKER = 4
+
+
+def digest(data) -> str:
+    if not isinstance(data, (bytes, str)):
+        data = json.dumps(data, sort_keys=True, default=str)
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def load_cache(path: Path = CACHE):
+    try:
+        cache = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        cache = {}
+    cache.setdefault('inputs', {})
+    cache.setdefault('outputs', {})
+    return cache
+
+
+def save_cache(cache, path: Path = CACHE):
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(cache, indent=1, sort_keys=True), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def output_key(p: Path) -> str:
+    return str(p.relative_to(ROOT)) if p.is_relative_to(ROOT) else str(p)
 
-def write(p: Path, text: str):
+
+def is_fresh(p: Path, outputs) -> bool:
+    """True if p is exactly as this script last wrote it."""
+    known = outputs.get(output_key(p))
+    try:
+        st = p.stat()
+    except FileNotFoundError:
+        return False
+    return known is not None and known[1:] == [st.st_mtime_ns, st.st_size]
+
+
+def write(p: Path, text: str, outputs=None) -> bool:
+    """Write text to p unless p already holds it; returns True if written.
+
+    outputs maps a path to the (sha256, mtime_ns, size) recorded when it was
+    last written, so an untouched file is recognised from its stat alone.
+    """
+    data = (text.rstrip() + "\n").encode('utf-8')
+    sha = digest(data)
+    key = output_key(p)
+    try:
+        st = p.stat()
+    except FileNotFoundError:
+        st = None
+    if st is not None:
+        known = (outputs or {}).get(key)
+        if known == [sha, st.st_mtime_ns, st.st_size] or (
+                st.st_size == len(data) and p.read_bytes() == data):
+            if outputs is not None:
+                outputs[key] = [sha, st.st_mtime_ns, st.st_size]
+            return False
     p.parent.mkdir(parents=True, exist_ok=True)
-    p.write_text(text.rstrip()+"\n", encoding='utf-8')
+    p.write_bytes(data)
+    if outputs is not None:
+        st = p.stat()
+        outputs[key] = [sha, st.st_mtime_ns, st.st_size]
+    return True
 
 
 def make_domain_toc(domain: str, portfolios):
@@ -31,18 +113,208 @@ def make_domain_toc(domain: str, portfolios):
     return "\n".join(lines)+"\n"
 
 
+def build(struct, changed_only=False, cache=None):
+    """Render every domain TOC; returns (written, unchanged, skipped)."""
+    cache = cache if cache is not None else load_cache()
+    inputs, outputs = cache['inputs'], cache['outputs']
+    templates = struct.get('portfolio_templates', [])
+    written = unchanged = skipped = 0
+    seen = set()
+    for d in struct.get('domains', []):
+        dname = d.get('name')
+        portfolios = d.get('portfolios') or templates
+        # A domain without its own portfolios depends on the templates too
+        key = digest({'entry': d, 'portfolios': portfolios})
+        target = ROOT / 'domains' / dname / 'toc.yml'
+        seen.add(dname)
+        if changed_only and inputs.get(dname) == key and is_fresh(target, outputs):
+            skipped += 1
+            continue
+        toc_text = make_domain_toc(dname, portfolios)
+        if write(target, toc_text, outputs):
+            written += 1
+        else:
+            unchanged += 1
+        inputs[dname] = key
+    for dname in set(inputs) - seen:
+        del inputs[dname]
+    return written, unchanged, skipped
+
+
+def _compose(loader, anchors):
+    """Build one YAML node from the loader's event stream."""
+    event = loader.get_event()
+    if isinstance(event, yaml.AliasEvent):
+        return anchors[event.anchor]
+    if isinstance(event, yaml.ScalarEvent):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(yaml.ScalarNode, event.value, event.implicit)
+        node = yaml.ScalarNode(tag, event.value, event.start_mark,
+                               event.end_mark, style=event.style)
+    elif isinstance(event, yaml.SequenceStartEvent):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(yaml.SequenceNode, None, event.implicit)
+        node = yaml.SequenceNode(tag, [], event.start_mark, None,
+                                 flow_style=event.flow_style)
+        while not loader.check_event(yaml.SequenceEndEvent):
+            node.value.append(_compose(loader, anchors))
+        node.end_mark = loader.get_event().end_mark
+    elif isinstance(event, yaml.MappingStartEvent):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(yaml.MappingNode, None, event.implicit)
+        node = yaml.MappingNode(tag, [], event.start_mark, None,
+                                flow_style=event.flow_style)
+        while not loader.check_event(yaml.MappingEndEvent):
+            key = _compose(loader, anchors)
+            node.value.append((key, _compose(loader, anchors)))
+        node.end_mark = loader.get_event().end_mark
+    else:
+        raise yaml.YAMLError(f'unexpected {event} in structure file')
+    if event.anchor is not None:
+        anchors[event.anchor] = node
+    return node
+
+
+def iter_structure(stream):
+    """Yield ('portfolio_templates', value) and ('domain', entry) pairs.
+
+    Only one domain entry is built at a time, so memory stays flat no
+    matter how many domains the catalog holds. Parsing uses libyaml's
+    CSafeLoader when PyYAML was built with it.
+    """
+    loader = StreamLoader(stream)
+    anchors = {}
+    try:
+        loader.get_event()                          # StreamStart
+        if loader.check_event(yaml.StreamEndEvent):
+            return
+        loader.get_event()                          # DocumentStart
+        if not loader.check_event(yaml.MappingStartEvent):
+            raise yaml.YAMLError('structure file must be a mapping')
+        loader.get_event()
+        while not loader.check_event(yaml.MappingEndEvent):
+            key = loader.construct_document(_compose(loader, anchors))
+            if key == 'domains' and loader.check_event(yaml.SequenceStartEvent):
+                loader.get_event()
+                while not loader.check_event(yaml.SequenceEndEvent):
+                    node = _compose(loader, anchors)
+                    yield 'domain', loader.construct_document(node)
+                loader.get_event()
+            else:
+                value = loader.construct_document(_compose(loader, anchors))
+                if key == 'portfolio_templates':
+                    yield key, value
+    finally:
+        loader.dispose()
+
+
+def _render_batch(batch):
+    """Worker: render and write a batch of (name, portfolios, known) TOCs."""
+    results = []
+    for dname, portfolios, known in batch:
+        target = ROOT / 'domains' / dname / 'toc.yml'
+        outputs = {output_key(target): known} if known else {}
+        written = write(target, make_domain_toc(dname, portfolios), outputs)
+        results.append((dname, written, outputs[output_key(target)]))
+    return results
+
+
+def build_streaming(path: Path, changed_only=False, cache=None, workers=None):
+    """Streaming build(); returns (written, unchanged, skipped).
+
+    Domains are parsed incrementally and handed to a process pool in
+    batches, with at most PENDING_PER_WORKER batches per worker in flight.
+    Domains relying on portfolio_templates wait until the templates have
+    been read if they appear later in the file.
+    """
+    cache = cache if cache is not None else load_cache()
+    inputs, outputs = cache['inputs'], cache['outputs']
+    counts = {'written': 0, 'unchanged': 0, 'skipped': 0}
+    seen = set()
+    pending = deque()
+    batch = []
+    deferred = []
+    templates = None
+    workers = workers or os.cpu_count() or 1
+
+    def collect(future):
+        for dname, written, record in future.result():
+            counts['written' if written else 'unchanged'] += 1
+            target = ROOT / 'domains' / dname / 'toc.yml'
+            outputs[output_key(target)] = record
+
+    def submit(pool, d, portfolios):
+        dname = d.get('name')
+        key = digest({'entry': d, 'portfolios': portfolios})
+        target = ROOT / 'domains' / dname / 'toc.yml'
+        seen.add(dname)
+        if changed_only and inputs.get(dname) == key and is_fresh(target, outputs):
+            counts['skipped'] += 1
+            return
+        inputs[dname] = key
+        batch.append((dname, portfolios, outputs.get(output_key(target))))
+        if len(batch) >= BATCH_SIZE:
+            flush(pool)
+
+    def flush(pool):
+        if batch:
+            pending.append(pool.submit(_render_batch, list(batch)))
+            batch.clear()
+        while len(pending) > workers * PENDING_PER_WORKER:
+            collect(pending.popleft())
+
+    with open(path, 'rb') as stream, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        for kind, value in iter_structure(stream):
+            if kind == 'portfolio_templates':
+                templates = value or []
+                for d in deferred:
+                    submit(pool, d, templates)
+                deferred.clear()
+            elif value.get('portfolios'):
+                submit(pool, value, value['portfolios'])
+            elif templates is None:
+                deferred.append(value)
+            else:
+                submit(pool, value, templates)
+        for d in deferred:
+            submit(pool, d, [])
+        flush(pool)
+        while pending:
+            collect(pending.popleft())
+
+    for dname in set(inputs) - seen:
+        del inputs[dname]
+    return counts['written'], counts['unchanged'], counts['skipped']
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument('--structure', default='docs/00-foundations/structure.yaml')
+    ap.add_argument('--changed-only', action='store_true',
+                    help='only re-render domains whose structure entry changed')
+    ap.add_argument('--no-cache', action='store_true',
+                    help='ignore and do not update the TOC cache')
+    ap.add_argument('--stream', action='store_true',
+                    help='parse and render domains incrementally on a worker pool')
+    ap.add_argument('--workers', type=int, help='worker processes for --stream')
     args = ap.parse_args()
-    struct = yaml.safe_load((ROOT / args.structure).read_text(encoding='utf-8'))
     # Root TOC is provided separately; here we focus on domain TOCs
-    for d in struct.get('domains', []):
-        dname = d.get('name')
-        portfolios = d.get('portfolios') or struct.get('portfolio_templates', [])
-        toc_text = make_domain_toc(dname, portfolios)
-        write(ROOT / 'domains' / dname / 'toc.yml', toc_text)
-    print('Domain TOCs generated.')
+    cache = {'inputs': {}, 'outputs': {}} if args.no_cache else load_cache()
+    changed_only = args.changed_only and not args.no_cache
+    if args.stream:
+        written, unchanged, skipped = build_streaming(
+            ROOT / args.structure, changed_only, cache, args.workers)
+    else:
+        struct = yaml.safe_load((ROOT / args.structure).read_text(encoding='utf-8'))
+        written, unchanged, skipped = build(struct, changed_only, cache)
+    if not args.no_cache:
+        save_cache(cache)
+    print(f'Domain TOCs generated: {written} written, {unchanged} unchanged, '
+          f'{skipped} skipped.')
 
 if __name__ == '__main__':
     main()